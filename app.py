@@ -1,39 +1,240 @@
+import hashlib
+import json
 import os
+import threading
+import time
 from datetime import datetime
 
-from slice_and_reorder.slice import slice_pdf
-from slice_and_reorder.reorder import reorder_pdf
-from slice_and_reorder.utils import delete_page_from_pdf
+from slice_and_reorder.pipeline import slice_and_reorder_pdf
+from slice_and_reorder.reorder import REORDER_MODES
+from slice_and_reorder.engines import DEFAULT_ENGINE, ENGINES
+from slice_and_reorder.utils import apply_page_edits
+from slice_and_reorder.cleanup import find_cleanup_pages, remove_pages
+from slice_and_reorder.render import IMAGE_FORMATS, MIME_TYPES, get_page_sizes, render_page
+from ocr.engines import get_engine
+from ocr.pipeline import OCR_VERSION
 
-from cs50 import SQL
-from flask import Flask, flash, redirect, render_template, request, session, send_from_directory, jsonify
+from flask import Flask, flash, g, redirect, render_template, request, session, send_from_directory, send_file, jsonify
 from flask_session import Session
 
-from helpers import login_required, register_user, authenticate_user, validate_login, validate_register, clean_folders, init_user_folders, get_user_temp_dir, get_user_folder, save_user_file, save_uploaded_file, get_file_url
+from database import Database
+from session_store import make_session_interface
+from blob_store import collect_garbage, get_file_digest
+from disk_cache import DiskCache
+from doc_pool import DocPool
+from result_cache import RESULT_CACHE_DIR, get_result_key, fetch_result, store_result
+from file_index import FILE_SORTS, init_file_index, record_file, remove_file, list_files, count_files, reconcile
+from janitor import Janitor
+from search_index import init_search_index, sync_search_index, index_file, unindex, search, search_stats
+from metrics import Metrics, SamplingProfiler, SlowestProfiles, start_trace, end_trace, stage, count
+from jobs import init_jobs, create_job, get_job, cancel_job, get_split_cache, DONE
+from uploads import init_uploads, create_upload, get_upload, write_chunk
+
+from helpers import login_required, register_user, authenticate_user, validate_login, validate_register, clean_folders, init_user_folders, get_user_temp_dir, get_user_files_dir, get_user_file_path, save_user_file, save_uploaded_file, save_chunked_upload, get_file_url
 
 # Configure application
 app = Flask(__name__)
 
-# Configure session to use filesystem (instead of signed cookies)
+# Configure server-side sessions: 'sqlite' (shared by all worker processes),
+# 'memory' (single process only) or 'filesystem' (flask_session)
 app.config["SESSION_PERMANENT"] = False
-app.config["SESSION_TYPE"] = "filesystem"
+app.config["SESSION_BACKEND"] = os.environ.get("SESSION_BACKEND", "sqlite")
 app.secret_key = "super_secret_key"
-Session(app)
+if app.config["SESSION_BACKEND"] == "filesystem":
+    app.config["SESSION_TYPE"] = "filesystem"
+    Session(app)
+else:
+    app.session_interface = make_session_interface(app.config["SESSION_BACKEND"], "sessions.db")
+
+# Number of page ranges large PDFs are sliced in parallel (1 = off)
+app.config["SLICE_SHARDS"] = int(os.environ.get("SLICE_SHARDS", 1))
+
+# Engine that slices and reorders PDFs, see slice_and_reorder/engines.py;
+# a request may pick another one with its engine field
+app.config["SLICE_ENGINE"] = os.environ.get("SLICE_ENGINE", DEFAULT_ENGINE)
+
+# Uploads at least this big are sliced by the 'stream' engine unless the
+# request picked one, with the process failing rather than growing past
+# the memory ceiling (see slice_and_reorder/stream.py)
+app.config["SLICE_STREAM_BYTES"] = int(os.environ.get("SLICE_STREAM_BYTES", 512 * 1024 ** 2))
+app.config["SLICE_MEMORY_LIMIT_MB"] = int(os.environ.get("SLICE_MEMORY_LIMIT_MB", 1024))
+
+# Chunked uploads (see uploads.py): size of a chunk, largest file accepted
+# and how long an unfinished upload can be resumed
+app.config["UPLOAD_CHUNK_BYTES"] = int(os.environ.get("UPLOAD_CHUNK_BYTES", 8 * 1024 ** 2))
+app.config["UPLOAD_MAX_BYTES"] = int(os.environ.get("UPLOAD_MAX_BYTES", 4 * 1024 ** 3))
+app.config["UPLOAD_TTL_HOURS"] = float(os.environ.get("UPLOAD_TTL_HOURS", 24))
+
+# Disk budget for cached processing results
+app.config["RESULT_CACHE_BYTES"] = int(os.environ.get("RESULT_CACHE_BYTES", 2 * 1024 ** 3))
+
+# Disk budget for cached page images
+app.config["RENDER_CACHE_BYTES"] = int(os.environ.get("RENDER_CACHE_BYTES", 512 * 1024 ** 2))
+
+# Open documents kept between edit requests: memory budget (estimated by
+# file size) and how long an unused document stays open
+app.config["DOC_POOL_BYTES"] = int(os.environ.get("DOC_POOL_BYTES", 1024 ** 3))
+app.config["DOC_POOL_IDLE_SECONDS"] = int(os.environ.get("DOC_POOL_IDLE_SECONDS", 300))
+
+# Temp files (uploads and outputs) are removed after this long unused, or
+# least recently used first when a user or everyone together is over quota
+app.config["TEMP_TTL_HOURS"] = float(os.environ.get("TEMP_TTL_HOURS", 24))
+app.config["TEMP_USER_QUOTA_BYTES"] = int(os.environ.get("TEMP_USER_QUOTA_BYTES", 2 * 1024 ** 3))
+app.config["TEMP_QUOTA_BYTES"] = int(os.environ.get("TEMP_QUOTA_BYTES", 20 * 1024 ** 3))
+app.config["JANITOR_INTERVAL"] = int(os.environ.get("JANITOR_INTERVAL", 300))
+
+# OCR: engine ('tesseract', or 'stub' for testing), resolution pages are
+# recognized at, worker processes per job (0 = CPU count) and the disk
+# budget of recognized pages, cached by image hash
+app.config["OCR_ENGINE"] = os.environ.get("OCR_ENGINE", "tesseract")
+app.config["OCR_DPI"] = int(os.environ.get("OCR_DPI", 300))
+app.config["OCR_WORKERS"] = int(os.environ.get("OCR_WORKERS", 0))
+app.config["OCR_CACHE_BYTES"] = int(os.environ.get("OCR_CACHE_BYTES", 256 * 1024 ** 2))
+
+# Languages offered on the OCR page (tesseract codes)
+OCR_LANGUAGES = {'eng': 'English', 'heb': 'Hebrew', 'ara': 'Arabic'}
+
+# Opt-in sampling profiler: the stacks of the PROFILE_KEEP slowest
+# instrumented requests (0 = off) are kept in PROFILE_DIR, sampled every
+# PROFILE_INTERVAL_MS
+app.config["PROFILE_KEEP"] = int(os.environ.get("PROFILE_KEEP", 0))
+app.config["PROFILE_DIR"] = os.environ.get("PROFILE_DIR", "profiles")
+app.config["PROFILE_INTERVAL_MS"] = float(os.environ.get("PROFILE_INTERVAL_MS", 5))
+
+# 'image' shows server-rendered pages; 'pdfjs' downloads the whole PDF into pdf.js
+app.config["VIEWER_MODE"] = os.environ.get("VIEWER_MODE", "image")
+
+# Cache-Control values. User files are private; anything that may change
+# under the same URL is revalidated against its ETag (a cheap 304)
+CACHE_IMMUTABLE = "public, max-age=31536000, immutable"
+CACHE_REVALIDATE = "private, no-cache"
+CACHE_NO_STORE = "no-cache, no-store, must-revalidate"
+
+# Pages handling credentials are never stored by the browser
+NO_STORE_ENDPOINTS = {'login', 'logout', 'register'}
+
+# Requests timed stage by stage for /metrics
+INSTRUMENTED_ENDPOINTS = {'slice', 'delete_page', 'save_file', 'history'}
+
+# /metrics is only served to these addresses
+METRICS_ADDRESSES = {'127.0.0.1', '::1'}
+
+# Pooled SQLite connections (WAL mode), shared by the request threads
+db = Database("pdfeditor.db", pool_size=int(os.environ.get("DB_POOL_SIZE", 8)))
+
+# Index of saved files, so the history page doesn't scan the folder
+init_file_index(db)
+
+# Sessions of resumable chunked uploads
+init_uploads(db)
+
+# Processed files keyed by input hash and mode, so repeated runs are instant
+result_cache = DiskCache(RESULT_CACHE_DIR, app.config["RESULT_CACHE_BYTES"], suffix='.pdf')
+
+# Rendered pages and zoom tiles keyed by file hash, page, scale and format
+render_cache = DiskCache(os.path.join('edited_files', 'cache', 'renders'), app.config["RENDER_CACHE_BYTES"])
+
+# Parsed documents reused by consecutive edit and render requests
+doc_pool = DocPool(app.config["DOC_POOL_BYTES"], app.config["DOC_POOL_IDLE_SECONDS"])
+
+# Usage ledger and background eviction of temp files
+janitor = Janitor(db, app.config["TEMP_TTL_HOURS"] * 3600, app.config["TEMP_USER_QUOTA_BYTES"],
+                  app.config["TEMP_QUOTA_BYTES"], interval=app.config["JANITOR_INTERVAL"],
+                  on_evict=lambda user_id, path: doc_pool.flush(path=path))
 
-# Configure CS50 Library to use SQLite database
-db = SQL("sqlite:///pdfeditor.db")
+# Latency histograms and counters of the instrumented requests
+metrics = Metrics()
+slowest_profiles = SlowestProfiles(app.config["PROFILE_DIR"], app.config["PROFILE_KEEP"])
 
+# Background workers for long-running PDF processing
+init_jobs(db, "pdfeditor.db", max_workers=int(os.environ.get("JOB_WORKERS", 0)) or None,
+          result_cache=result_cache, on_done=janitor.track)
+janitor.start()
+
+# Full-text index of saved files, built in the job workers
+init_search_index(db)
+sync_search_index(db)
+
+
+def save_request_file(file, upload_id, user_id):
+    """
+    Saves the PDF of a request: the chunked upload upload_id if given,
+    otherwise the uploaded file. Raises ValueError for a bad upload.
+    Returns (filename, filepath, digest)
+    """
+    if upload_id:
+        return save_chunked_upload(db, upload_id, user_id)
+    return save_uploaded_file(file, user_id)
+
+
+def get_slice_engine(input_path):
+    """The configured slicing engine, or the stream engine for an upload too big to hold."""
+    if os.path.getsize(input_path) >= app.config["SLICE_STREAM_BYTES"]:
+        return 'stream'
+    return app.config["SLICE_ENGINE"]
+
+
+@app.context_processor
+def inject_viewer_mode():
+    return {'viewer_mode': app.config["VIEWER_MODE"]}
+
+
+@app.url_defaults
+def version_static_urls(endpoint, values):
+    """Add the file's mtime to static URLs so they can be cached for good"""
+    if endpoint == 'static' and 'filename' in values:
+        path = os.path.join(app.static_folder, values['filename'])
+        if os.path.isfile(path):
+            values.setdefault('v', int(os.stat(path).st_mtime))
 
 
 @app.after_request
 def after_request(response):
-    """Ensure responses aren't cached"""
-    response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
-    response.headers["Expires"] = 0
-    response.headers["Pragma"] = "no-cache"
+    """Apply the cache policy of the route, unless it set its own"""
+    if request.endpoint == 'static' and request.args.get('v'):
+        response.headers["Cache-Control"] = CACHE_IMMUTABLE
+    elif request.endpoint in NO_STORE_ENDPOINTS:
+        response.headers["Cache-Control"] = CACHE_NO_STORE
+        response.headers["Pragma"] = "no-cache"
+        response.headers["Expires"] = 0
+    elif "Cache-Control" not in response.headers or request.endpoint == 'static':
+        response.headers["Cache-Control"] = CACHE_REVALIDATE
+    return response
+
+
+@app.before_request
+def start_request_trace():
+    """Time the stages of instrumented requests, and sample them if profiling"""
+    if request.endpoint in INSTRUMENTED_ENDPOINTS:
+        start_trace(request.endpoint)
+        if app.config["PROFILE_KEEP"]:
+            g.profiler = SamplingProfiler(threading.get_ident(), app.config["PROFILE_INTERVAL_MS"] / 1000)
+            g.profiler.start()
+
+
+@app.after_request
+def record_request_trace(response):
+    finish_request_trace(response.status_code)
     return response
 
 
+@app.teardown_request
+def drop_request_trace(exc):
+    """Requests that failed without a response still count, as 500s"""
+    finish_request_trace(500)
+
+
+def finish_request_trace(status):
+    """Add the stage timings of the request to the metrics, once"""
+    trace = end_trace()
+    if trace is None:
+        return
+    seconds = metrics.record(trace, status)
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        slowest_profiles.offer(trace, seconds, profiler.stop())
+
+
 @app.route("/")
 @login_required
 def home():
@@ -83,7 +284,10 @@ def logout():
     if user_id:
         old = get_user_temp_dir(user_id, 'old')
         new = get_user_temp_dir(user_id, 'new')
+        doc_pool.flush(user_id=user_id)
         clean_folders([old, new])
+        janitor.forget_user(user_id)
+        collect_garbage()
         
     session.clear()
     return redirect("/")
@@ -121,67 +325,83 @@ def register():
 @login_required
 def slice():
     if request.method == "POST":
-        # Check if file is present
-        if 'pdf_file' not in request.files:
+        # A chunked upload (see uploads.py) or the file itself
+        upload_id = request.form.get('upload_id')
+        if not upload_id and 'pdf_file' not in request.files:
             flash("No file part", "error")
             return redirect(request.url)
         
-        file = request.files['pdf_file']
+        file = request.files.get('pdf_file')
         action = request.form.get('action')
+        auto_split = request.form.get('auto_split') == 'on'
+        linearize = request.form.get('linearize') == 'on'
+        optimize = request.form.get('optimize') == 'on' or linearize
+        engine = request.form.get('engine')
 
-        if file.filename == '':
+        if not upload_id and file.filename == '':
             flash("No selected file", "error")
             return redirect(request.url)
 
-        if file and file.filename.endswith('.pdf'):
+        if upload_id or file.filename.endswith('.pdf'):
             user_id = session["user_id"]
             
             # Save uploaded file using helper
-            filename, input_path = save_uploaded_file(file, user_id)
+            with stage('upload'):
+                try:
+                    filename, input_path, digest = save_request_file(file, upload_id, user_id)
+                except ValueError as e:
+                    flash(str(e), "error")
+                    return redirect(request.url)
+            count(nbytes=os.path.getsize(input_path))
+            with stage('cleanup'):
+                janitor.track(user_id, input_path)
             
-            # Define other paths
-            old_dir = get_user_temp_dir(user_id, 'old')
+            # Define output path
             new_dir = get_user_temp_dir(user_id, 'new')
 
-            sliced_filename = f"sliced_temp_{filename}"
-            sliced_path = os.path.join(old_dir, sliced_filename)
-
             final_filename = f"processed_{filename}"
             final_path = os.path.join(new_dir, final_filename)
 
             # Map action string to reorder mode
-            mode_map = {
-                'booklet_rtl': 1,
-                'booklet_ltr': 2,
-                'spreads_rtl': 3,
-                'spreads_ltr': 4
-            }
-            
-            reorder_mode = mode_map.get(action)
+            reorder_mode = REORDER_MODES.get(action)
             if not reorder_mode:
                 flash("Invalid action selected", "error")
                 return redirect(request.url)
 
-            # Process file
+            if engine and engine not in ENGINES:
+                flash("Invalid engine selected", "error")
+                return redirect(request.url)
+            engine = engine or get_slice_engine(input_path)
+
+            # Process file, unless the same file was already processed this way
             try:
-                # Step 1: Slice as LTR (Left=0, Right=1)
-                slice_pdf(input_path, sliced_path) 
-                
-                # Step 2: Reorder using the User's selection
-                reorder_pdf(sliced_path, final_path, mode=reorder_mode)
-                
+                cache_key = get_result_key(digest, 'slice', mode=reorder_mode, auto_split=auto_split,
+                                           optimize=optimize, linearize=linearize, engine=engine)
+                with stage('cache'):
+                    cached = fetch_result(result_cache, cache_key, final_path)
+                optimize_report = None
+                if not cached:
+                    # Slice and reorder in one pass using the User's selection
+                    # (timed as parse, crop, write and optimize inside)
+                    optimize_report = slice_and_reorder_pdf(input_path, final_path, mode=reorder_mode,
+                                                            auto_split=auto_split, split_cache=get_split_cache(),
+                                                            optimize=optimize, linearize=linearize, engine=engine,
+                                                            memory_limit=app.config["SLICE_MEMORY_LIMIT_MB"] * 2**20)
+                    with stage('cache'):
+                        store_result(result_cache, cache_key, final_path)
+                with stage('cleanup'):
+                    janitor.track(user_id, final_path)
+
                 # Generate URL using helper
                 pdf_url = get_file_url(user_id, 'new', final_filename)
 
-                # Clean up intermediate
-                if os.path.exists(sliced_path):
-                    os.remove(sliced_path)
-
-                return render_template('sliced.html', 
-                                       output_file=pdf_url, 
-                                       pdf_url=pdf_url,
-                                       filename=final_filename,
-                                       folder_type='processed')
+                with stage('render'):
+                    return render_template('sliced.html',
+                                           output_file=pdf_url,
+                                           pdf_url=pdf_url,
+                                           filename=final_filename,
+                                           folder_type='processed',
+                                           optimize_report=optimize_report)
                                        
             except Exception as e:
                 flash(f"Error processing file: {str(e)}", "error")
@@ -193,56 +413,245 @@ def slice():
     return render_template('slice.html')
 
 
+@app.route('/jobs', methods=['POST'])
+@login_required
+def submit_job():
+    """Queue a slice job and return its id right away."""
+    file = request.files.get('pdf_file')
+    upload_id = request.form.get('upload_id')
+    action = request.form.get('action')
+    auto_split = request.form.get('auto_split') == 'on'
+    linearize = request.form.get('linearize') == 'on'
+    optimize = request.form.get('optimize') == 'on' or linearize
+    engine = request.form.get('engine')
+
+    if not upload_id and (not file or file.filename == ''):
+        return jsonify({'success': False, 'error': 'No selected file'}), 400
+
+    if not upload_id and not file.filename.endswith('.pdf'):
+        return jsonify({'success': False, 'error': 'Invalid file type'}), 400
+
+    reorder_mode = REORDER_MODES.get(action)
+    if not reorder_mode:
+        return jsonify({'success': False, 'error': 'Invalid action selected'}), 400
+
+    if engine and engine not in ENGINES:
+        return jsonify({'success': False, 'error': 'Invalid engine selected'}), 400
+
+    user_id = session["user_id"]
+    try:
+        filename, input_path, digest = save_request_file(file, upload_id, user_id)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    janitor.track(user_id, input_path)
+    final_path = os.path.join(get_user_temp_dir(user_id, 'new'), f"processed_{filename}")
+    engine = engine or get_slice_engine(input_path)
+
+    cache_key = get_result_key(digest, 'slice', mode=reorder_mode, auto_split=auto_split, optimize=optimize,
+                               linearize=linearize, engine=engine)
+    job_id = create_job(db, user_id, 'slice', input_path, final_path, cache_key=cache_key,
+                        mode=reorder_mode, shards=app.config["SLICE_SHARDS"], auto_split=auto_split,
+                        optimize=optimize, linearize=linearize, engine=engine,
+                        memory_limit=app.config["SLICE_MEMORY_LIMIT_MB"] * 2**20)
+    return jsonify({'success': True, 'job_id': job_id}), 202
+
+
+@app.route('/jobs/<job_id>')
+@login_required
+def job_status(job_id):
+    job = get_job(db, job_id, session["user_id"])
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+
+    result_url = None
+    if job["status"] == DONE:
+        result_url = get_file_url(job["user_id"], 'new', os.path.basename(job["output_path"]))
+
+    return jsonify({
+        'success': True,
+        'job_id': job["id"],
+        'status': job["status"],
+        'pages_done': job["pages_done"],
+        'pages_total': job["pages_total"],
+        'error': job["error"],
+        'result': job["result"],
+        'result_url': result_url
+    })
+
+
+@app.route('/jobs/<job_id>/result')
+@login_required
+def job_result(job_id):
+    job = get_job(db, job_id, session["user_id"])
+    if job is None:
+        flash("Job not found", "error")
+        return redirect("/slice")
+
+    page = "/ocr" if job["kind"] == 'ocr' else "/slice"
+    if job["status"] != DONE:
+        flash(f"Job is {job['status']}", "error")
+        return redirect(page)
+
+    final_filename = os.path.basename(job["output_path"])
+    pdf_url = get_file_url(job["user_id"], 'new', final_filename)
+
+    if job["kind"] == 'ocr':
+        return render_template('ocr_done.html',
+                               pdf_url=pdf_url,
+                               filename=final_filename,
+                               folder_type='processed')
+
+    return render_template('sliced.html',
+                           output_file=pdf_url,
+                           pdf_url=pdf_url,
+                           filename=final_filename,
+                           folder_type='processed',
+                           optimize_report=job["result"])
+
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+@login_required
+def job_cancel(job_id):
+    if cancel_job(db, job_id, session["user_id"]):
+        return jsonify({'success': True})
+    return jsonify({'success': False, 'error': 'Job is not running'}), 409
+
+
+@app.route('/uploads', methods=['POST'])
+@login_required
+def upload_create():
+    """Open a chunked upload; its chunks are then PUT in any order."""
+    filename = request.form.get('filename', '')
+    size = request.form.get('size', type=int)
+
+    if not size or size > app.config["UPLOAD_MAX_BYTES"]:
+        return jsonify({'success': False, 'error': 'Invalid file size'}), 400
+
+    try:
+        upload_id = create_upload(db, session["user_id"], filename, size, app.config["UPLOAD_CHUNK_BYTES"],
+                                  ttl=app.config["UPLOAD_TTL_HOURS"] * 3600)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    upload = get_upload(db, upload_id, session["user_id"])
+    return jsonify({'success': True, 'upload_id': upload_id, 'chunk_size': upload["chunk_size"],
+                    'num_chunks': upload["num_chunks"]}), 201
+
+
+@app.route('/uploads/<upload_id>')
+@login_required
+def upload_status(upload_id):
+    """The chunks received so far, to resume an interrupted upload."""
+    upload = get_upload(db, upload_id, session["user_id"])
+    if upload is None:
+        return jsonify({'success': False, 'error': 'Upload not found'}), 404
+
+    return jsonify({
+        'success': True,
+        'upload_id': upload["id"],
+        'status': upload["status"],
+        'error': upload["error"],
+        'size': upload["size"],
+        'chunk_size': upload["chunk_size"],
+        'num_chunks': upload["num_chunks"],
+        'received': upload["received"]
+    })
+
+
+@app.route('/uploads/<upload_id>/<int:index>', methods=['PUT'])
+@login_required
+def upload_chunk(upload_id, index):
+    """Store one chunk of an upload; the request body is the raw bytes."""
+    upload = get_upload(db, upload_id, session["user_id"])
+    if upload is None:
+        return jsonify({'success': False, 'error': 'Upload not found'}), 404
+
+    try:
+        received = write_chunk(db, upload, index, request.get_data())
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return jsonify({'success': True, 'received': received, 'num_chunks': upload["num_chunks"]})
+
+
 @app.route('/ocr', methods=["GET", "POST"])
 @login_required
 def ocr():
-    if request.method == "POST":
-        if 'pdf_file' not in request.files:
-            flash("No file part", "error")
-            return redirect(request.url)
-        
-        file = request.files['pdf_file']
-        # Language would be used here later
-        # language = request.form.get('language')
+    engine = get_engine(app.config["OCR_ENGINE"])
+    if request.method == "GET":
+        return render_template('ocr.html', languages=OCR_LANGUAGES, available=engine.is_available())
 
-        if file.filename == '':
-            flash("No selected file", "error")
-            return redirect(request.url)
+    file = request.files.get('pdf_file')
+    upload_id = request.form.get('upload_id')
+    language = request.form.get('language')
 
-        if file and file.filename.endswith('.pdf'):
-            user_id = session["user_id"]
-            
-            # Save using helper
-            filename, _ = save_uploaded_file(file, user_id)
-        
-            # Generate URL using helper
-            pdf_url = get_file_url(user_id, 'old', filename)
-            
-            return render_template('ocr.html', pdf_url=pdf_url, filename=filename, folder_type='old')
-    
-    return render_template('ocr.html')
+    if not upload_id and (not file or file.filename == ''):
+        return jsonify({'success': False, 'error': 'No selected file'}), 400
+
+    if not upload_id and not file.filename.endswith('.pdf'):
+        return jsonify({'success': False, 'error': 'Invalid file type'}), 400
+
+    if language not in OCR_LANGUAGES:
+        return jsonify({'success': False, 'error': 'Invalid language selected'}), 400
+
+    if not engine.is_available():
+        return jsonify({'success': False, 'error': 'OCR is not available on this server'}), 503
+
+    user_id = session["user_id"]
+    try:
+        filename, input_path, digest = save_request_file(file, upload_id, user_id)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    janitor.track(user_id, input_path)
+    final_path = os.path.join(get_user_temp_dir(user_id, 'new'), f"ocr_{filename}")
+
+    params = {
+        'engine': engine.name,
+        'language': language,
+        'dpi': app.config["OCR_DPI"],
+    }
+    cache_key = get_result_key(digest, 'ocr', engine_version=engine.version, version=OCR_VERSION, **params)
+    job_id = create_job(db, user_id, 'ocr', input_path, final_path, cache_key=cache_key,
+                        workers=app.config["OCR_WORKERS"] or None, cache_bytes=app.config["OCR_CACHE_BYTES"],
+                        **params)
+    return jsonify({'success': True, 'job_id': job_id}), 202
 
 
 @app.route('/history')
 @login_required
 def history():
     user_id = session.get("user_id")
-    saved_dir = os.path.join(get_user_folder(user_id), 'saved')
-    
+    sort = request.args.get('sort', 'date')
+    order = request.args.get('order', 'desc')
+    cursor = request.args.get('cursor')
+
+    if sort not in FILE_SORTS or order not in ('asc', 'desc'):
+        return redirect("/history")
+
+    # Files saved before the index existed are picked up on the first visit
+    with stage('reconcile'):
+        if not cursor and count_files(db, user_id) == 0:
+            if any(reconcile(db, user_id).values()):
+                sync_search_index(db)
+
+    try:
+        with stage('query'):
+            rows, next_cursor = list_files(db, user_id, sort=sort, descending=order == 'desc', cursor=cursor)
+    except ValueError:
+        return redirect("/history")
+
     files_data = []
-    if os.path.exists(saved_dir):
-        for f in os.listdir(saved_dir):
-            path = os.path.join(saved_dir, f)
-            if os.path.isfile(path):
-                stats = os.stat(path)
-                files_data.append({
-                    'name': f,
-                    'size': f"{stats.st_size / 1024:.1f} KB",
-                    'date': datetime.fromtimestamp(stats.st_mtime).strftime('%Y-%m-%d %H:%M'),
-                    'url': get_file_url(user_id, 'saved', f)
-                })
-                
-    return render_template('history.html', files=files_data)
+    for row in rows:
+        files_data.append({
+            'name': row["name"],
+            'size': f"{row['size'] / 1024:.1f} KB",
+            'pages': row["page_count"],
+            'date': datetime.fromtimestamp(row["modified_at"]).strftime('%Y-%m-%d %H:%M'),
+            'url': get_file_url(user_id, 'saved', row["name"])
+        })
+
+    with stage('render'):
+        return render_template('history.html', files=files_data, sort=sort, order=order,
+                               next_cursor=next_cursor, first_page=not cursor)
 
 
 @app.route('/edited_files/<path:filename>')
@@ -251,10 +660,22 @@ def serve_file(filename):
     # Security: Ensure user can only access their own folder
     user_id = session.get("user_id")
     expected_prefix = f"{user_id}/"
+    filename = os.path.normpath(filename)
     if not filename.startswith(expected_prefix):
          return "Unauthorized", 403
-         
-    return send_from_directory('edited_files', filename)
+
+    file_path = os.path.join('edited_files', filename)
+    if not os.path.isfile(file_path):
+        return "File not found", 404
+
+    # Strong ETag from the content hash; conditional enables Range (206) and 304
+    response = send_from_directory('edited_files', filename, etag=get_file_digest(file_path),
+                                   conditional=True)
+    if not filename.startswith(f"{expected_prefix}saved/"):
+        janitor.touch(file_path)
+    # Saved files may be saved over under the same name, so always revalidate
+    response.headers["Cache-Control"] = CACHE_REVALIDATE
+    return response
 
 
 @app.route('/delete_page', methods=['POST'])
@@ -269,21 +690,126 @@ def delete_page():
         return jsonify({'success': False, 'error': 'Missing data'}), 400
 
     user_id = session["user_id"]
-    if folder_type == 'processed':
-        folder = get_user_temp_dir(user_id, 'new')
-    elif folder_type == 'old':
-        folder = get_user_temp_dir(user_id, 'old')
-    else:
+    if folder_type not in ('processed', 'old'):
          return jsonify({'success': False, 'error': 'Invalid folder type'}), 400
 
-    file_path = os.path.join(folder, filename)
+    file_path = get_user_file_path(user_id, folder_type, filename)
+    if file_path is None:
+        return jsonify({'success': False, 'error': 'Invalid filename'}), 400
+
+    if not os.path.isfile(file_path):
+        return jsonify({'success': False, 'error': 'File not found'}), 404
 
     try:
-        success = delete_page_from_pdf(file_path, int(page_number))
-        if success:
-             return jsonify({'success': True})
-        else:
-             return jsonify({'success': False, 'error': 'Failed to delete page'}), 500
+        # Saved in full to a new file, so saved copies sharing its data keep theirs
+        count(pages=1, nbytes=os.path.getsize(file_path))
+        # Timed as edit and write inside
+        with doc_pool.checkout(user_id, file_path, edit=True) as doc:
+            apply_page_edits(file_path, [{'op': 'delete', 'page': int(page_number)}], doc=doc)
+        with stage('cleanup'):
+            janitor.track(user_id, file_path)
+        return jsonify({'success': True})
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/edit_pages', methods=['POST'])
+@login_required
+def edit_pages():
+    """Apply a list of page operations (delete/rotate/move) in one save"""
+    data = request.get_json()
+    filename = data.get('filename')
+    folder_type = data.get('folder_type')
+    ops = data.get('ops')
+
+    if not filename or not folder_type or not isinstance(ops, list):
+        return jsonify({'success': False, 'error': 'Missing data'}), 400
+
+    if folder_type not in ('processed', 'old'):
+        return jsonify({'success': False, 'error': 'Invalid folder type'}), 400
+
+    file_path = get_user_file_path(session["user_id"], folder_type, filename)
+    if file_path is None:
+        return jsonify({'success': False, 'error': 'Invalid filename'}), 400
+    if not os.path.isfile(file_path):
+        return jsonify({'success': False, 'error': 'File not found'}), 404
+
+    try:
+        # Saved in full to a new file, so saved copies sharing its data keep theirs
+        with doc_pool.checkout(session["user_id"], file_path, edit=True) as doc:
+            result = apply_page_edits(file_path, ops, doc=doc)
+        janitor.track(session["user_id"], file_path)
+        return jsonify({'success': True, **result})
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/analyze_pages', methods=['POST'])
+@login_required
+def analyze_pages():
+    """Blank and near-duplicate pages of a file, to review before removing them"""
+    data = request.get_json()
+    filename = data.get('filename')
+    folder_type = data.get('folder_type')
+
+    if not filename or not folder_type:
+        return jsonify({'success': False, 'error': 'Missing data'}), 400
+
+    if folder_type not in ('processed', 'old'):
+        return jsonify({'success': False, 'error': 'Invalid folder type'}), 400
+
+    file_path = get_user_file_path(session["user_id"], folder_type, filename)
+    if file_path is None:
+        return jsonify({'success': False, 'error': 'Invalid filename'}), 400
+    if not os.path.isfile(file_path):
+        return jsonify({'success': False, 'error': 'File not found'}), 404
+
+    try:
+        start = time.perf_counter()
+        with doc_pool.checkout(session["user_id"], file_path) as doc:
+            result = find_cleanup_pages(file_path, doc=doc)
+        took_ms = (time.perf_counter() - start) * 1000
+        return jsonify({'success': True, **result, 'took_ms': round(took_ms, 2)})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/remove_pages', methods=['POST'])
+@login_required
+def remove_pages_route():
+    """Remove a list of pages (e.g. those found by /analyze_pages) in one rewrite"""
+    data = request.get_json()
+    filename = data.get('filename')
+    folder_type = data.get('folder_type')
+    pages = data.get('pages')
+
+    if not filename or not folder_type or not isinstance(pages, list) or not pages:
+        return jsonify({'success': False, 'error': 'Missing data'}), 400
+
+    if folder_type not in ('processed', 'old'):
+        return jsonify({'success': False, 'error': 'Invalid folder type'}), 400
+
+    if not all(isinstance(page, int) for page in pages):
+        return jsonify({'success': False, 'error': 'Invalid page number'}), 400
+
+    file_path = get_user_file_path(session["user_id"], folder_type, filename)
+    if file_path is None:
+        return jsonify({'success': False, 'error': 'Invalid filename'}), 400
+    if not os.path.isfile(file_path):
+        return jsonify({'success': False, 'error': 'File not found'}), 404
+
+    try:
+        # Saved in full to a new file, so saved copies sharing its data keep theirs
+        with doc_pool.checkout(session["user_id"], file_path, edit=True) as doc:
+            result = remove_pages(file_path, pages, doc=doc)
+        janitor.track(session["user_id"], file_path)
+        return jsonify({'success': True, **result})
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -298,12 +824,18 @@ def delete_file():
          return jsonify({'success': False, 'error': 'Missing filename'}), 400
          
     user_id = session["user_id"]
-    saved_dir = os.path.join(get_user_folder(user_id), 'saved')
-    file_path = os.path.join(saved_dir, filename)
-    
+    file_path = get_user_file_path(user_id, 'saved', filename)
+    if file_path is None:
+        return jsonify({'success': False, 'error': 'Invalid filename'}), 400
+
     try:
         if os.path.exists(file_path):
+            doc_pool.flush(path=file_path)
             os.remove(file_path)
+            digest = remove_file(db, user_id, filename)
+            if digest:
+                unindex(db, digest)
+            collect_garbage()
             return jsonify({'success': True})
         else:
             return jsonify({'success': False, 'error': 'File not found'}), 404
@@ -318,10 +850,131 @@ def cleanup_temp():
     if user_id:
         old = get_user_temp_dir(user_id, 'old')
         new = get_user_temp_dir(user_id, 'new')
+        doc_pool.flush(user_id=user_id)
         clean_folders([old, new])
+        janitor.forget_user(user_id)
+        collect_garbage()
     return '', 204
 
 
+@app.route('/api/cache_stats')
+@login_required
+def cache_stats():
+    return jsonify({
+        'results': result_cache.stats(),
+        'renders': render_cache.stats(),
+        'documents': doc_pool.stats(),
+        'temp_storage': janitor.stats(),
+        'search': search_stats(db)
+    })
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Request latency per stage, in the Prometheus text format; local scrapers only"""
+    if request.remote_addr not in METRICS_ADDRESSES:
+        return "Forbidden", 403
+    response = app.response_class(metrics.render(), mimetype='text/plain')
+    response.headers["Content-Type"] = "text/plain; version=0.0.4; charset=utf-8"
+    response.headers["Cache-Control"] = CACHE_NO_STORE
+    return response
+
+
+@app.route('/api/search')
+@login_required
+def search_api():
+    """Pages of the user's saved files matching ?q=, with highlighted snippets"""
+    user_id = session["user_id"]
+    query = request.args.get('q', '')
+    limit = min(request.args.get('limit', 20, type=int), 100)
+
+    start = time.perf_counter()
+    rows = search(db, user_id, query, limit=limit)
+    took_ms = (time.perf_counter() - start) * 1000
+
+    results = [{
+        'filename': row["name"],
+        'page': row["page"],
+        'snippet': row["snippet"],
+        'url': f"{get_file_url(user_id, 'saved', row['name'])}#page={row['page']}"
+    } for row in rows]
+    return jsonify({'results': results, 'took_ms': round(took_ms, 2)})
+
+
+@app.route('/render/<folder_type>/<filename>/info')
+@login_required
+def render_info(folder_type, filename):
+    """Page count and displayed page sizes (in points) of a user's file"""
+    folder = get_user_files_dir(session["user_id"], folder_type)
+    if folder is None:
+        return jsonify({'error': 'Invalid folder type'}), 400
+
+    file_path = os.path.join(folder, filename)
+    if not os.path.isfile(file_path):
+        return jsonify({'error': 'File not found'}), 404
+
+    with doc_pool.checkout(session["user_id"], file_path) as doc:
+        sizes = get_page_sizes(file_path, doc=doc)
+    return jsonify({
+        'page_count': len(sizes),
+        'sizes': sizes,
+        'formats': IMAGE_FORMATS,
+        'version': get_file_digest(file_path)
+    })
+
+
+@app.route('/render/<folder_type>/<filename>/<int:page>')
+@login_required
+def render_page_image(folder_type, filename, page):
+    """
+    One page of a user's file as an image.
+    Query args: scale (0.1-4), tile ("col,row" of a 512px tile), fmt (png/jpeg/webp).
+    """
+    folder = get_user_files_dir(session["user_id"], folder_type)
+    if folder is None:
+        return "Invalid folder type", 400
+
+    file_path = os.path.join(folder, filename)
+    if not os.path.isfile(file_path):
+        return "File not found", 404
+    janitor.touch(file_path)
+
+    fmt = request.args.get('fmt', 'png')
+    if fmt not in IMAGE_FORMATS:
+        return "Unsupported format", 400
+
+    try:
+        # Two decimals is finer than any zoom step the viewer uses
+        scale = round(min(max(float(request.args.get('scale', 1.0)), 0.1), 4.0), 2)
+        tile = request.args.get('tile')
+        if tile:
+            tile = tuple(int(n) for n in tile.split(','))
+            if len(tile) != 2 or min(tile) < 0:
+                raise ValueError
+    except ValueError:
+        return "Invalid scale or tile", 400
+
+    file_digest = get_file_digest(file_path)
+    key = json.dumps([file_digest, page, scale, tile, fmt])
+    key = hashlib.sha256(key.encode()).hexdigest()
+
+    image_path = render_cache.get(key)
+    if image_path is None:
+        with doc_pool.checkout(session["user_id"], file_path) as doc:
+            image = render_page(file_path, page, scale=scale, tile=tile, fmt=fmt, doc=doc)
+        if image is None:
+            return "Page not found", 404
+        image_path = render_cache.put_bytes(key, image)
+
+    response = send_file(image_path, mimetype=MIME_TYPES[fmt], etag=key, conditional=True)
+    # The viewer puts the file hash in the URL, so a matching one never changes
+    if request.args.get('v') == file_digest:
+        response.headers["Cache-Control"] = "private, max-age=31536000, immutable"
+    else:
+        response.headers["Cache-Control"] = CACHE_REVALIDATE
+    return response
+
+
 @app.route('/save_file', methods=['POST'])
 @login_required
 def save_file():
@@ -333,9 +986,25 @@ def save_file():
         return jsonify({'success': False, 'error': 'Missing data'}), 400
 
     user_id = session["user_id"]
-    success, message = save_user_file(user_id, filename, folder_type)
+    folder = get_user_files_dir(user_id, folder_type)
+    if folder:
+        # Edits are already on disk; the saved copy starts a fresh document
+        with stage('flush'):
+            doc_pool.flush(path=os.path.join(folder, filename))
+    with stage('save'):
+        success, message = save_user_file(user_id, filename, folder_type)
 
     if success:
+        saved_path = os.path.join(get_user_files_dir(user_id, 'saved'), filename)
+        count(nbytes=os.path.getsize(saved_path))
+        # Saving over a file replaces its content in the search index too
+        with stage('index'):
+            previous = db.execute("SELECT sha256 FROM files WHERE user_id = ? AND name = ?", user_id, filename)
+            record_file(db, user_id, filename)
+            digest = get_file_digest(saved_path)
+            index_file(db, digest, saved_path)
+            if previous and previous[0]["sha256"] != digest:
+                unindex(db, previous[0]["sha256"])
         return jsonify({'success': True, 'message': message})
     else:
         return jsonify({'success': False, 'error': message}), 500
@@ -0,0 +1,78 @@
+"""
+Measures blank and duplicate page detection on a synthetic page scan.
+
+Reports time, peak RSS and how many of the planted blank and duplicated
+pages were found, and how many pages were flagged wrongly. Then checks
+that distinct pages of body text, as vector text and as scans, are not
+taken for duplicates of each other. Exits with status 1 if a planted page
+is missed or any page is flagged wrongly.
+
+Usage: python -m benchmarks.bench_cleanup [--pages 1000] [--text-pages 40] [--dpi 72] [--seed 0]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+
+from benchmarks.common import measure
+from benchmarks.synthetic import make_page_scan_pdf, make_text_pages_pdf
+from slice_and_reorder.cleanup import find_cleanup_pages
+
+
+def analyse(input_path, result_path):
+    with open(result_path, 'w') as f:
+        json.dump(find_cleanup_pages(input_path), f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pages', type=int, default=1000)
+    parser.add_argument('--text-pages', type=int, default=40, help="distinct text pages to check")
+    parser.add_argument('--dpi', type=int, default=72, help="resolution of the synthetic scan")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    blank = set(random.sample(range(args.pages), args.pages // 50))
+    duplicates = set(random.sample(sorted(set(range(1, args.pages)) - blank), args.pages // 50))
+    # A sheet fed twice after a blank one repeats the blank page
+    expected_blank = {i + 1 for i in blank} | {i + 1 for i in duplicates if i - 1 in blank}
+    expected_duplicates = {i + 1 for i in duplicates} - expected_blank
+
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path = os.path.join(tmp, 'input.pdf')
+        result_path = os.path.join(tmp, 'result.json')
+        make_page_scan_pdf(input_path, args.pages, blank=blank, duplicates=duplicates, dpi=args.dpi, seed=args.seed)
+
+        seconds, peak_kb = measure(analyse, input_path, result_path)
+        with open(result_path) as f:
+            result = json.load(f)
+
+        found_blank = set(result['blank'])
+        found_duplicates = {duplicate['page'] for duplicate in result['duplicates']}
+        print(f"{args.pages} pages ({os.path.getsize(input_path) / 2**20:.1f} MB): {seconds:.2f} s "
+              f"({seconds / args.pages * 1000:.1f} ms/page), peak RSS {peak_kb / 1024:.1f} MB")
+        print(f"     blank: {len(found_blank & expected_blank)}/{len(expected_blank)} found, "
+              f"{len(found_blank - expected_blank)} wrong")
+        print(f"duplicates: {len(found_duplicates & expected_duplicates)}/{len(expected_duplicates)} found, "
+              f"{len(found_duplicates - expected_duplicates)} wrong")
+        failed = found_blank != expected_blank or found_duplicates != expected_duplicates
+
+        # Every page differs from all others but shares their margins, line
+        # spacing and page number position
+        for scan in (False, True):
+            make_text_pages_pdf(input_path, args.text_pages, scan=scan, seed=args.seed)
+            result = find_cleanup_pages(input_path)
+            print(f"{args.text_pages} distinct text pages ({'scanned' if scan else 'vector'}): "
+                  f"{len(result['blank'])} blank, {len(result['duplicates'])} duplicates")
+            failed = failed or bool(result['blank'] or result['duplicates'])
+
+    if failed:
+        print("Pages were missed or flagged wrongly")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Measures register/login throughput of the database layer under concurrent clients.
+
+Usage: python -m benchmarks.bench_db [--clients 50] [--users 20] [--with-hashing] [--cs50]
+
+Each client registers its own users and then logs each of them in, issuing
+the same statements as register_user and authenticate_user. Password
+hashing is skipped unless --with-hashing is given, since it would otherwise
+dominate the timings. --cs50 runs the same load through cs50.SQL for
+comparison, if it is installed.
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from database import Database
+from helpers import authenticate_user, register_user
+
+
+def make_db(path):
+    connection = sqlite3.connect(path)
+    with open('schema.sql') as f:
+        connection.executescript(f.read())
+    connection.close()
+
+
+def run_client(db, client, users, with_hashing, errors, latencies):
+    for i in range(users):
+        username = f"user_{client}_{i}"
+        try:
+            start = time.perf_counter()
+            if with_hashing:
+                register_user(db, username, "password")
+            else:
+                db.execute("INSERT INTO users (username, hash) VALUES (?, ?)", username, "hash")
+            latencies.append(time.perf_counter() - start)
+        except Exception as e:
+            errors.append(repr(e))
+
+    for i in range(users):
+        username = f"user_{client}_{i}"
+        try:
+            start = time.perf_counter()
+            if with_hashing:
+                authenticate_user(db, username, "password")
+            else:
+                db.execute("SELECT * FROM users WHERE username = ?", username)
+            latencies.append(time.perf_counter() - start)
+        except Exception as e:
+            errors.append(repr(e))
+
+
+def run(name, db, clients, users, with_hashing):
+    errors = []
+    latencies = []
+    threads = [
+        threading.Thread(target=run_client, args=(db, client, users, with_hashing, errors, latencies))
+        for client in range(clients)
+    ]
+
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000 if latencies else 0.0
+    print(f"{name:>9}: {len(latencies) / seconds:9.0f} ops/s  p99 {p99:7.2f} ms  errors {len(errors)}")
+    if errors:
+        print(f"           first error: {errors[0]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--users', type=int, default=20, help="users registered and logged in per client")
+    parser.add_argument('--pool-size', type=int, default=8)
+    parser.add_argument('--with-hashing', action='store_true', help="hash passwords like the app does")
+    parser.add_argument('--cs50', action='store_true', help="also run through cs50.SQL")
+    args = parser.parse_args()
+
+    print(f"{args.clients} clients x {args.users} users, register + login")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'pooled.db')
+        make_db(path)
+        run('pooled', Database(path, pool_size=args.pool_size), args.clients, args.users, args.with_hashing)
+
+        if args.cs50:
+            try:
+                from cs50 import SQL
+            except ImportError:
+                print("cs50 is not installed, skipping")
+                return
+            path = os.path.join(tmp, 'cs50.db')
+            make_db(path)
+            run('cs50', SQL(f"sqlite:///{path}"), args.clients, args.users, args.with_hashing)
+
+
+if __name__ == '__main__':
+    main()
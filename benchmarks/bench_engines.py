@@ -0,0 +1,56 @@
+"""
+Compares the slicing engines head to head on the benchmark corpus.
+
+Every engine slices and reorders each document (mode 1) and reorders the
+sliced result, each run in a fresh process; wall time, peak RSS and output
+size are printed side by side.
+
+Usage: python -m benchmarks.bench_engines [--only text-1000,scan-1000] [--repeat 3]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+
+from benchmarks.common import measure
+from benchmarks.suite import get_corpus_file
+from slice_and_reorder.engines import ENGINES, get_engine
+
+DOCUMENTS = ['text-100', 'text-1000', 'text-4000', 'scan-1000', 'rotated-1000']
+
+
+def slice_and_reorder(name, input_path, output_path):
+    get_engine(name).slice_and_reorder(input_path, output_path, 1)
+
+
+def reorder(name, input_path, output_path):
+    get_engine(name).reorder(input_path, output_path, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--only', help="comma separated corpus documents to run")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per engine; the median time is kept")
+    parser.add_argument('--corpus-dir', default=os.path.join(tempfile.gettempdir(), 'pdf_bench_corpus'))
+    args = parser.parse_args()
+
+    names = args.only.split(',') if args.only else DOCUMENTS
+    with tempfile.TemporaryDirectory() as tmp:
+        sliced_path = os.path.join(tmp, 'sliced.pdf')
+        output_path = os.path.join(tmp, 'output.pdf')
+        for document in names:
+            input_path = get_corpus_file(args.corpus_dir, document)
+            get_engine('pypdf').slice_and_reorder(input_path, sliced_path, 4)
+
+            for operation, fn, source in (('slice+reorder', slice_and_reorder, input_path),
+                                          ('reorder', reorder, sliced_path)):
+                for engine in ENGINES:
+                    runs = [measure(fn, engine, source, output_path) for _ in range(args.repeat)]
+                    seconds = statistics.median(seconds for seconds, _ in runs)
+                    peak_mb = max(peak_kb for _, peak_kb in runs) / 1024
+                    print(f"{document:>12} {operation:>13} {engine:>6}: {seconds:7.3f} s  peak RSS {peak_mb:7.1f} MB  "
+                          f"output {os.path.getsize(output_path) / 2**20:7.2f} MB", flush=True)
+
+
+if __name__ == '__main__':
+    main()
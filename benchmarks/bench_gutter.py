@@ -0,0 +1,59 @@
+"""
+Measures what gutter detection adds to slicing, and how close it gets.
+
+Usage: python -m benchmarks.bench_gutter [--pages 1000] [--dpi 100] [--shift 40] [--workers 1]
+
+The input is a synthetic book scan whose folds are shifted from the middle
+by up to --shift points. Slicing runs without detection, with detection
+(cold), and with detection answered from the cache, as when the same scan
+is sliced again in another mode.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.synthetic import make_book_scan_pdf
+from disk_cache import DiskCache
+from slice_and_reorder.gutter import find_splits
+from slice_and_reorder.pipeline import slice_and_reorder_pdf
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pages', type=int, default=1000)
+    parser.add_argument('--dpi', type=int, default=100, help="resolution of the synthetic scan")
+    parser.add_argument('--shift', type=float, default=40, help="largest fold shift, in points")
+    parser.add_argument('--workers', type=int, default=1, help="processes for slicing and detection")
+    parser.add_argument('--mode', type=int, default=1)
+    args = parser.parse_args()
+
+    random.seed(0)
+    offsets = [random.uniform(-args.shift, args.shift) for _ in range(args.pages)]
+    width = 842
+
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path = os.path.join(tmp, 'input.pdf')
+        make_book_scan_pdf(input_path, offsets, width=width, dpi=args.dpi)
+        cache = DiskCache(os.path.join(tmp, 'splits'), 16 * 1024 ** 2, suffix='.json')
+
+        print(f"{args.pages} pages, folds shifted up to {args.shift:g} pt")
+        baseline = None
+        for name, auto_split in [('middle', False), ('detect', True), ('cached', True)]:
+            output_path = os.path.join(tmp, f'{name}.pdf')
+            start = time.perf_counter()
+            slice_and_reorder_pdf(input_path, output_path, args.mode, shards=args.workers, auto_split=auto_split,
+                                  split_cache=cache)
+            seconds = time.perf_counter() - start
+            baseline = baseline or seconds
+            print(f"{name:>8}: {seconds:7.2f} s  ({seconds / baseline:5.2f}x)")
+
+        splits = find_splits(input_path, cache=cache)
+        errors = sorted(abs(split * width - (width / 2 + offset)) for split, offset in zip(splits, offsets))
+        print(f"fold error: mean {sum(errors) / len(errors):.2f} pt, max {errors[-1]:.2f} pt"
+              f" (middle cut: mean {sum(abs(o) for o in offsets) / len(offsets):.2f} pt)")
+
+
+if __name__ == '__main__':
+    main()
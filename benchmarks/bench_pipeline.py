@@ -0,0 +1,45 @@
+"""
+Compares the two-step slice + reorder with the fused single-pass pipeline.
+
+Both run on the pypdf engine; bench_engines.py compares the engines.
+
+Usage: python -m benchmarks.bench_pipeline [--pages 600] [--mode 1]
+"""
+import argparse
+import os
+import tempfile
+from functools import partial
+
+from benchmarks.common import measure
+from benchmarks.synthetic import make_spreads_pdf
+from slice_and_reorder.pipeline import slice_and_reorder_pdf
+from slice_and_reorder.reorder import reorder_pdf
+from slice_and_reorder.slice import slice_pdf
+
+
+def two_step(input_path, output_path, mode):
+    sliced_path = output_path + '.sliced.pdf'
+    slice_pdf(input_path, sliced_path)
+    reorder_pdf(sliced_path, output_path, mode=mode)
+    os.remove(sliced_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pages', type=int, default=600)
+    parser.add_argument('--mode', type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path = os.path.join(tmp, 'input.pdf')
+        make_spreads_pdf(input_path, args.pages)
+
+        print(f"{args.pages} pages, mode {args.mode}")
+        for name, fn in [('two-step', two_step), ('fused', partial(slice_and_reorder_pdf, engine='pypdf'))]:
+            output_path = os.path.join(tmp, f'{name}.pdf')
+            seconds, peak_kb = measure(fn, input_path, output_path, args.mode)
+            print(f"{name:>10}: {seconds:7.2f} s  peak RSS {peak_kb / 1024:7.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Compares request latency of the session backends with many live sessions.
+
+Usage: python -m benchmarks.bench_sessions [--sessions 100000] [--requests 2000] [--backends filesystem,sqlite,memory]
+
+Every backend is filled with --sessions logged-in sessions, then a small
+Flask app serves requests for randomly chosen ones: half only read the
+session (like most page views), half change it (like a flash message).
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+import warnings
+
+from flask import Flask, session
+
+from session_store import MemorySessionStore, SqliteSessionStore, StoredSessionInterface
+
+
+def make_app(backend, tmp, count):
+    """Flask app using backend, filled with count sessions. Returns (app, sids)."""
+    app = Flask(__name__)
+    app.secret_key = "bench"
+    app.config["SESSION_PERMANENT"] = False
+
+    @app.route('/read')
+    def read():
+        return str(session.get("user_id"))
+
+    @app.route('/write')
+    def write():
+        session["visits"] = session.get("visits", 0) + 1
+        return str(session["visits"])
+
+    sids = [f"bench{i:08d}" for i in range(count)]
+    expires_at = time.time() + app.permanent_session_lifetime.total_seconds()
+
+    if backend == 'filesystem':
+        from cachelib.file import FileSystemCache
+        from flask_session import Session
+
+        app.config["SESSION_TYPE"] = "filesystem"
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", DeprecationWarning)
+            Session(app)
+        # No file count threshold, or the cache would prune down to 500 sessions
+        cache = FileSystemCache(os.path.join(tmp, 'flask_session'), threshold=0)
+        app.session_interface.cache = cache
+        prefix = app.config.get("SESSION_KEY_PREFIX", "session:")
+        for i, sid in enumerate(sids):
+            cache.set(prefix + sid, {"user_id": i}, timeout=0)
+
+    elif backend == 'sqlite':
+        path = os.path.join(tmp, 'sessions.db')
+        store = SqliteSessionStore(path)
+        serializer = StoredSessionInterface.serializer
+        connection = sqlite3.connect(path)
+        connection.executemany(
+            "INSERT INTO sessions (id, data, expires_at) VALUES (?, ?, ?)",
+            ((sid, serializer.dumps({"user_id": i}), expires_at) for i, sid in enumerate(sids)))
+        connection.commit()
+        connection.close()
+        app.session_interface = StoredSessionInterface(store)
+
+    elif backend == 'memory':
+        store = MemorySessionStore()
+        serializer = StoredSessionInterface.serializer
+        for i, sid in enumerate(sids):
+            store.set(sid, serializer.dumps({"user_id": i}), expires_at)
+        app.session_interface = StoredSessionInterface(store)
+
+    else:
+        raise ValueError(f"Unknown backend: {backend}")
+
+    return app, sids
+
+
+def percentile(samples, fraction):
+    return sorted(samples)[int(len(samples) * fraction) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=100_000)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--backends', default='filesystem,sqlite,memory')
+    args = parser.parse_args()
+
+    print(f"{args.sessions} live sessions, {args.requests} requests per route")
+
+    for backend in args.backends.split(','):
+        with tempfile.TemporaryDirectory() as tmp:
+            start = time.perf_counter()
+            app, sids = make_app(backend, tmp, args.sessions)
+            fill = time.perf_counter() - start
+
+            client = app.test_client()
+            results = []
+            for route in ('/read', '/write'):
+                samples = []
+                for _ in range(args.requests):
+                    client.set_cookie(app.config["SESSION_COOKIE_NAME"], random.choice(sids))
+                    start = time.perf_counter()
+                    response = client.get(route)
+                    samples.append(time.perf_counter() - start)
+                    assert response.status_code == 200 and response.data != b'None', backend
+                results.append(f"{route} mean {sum(samples) / len(samples) * 1000:6.2f} ms"
+                               f" p99 {percentile(samples, 0.99) * 1000:6.2f} ms")
+
+            print(f"{backend:>10} (filled in {fill:5.1f} s): " + "  ".join(results))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""
+Measures how sharded slicing scales from 1 to N worker processes.
+
+Usage: python -m benchmarks.bench_shards [--pages 2000] [--max-shards N] [--scan]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.synthetic import make_scan_pdf, make_spreads_pdf
+from slice_and_reorder.pipeline import slice_and_reorder_pdf
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pages', type=int, default=2000)
+    parser.add_argument('--max-shards', type=int, default=os.cpu_count())
+    parser.add_argument('--mode', type=int, default=1)
+    parser.add_argument('--scan', action='store_true', help="use image scans instead of text pages")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path = os.path.join(tmp, 'input.pdf')
+        if args.scan:
+            make_scan_pdf(input_path, args.pages, dpi=30)
+        else:
+            make_spreads_pdf(input_path, args.pages)
+
+        print(f"{args.pages} pages, mode {args.mode}")
+        baseline = None
+        shards = 1
+        while shards <= args.max_shards:
+            output_path = os.path.join(tmp, f'out_{shards}.pdf')
+            start = time.perf_counter()
+            # Only the pypdf engine shards
+            slice_and_reorder_pdf(input_path, output_path, args.mode, shards=shards, engine='pypdf')
+            seconds = time.perf_counter() - start
+            baseline = baseline or seconds
+            print(f"{shards:>3} shards: {seconds:7.2f} s  speedup {baseline / seconds:5.2f}x")
+            shards *= 2
+
+
+if __name__ == '__main__':
+    main()
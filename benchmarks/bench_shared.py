@@ -0,0 +1,55 @@
+"""
+Compares slicing with shared page content against deep copied halves.
+
+Reports time, peak RSS, output size and the number of distinct image
+objects in the output (which should equal the number of source scans;
+tests/test_slice.py checks that for every engine).
+
+Usage: python -m benchmarks.bench_shared [--pages 100] [--mode 1]
+"""
+import argparse
+import os
+import tempfile
+from functools import partial
+
+import fitz
+
+from benchmarks.common import measure
+from benchmarks.synthetic import make_scan_pdf
+from slice_and_reorder.pipeline import slice_and_reorder_pdf
+
+
+def count_images(path):
+    """Returns the number of distinct image objects used by the pages of path."""
+    doc = fitz.open(path)
+    xrefs = {img[0] for page in doc for img in page.get_images()}
+    doc.close()
+    return len(xrefs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pages', type=int, default=100)
+    parser.add_argument('--mode', type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path = os.path.join(tmp, 'input.pdf')
+        make_scan_pdf(input_path, args.pages)
+        input_size = os.path.getsize(input_path)
+
+        print(f"{args.pages} scanned pages ({input_size / 2**20:.1f} MB), "
+              f"{count_images(input_path)} images, mode {args.mode}")
+        for shared in (False, True):
+            name = 'shared' if shared else 'deepcopy'
+            output_path = os.path.join(tmp, f'{name}.pdf')
+            # Only the pypdf engine can deep copy
+            seconds, peak_kb = measure(partial(slice_and_reorder_pdf, engine='pypdf'), input_path, output_path,
+                                       args.mode, shared)
+            size = os.path.getsize(output_path)
+            print(f"{name:>10}: {seconds:7.2f} s  peak RSS {peak_kb / 1024:7.1f} MB  "
+                  f"output {size / 2**20:7.1f} MB  {count_images(output_path)} images")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+Checks that the stream engine's peak RSS does not grow with page count.
+
+Scans of 100 to 5,000 pages are sliced and reordered (mode 1) by every
+engine, each run in a fresh process, and their time and peak RSS are
+printed. Exits with status 1 if the stream engine's peak at the largest
+size is more than --tolerance MB above its peak at the smallest.
+
+Usage: python -m benchmarks.bench_stream [--pages 100,1000,5000] [--tolerance 20]
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+from benchmarks.common import measure
+from benchmarks.synthetic import make_corpus_pdf
+from slice_and_reorder.engines import ENGINES, get_engine
+
+# Low resolution keeps the 5,000 page scan around 200 MB
+DPI = 20
+
+
+def slice_and_reorder(name, input_path, output_path):
+    get_engine(name).slice_and_reorder(input_path, output_path, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pages', default='100,1000,5000', help="comma separated page counts")
+    parser.add_argument('--tolerance', type=float, default=20, help="allowed growth of the peak, in MB")
+    parser.add_argument('--corpus-dir', default=os.path.join(tempfile.gettempdir(), 'pdf_bench_corpus'))
+    args = parser.parse_args()
+
+    os.makedirs(args.corpus_dir, exist_ok=True)
+    page_counts = sorted(int(n) for n in args.pages.split(','))
+    peaks = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        output_path = os.path.join(tmp, 'output.pdf')
+        for num_pages in page_counts:
+            input_path = os.path.join(args.corpus_dir, f'stream-scan-{num_pages}-v1.pdf')
+            if not os.path.exists(input_path):
+                make_corpus_pdf(input_path, num_pages, kind='scan', dpi=DPI)
+            input_mb = os.path.getsize(input_path) / 2**20
+
+            for engine in ENGINES:
+                seconds, peak_kb = measure(slice_and_reorder, engine, input_path, output_path)
+                peaks[engine, num_pages] = peak_kb / 1024
+                print(f"{num_pages:>6} pages ({input_mb:6.1f} MB) {engine:>6}: {seconds:7.3f} s  "
+                      f"peak RSS {peak_kb / 1024:7.1f} MB", flush=True)
+
+    growth = peaks['stream', page_counts[-1]] - peaks['stream', page_counts[0]]
+    print(f"stream peak RSS grew {growth:.1f} MB from {page_counts[0]} to {page_counts[-1]} pages")
+    if growth > args.tolerance:
+        print(f"More than the allowed {args.tolerance:g} MB")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+"""
+Checks that every slicing engine gives the same pages as the golden order.
+
+Labelled spreads are sliced and reordered by every engine in all four
+modes, at every rotation, with pages inheriting their attributes from the
+page tree, and cut in the middle or at uneven splits. Every output page
+must show the expected half (found by its label) with the same /MediaBox,
+/CropBox and /Rotate as the other engines. Exits with status 1 otherwise.
+
+Usage: python -m benchmarks.check_engines [--pages 6]
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+import fitz
+
+from slice_and_reorder.engines import ENGINES, get_engine
+from slice_and_reorder.reorder import get_page_order
+
+MODES = (1, 2, 3, 4)
+
+# Name -> (rotations, inherited)
+VARIANTS = {
+    'upright': ((0,), False),
+    'rotated-90': ((90,), False),
+    'rotated-180': ((180,), False),
+    'rotated-270': ((270,), False),
+    'mixed': ((0, 90, 180, 270), False),
+    'inherited': ((90,), True),
+}
+
+
+def make_labelled_pdf(path, num_pages, rotations, inherited=False, width=842, height=595):
+    """
+    Writes spreads labelled 'Spread n left' and 'Spread n right' on their
+    displayed halves.
+
+    Args:
+        rotations (tuple): /Rotate of the pages, cycled through.
+        inherited (bool): Move /MediaBox and /Rotate of the pages to the
+            root of the page tree (all pages must then share them).
+    """
+    doc = fitz.open()
+    for i in range(num_pages):
+        rotation = rotations[i % len(rotations)]
+        if rotation in (90, 270):
+            page = doc.new_page(width=height, height=width)
+        else:
+            page = doc.new_page(width=width, height=height)
+        page.set_rotation(rotation)
+        for x, side in ((48, 'left'), (width / 2 + 48, 'right')):
+            point = fitz.Point(x, 72) * page.derotation_matrix
+            page.insert_text(point, f"Spread {i + 1} {side}", fontsize=12, rotate=rotation)
+
+    if inherited:
+        root = int(doc.xref_get_key(doc.pdf_catalog(), 'Pages')[1].split()[0])
+        first = doc.page_xref(0)
+        for key in ('MediaBox', 'Rotate'):
+            doc.xref_set_key(root, key, doc.xref_get_key(first, key)[1])
+        for i in range(num_pages):
+            xref = doc.page_xref(i)
+            source = doc.xref_object(xref, compressed=True)
+            for key in ('MediaBox', 'Rotate'):
+                value = doc.xref_get_key(xref, key)[1]
+                source = source.replace(f"/{key} {value}", '').replace(f"/{key}{value}", '')
+            doc.update_object(xref, source)
+    doc.save(path)
+    doc.close()
+
+
+def get_expected_labels(num_pages, mode):
+    """Label of the half at every output position."""
+    return [f"Spread {half // 2 + 1} {'right' if half % 2 else 'left'}"
+            for half in get_page_order(2 * num_pages, mode)]
+
+
+def read_pages(path):
+    """(label, media box, crop box, rotation) of every page of path."""
+    pages = []
+    with fitz.open(path) as doc:
+        for page in doc:
+            # Only text inside the crop box is extracted
+            label = ' '.join(page.get_text().split())
+            pages.append((label, _get_box(doc, page.xref, 'MediaBox'), _get_box(doc, page.xref, 'CropBox'),
+                          page.rotation))
+    return pages
+
+
+def _get_box(doc, xref, key):
+    # Inherited from the page tree, if not on the page
+    while doc.xref_get_key(xref, key)[0] == 'null' and doc.xref_get_key(xref, 'Parent')[0] == 'xref':
+        xref = int(doc.xref_get_key(xref, 'Parent')[1].split()[0])
+    value = doc.xref_get_key(xref, key)[1]
+    return tuple(round(float(v), 3) for v in value.strip('[] ').split())
+
+
+def compare(outputs, expected):
+    """
+    Compares the pages of every engine's output with the expected labels
+    and with each other. Returns a list of differences.
+    """
+    problems = []
+    pages = {name: read_pages(path) for name, path in outputs.items()}
+    reference_name = next(iter(pages))
+    for name, engine_pages in pages.items():
+        labels = [label for label, *_ in engine_pages]
+        if labels != expected:
+            problems.append(f"{name}: pages {labels} instead of {expected}")
+        elif engine_pages != pages[reference_name]:
+            for number, (page, reference) in enumerate(zip(engine_pages, pages[reference_name]), 1):
+                if page != reference:
+                    problems.append(f"{name}: page {number} is {page}, {reference_name} gives {reference}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pages', type=int, default=6)
+    args = parser.parse_args()
+
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        for variant, (rotations, inherited) in VARIANTS.items():
+            input_path = os.path.join(tmp, f'{variant}.pdf')
+            make_labelled_pdf(input_path, args.pages, rotations, inherited)
+
+            # Uneven splits must keep the labels inside their halves
+            for splits in (None, [0.45 if i % 2 else 0.55 for i in range(args.pages)]):
+                for mode in MODES:
+                    outputs = {}
+                    for name in ENGINES:
+                        outputs[name] = os.path.join(tmp, f'{name}.pdf')
+                        get_engine(name).slice_and_reorder(input_path, outputs[name], mode, splits=splits)
+                    problems = compare(outputs, get_expected_labels(args.pages, mode))
+
+                    # Reordering an already sliced file
+                    sliced_path = os.path.join(tmp, 'sliced.pdf')
+                    get_engine('pypdf').slice_and_reorder(input_path, sliced_path, 4, splits=splits)
+                    reordered = {}
+                    for name in ENGINES:
+                        reordered[name] = os.path.join(tmp, f'{name}-reordered.pdf')
+                        get_engine(name).reorder(sliced_path, reordered[name], mode)
+                    problems += compare(reordered, get_expected_labels(args.pages, mode))
+
+                    cut = 'uneven' if splits else 'middle'
+                    print(f"{variant:>12} {cut:>6} mode {mode}: {'FAIL' if problems else 'ok'}")
+                    for problem in problems:
+                        print(f"    {problem}")
+                    failures += bool(problems)
+
+    if failures:
+        print(f"{failures} case(s) differ")
+        sys.exit(1)
+    print("All engines agree")
+
+
+if __name__ == '__main__':
+    main()
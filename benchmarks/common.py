@@ -0,0 +1,46 @@
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+
+def _run(fn, args, queue):
+    start = time.perf_counter()
+    fn(*args)
+    seconds = time.perf_counter() - start
+
+    queue.put((seconds, get_peak_rss_kb()))
+
+
+def get_peak_rss_kb():
+    """Peak RSS of this process in KB."""
+    # ru_maxrss survives exec on Linux, so a spawned process would report
+    # its parent's peak; VmHWM starts over
+    if os.path.exists('/proc/self/status'):
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        peak //= 1024
+    return peak
+
+
+def measure(fn, *args):
+    """
+    Runs fn(*args) in a fresh process.
+
+    Returns:
+        tuple: (wall clock seconds, peak RSS in KB) of that process.
+    """
+    ctx = multiprocessing.get_context('spawn')
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_run, args=(fn, args, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
@@ -0,0 +1,215 @@
+"""
+Benchmark suite for slicing, reordering and page deletion.
+
+Every operation runs on a corpus of synthetic PDFs (text, image scans and
+mixed rotations, up to thousands of pages), each time in a fresh process,
+and its wall time, peak RSS and output size are recorded as JSON; optimize
+rewrites the output of the last pipeline run. compare flags the operations
+that got worse than a saved baseline.
+
+Usage:
+    python -m benchmarks.suite run [--out results.json] [--quick] [--only text-100,scan-100] [--repeat 3]
+    python -m benchmarks.suite compare baseline.json results.json [--threshold 0.1]
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+from datetime import datetime, timezone
+
+import fitz
+import pypdf
+
+from benchmarks.common import measure
+from benchmarks.synthetic import make_corpus_pdf
+from slice_and_reorder.optimize import optimize_pdf
+from slice_and_reorder.pipeline import slice_and_reorder_pdf
+from slice_and_reorder.reorder import reorder_pdf
+from slice_and_reorder.slice import slice_pdf
+from slice_and_reorder.utils import delete_page_from_pdf
+
+# Bump whenever make_corpus_pdf or CORPUS changes, so results measured on
+# different inputs are not compared
+CORPUS_VERSION = 1
+
+# Name -> (kind, pages, rotations); see make_corpus_pdf
+CORPUS = {
+    'text-100': ('text', 100, (0,)),
+    'text-1000': ('text', 1000, (0,)),
+    'text-4000': ('text', 4000, (0,)),
+    'scan-100': ('scan', 100, (0,)),
+    'scan-1000': ('scan', 1000, (0,)),
+    'rotated-100': ('mixed', 100, (0, 90, 180, 270)),
+    'rotated-1000': ('mixed', 1000, (0, 90, 180, 270)),
+}
+
+# A subset that runs in about a minute
+QUICK = ['text-100', 'scan-100', 'rotated-100']
+
+MODES = (1, 2, 3, 4)
+
+METRICS = ('seconds', 'peak_rss_mb', 'output_bytes')
+
+
+def get_corpus_file(corpus_dir, name):
+    """Path of a corpus document, generated on first use."""
+    kind, pages, rotations = CORPUS[name]
+    path = os.path.join(corpus_dir, f"{name}-v{CORPUS_VERSION}.pdf")
+    if not os.path.exists(path):
+        os.makedirs(corpus_dir, exist_ok=True)
+        print(f"generating {name} ...", flush=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        make_corpus_pdf(tmp_path, pages, kind=kind, rotations=rotations)
+        os.replace(tmp_path, path)
+    return path
+
+
+def run_operation(fn, args, output_path, repeat):
+    """
+    Measures fn(*args) repeat times, each in a fresh process.
+
+    Returns:
+        dict: Median seconds, highest peak RSS and the size of output_path.
+    """
+    runs = []
+    for _ in range(repeat):
+        runs.append(measure(fn, *args))
+    return {
+        'seconds': round(statistics.median(seconds for seconds, _ in runs), 4),
+        'peak_rss_mb': round(max(peak_kb for _, peak_kb in runs) / 1024, 1),
+        'output_bytes': os.path.getsize(output_path),
+    }
+
+
+def run_document(input_path, tmp, repeat):
+    """Runs every operation on one document; returns {operation: metrics}."""
+    results = {}
+    sliced_path = os.path.join(tmp, 'sliced.pdf')
+    output_path = os.path.join(tmp, 'output.pdf')
+    optimized_path = os.path.join(tmp, 'optimized.pdf')
+
+    results['slice'] = run_operation(slice_pdf, (input_path, sliced_path), sliced_path, repeat)
+    for mode in MODES:
+        results[f'reorder-{mode}'] = run_operation(reorder_pdf, (sliced_path, output_path, mode), output_path,
+                                                   repeat)
+    for mode in MODES:
+        results[f'pipeline-{mode}'] = run_operation(slice_and_reorder_pdf, (input_path, output_path, mode),
+                                                    output_path, repeat)
+    results['optimize'] = run_operation(optimize_pdf, (output_path, optimized_path), optimized_path, repeat)
+
+    # Delete the middle page of a fresh copy each time
+    with fitz.open(input_path) as doc:
+        middle = len(doc) // 2
+    runs = []
+    for _ in range(repeat):
+        shutil.copyfile(input_path, output_path)
+        runs.append(run_operation(delete_page_from_pdf, (output_path, middle), output_path, 1))
+    results['delete'] = {
+        'seconds': statistics.median(run['seconds'] for run in runs),
+        'peak_rss_mb': max(run['peak_rss_mb'] for run in runs),
+        'output_bytes': runs[-1]['output_bytes'],
+    }
+    return results
+
+
+def run(args):
+    names = args.only.split(',') if args.only else QUICK if args.quick else list(CORPUS)
+    unknown = [name for name in names if name not in CORPUS]
+    if unknown:
+        sys.exit(f"Unknown corpus documents: {', '.join(unknown)} (known: {', '.join(CORPUS)})")
+
+    report = {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'corpus_version': CORPUS_VERSION,
+        'repeat': args.repeat,
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'pypdf': pypdf.__version__,
+            'pymupdf': fitz.VersionBind,
+        },
+        'results': {},
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in names:
+            input_path = get_corpus_file(args.corpus_dir, name)
+            results = run_document(input_path, tmp, args.repeat)
+            report['results'][name] = results
+            for operation, metrics in results.items():
+                print(f"{name:>13} {operation:>10}: {metrics['seconds']:8.3f} s  "
+                      f"peak RSS {metrics['peak_rss_mb']:7.1f} MB  output {metrics['output_bytes'] / 2**20:8.2f} MB",
+                      flush=True)
+
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.out}")
+
+
+def compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.results) as f:
+        results = json.load(f)
+
+    if baseline.get('corpus_version') != results.get('corpus_version'):
+        sys.exit("The two runs used different corpus versions; they can't be compared.")
+
+    regressions = 0
+    for name, operations in results['results'].items():
+        for operation, metrics in operations.items():
+            old = baseline['results'].get(name, {}).get(operation)
+            if old is None:
+                continue
+
+            changes = []
+            for metric in METRICS:
+                before, after = old[metric], metrics[metric]
+                change = (after - before) / before if before else 0.0
+                worse = change > args.threshold
+                # Differences below the timer noise are not regressions
+                if metric == 'seconds' and after - before < args.min_seconds:
+                    worse = False
+                regressions += worse
+                changes.append(f"{metric} {before:,} -> {after:,} ({change:+.1%}){' REGRESSION' if worse else ''}")
+            print(f"{name:>13} {operation:>10}: " + ', '.join(changes))
+
+    if regressions:
+        print(f"{regressions} regression(s) beyond {args.threshold:.0%}")
+        sys.exit(1)
+    print(f"No regressions beyond {args.threshold:.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help="measure every operation on the corpus")
+    run_parser.add_argument('--out', default='bench_results.json', help="JSON file to write the results to")
+    run_parser.add_argument('--quick', action='store_true', help=f"only {', '.join(QUICK)}")
+    run_parser.add_argument('--only', help="comma separated corpus documents to run")
+    run_parser.add_argument('--repeat', type=int, default=3, help="runs per operation; the median time is kept")
+    run_parser.add_argument('--corpus-dir', default=os.path.join(tempfile.gettempdir(), 'pdf_bench_corpus'),
+                            help="where generated documents are kept between runs")
+
+    compare_parser = commands.add_parser('compare', help="flag regressions against a baseline")
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('results')
+    compare_parser.add_argument('--threshold', type=float, default=0.1, help="allowed relative increase")
+    compare_parser.add_argument('--min-seconds', type=float, default=0.02,
+                                help="time differences below this are ignored")
+
+    args = parser.parse_args()
+    if args.command == 'run':
+        run(args)
+    else:
+        compare(args)
+
+
+if __name__ == '__main__':
+    main()
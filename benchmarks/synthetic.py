@@ -0,0 +1,209 @@
+import os
+
+import fitz
+import numpy as np
+
+
+def make_spreads_pdf(path, num_pages, width=842, height=595):
+    """
+    Writes a synthetic document of landscape two-page spreads.
+
+    Each spread gets a line of text on either half so the output can be
+    checked by eye.
+    """
+    doc = fitz.open()
+    for i in range(num_pages):
+        page = doc.new_page(width=width, height=height)
+        page.insert_text((72, 72), f"Spread {i + 1} left", fontsize=18)
+        page.insert_text((width / 2 + 72, 72), f"Spread {i + 1} right", fontsize=18)
+        page.draw_line((width / 2, 0), (width / 2, height))
+    doc.save(path, garbage=3, deflate=True)
+    doc.close()
+
+
+def make_scan_pdf(path, num_pages, width=842, height=595, dpi=100):
+    """
+    Writes a synthetic scan: every spread is one full-page grayscale image.
+
+    The image data is random so it does not compress away, like real scans.
+    """
+    px_w = int(width / 72 * dpi)
+    px_h = int(height / 72 * dpi)
+
+    doc = fitz.open()
+    for i in range(num_pages):
+        page = doc.new_page(width=width, height=height)
+        pix = fitz.Pixmap(fitz.csGRAY, px_w, px_h, os.urandom(px_w * px_h), False)
+        page.insert_image(page.rect, pixmap=pix)
+    doc.save(path, deflate=True)
+    doc.close()
+
+
+def make_book_scan_pdf(path, offsets, width=842, height=595, dpi=100, rotation=0):
+    """
+    Writes a synthetic scan of an open book: every page is one grayscale
+    image of two pages of text, with a shaded fold between them.
+
+    Args:
+        offsets (list): Shift of the fold from the middle of each spread,
+            in points; one page is written per offset.
+        rotation (int): /Rotate of the pages; the spreads are displayed
+            upright.
+    """
+    margin = 48
+    line_height = 14
+    doc = fitz.open()
+    spread = fitz.open()
+    for i, offset in enumerate(offsets):
+        fold = width / 2 + offset
+
+        page = spread.new_page(width=width, height=height)
+        for x0 in (0, fold):
+            x1 = fold if x0 == 0 else width
+            for j, y in enumerate(range(margin + line_height, height - margin, line_height)):
+                # Text lines of varying length, from inner to outer margin
+                length = (x1 - x0 - 2 * margin) * (0.6 + 0.4 * ((i + j) % 5) / 4)
+                page.draw_rect(fitz.Rect(x0 + margin, y - 8, x0 + margin + length, y), color=None, fill=0.1)
+        # Shadow of the fold, darkest in the middle
+        for k, gray in enumerate((0.85, 0.75, 0.6, 0.45)):
+            half_width = 10 - 2.5 * k
+            page.draw_rect(fitz.Rect(fold - half_width, 0, fold + half_width, height), color=None, fill=gray)
+
+        pixmap = page.get_pixmap(matrix=fitz.Matrix(dpi / 72, dpi / 72), colorspace=fitz.csGRAY)
+        if rotation in (90, 270):
+            scan = doc.new_page(width=height, height=width)
+        else:
+            scan = doc.new_page(width=width, height=height)
+        scan.set_rotation(rotation)
+        scan.insert_image(scan.mediabox, pixmap=pixmap, rotate=rotation)
+    doc.save(path, deflate=True)
+    doc.close()
+    spread.close()
+
+
+def make_page_scan_pdf(path, num_pages, blank=(), duplicates=(), width=595, height=842, dpi=72, seed=0):
+    """
+    Writes a synthetic scan of single book pages as JPEG images with
+    paper noise, like the output of slicing a scanned booklet.
+
+    Args:
+        blank (set): Indexes of pages left blank but for the page number.
+        duplicates (set): Indexes of pages that repeat the page before
+            them, as when a sheet is fed twice: shifted by a few pixels and
+            with fresh noise.
+    """
+    rng = np.random.default_rng(seed)
+    scale = dpi / 72
+    margin = int(56 * scale)
+    line_height = 14 * scale
+    px_w = int(width * scale)
+    px_h = int(height * scale)
+
+    doc = fitz.open()
+    clean = None
+    for i in range(num_pages):
+        if i not in duplicates or clean is None:
+            clean = np.full((px_h, px_w), 235, dtype=np.uint8)
+            if i not in blank:
+                for y in np.arange(margin + line_height, px_h - 2 * margin, line_height).astype(int):
+                    # Paragraphs of random length with a short last line
+                    if rng.random() < 0.1:
+                        continue
+                    length = (px_w - 2 * margin) * (rng.uniform(0.2, 0.7) if rng.random() < 0.2 else 1)
+                    clean[y - int(8 * scale):y, margin:margin + int(length)] = 40
+            # Page number
+            clean[px_h - margin - int(8 * scale):px_h - margin, px_w // 2 - int(6 * scale):px_w // 2 + int(6 * scale)] = 40
+            shift = (0, 0)
+        else:
+            shift = tuple(rng.integers(-3, 4, size=2))
+
+        image = np.roll(clean, shift, axis=(0, 1)) + rng.normal(0, 6, clean.shape)
+        image = np.clip(image, 0, 255).astype(np.uint8)
+        scan = fitz.Pixmap(fitz.csGRAY, px_w, px_h, image.tobytes(), False)
+        doc.new_page(width=width, height=height).insert_image(fitz.Rect(0, 0, width, height),
+                                                              stream=scan.tobytes('jpeg', jpg_quality=75))
+    doc.save(path)
+    doc.close()
+
+
+def make_text_pages_pdf(path, num_pages, scan=False, width=595, height=842, dpi=150, seed=0):
+    """
+    Writes distinct pages of body text: paragraphs of random words, set
+    ragged or justified, with a page number at the bottom.
+
+    Args:
+        scan (bool): Write the pages as JPEG scans with paper noise instead
+            of vector text.
+        dpi (int): Resolution of the scans.
+    """
+    rng = np.random.default_rng(seed)
+    words = ['the', 'quick', 'brown', 'fox', 'jumps', 'over', 'lazy', 'dog', 'lorem', 'ipsum', 'dolor', 'sit',
+             'amet', 'consectetur', 'adipiscing', 'elit', 'sed', 'do', 'eiusmod', 'tempor', 'incididunt', 'ut',
+             'labore', 'et', 'dolore', 'magna', 'aliqua', 'enim', 'ad', 'minim', 'veniam', 'quis', 'nostrud']
+
+    doc = fitz.open()
+    for i in range(num_pages):
+        page = doc.new_page(width=width, height=height)
+        paragraphs = [' '.join(rng.choice(words, rng.integers(40, 120))) for _ in range(6)]
+        justified = i % 2 == 1
+        page.insert_textbox(fitz.Rect(56, 56, width - 56, height - 56),
+                            ' '.join(paragraphs) if justified else '\n\n'.join(paragraphs),
+                            fontsize=11, align=fitz.TEXT_ALIGN_JUSTIFY if justified else fitz.TEXT_ALIGN_LEFT)
+        page.insert_text((width / 2 - 5, height - 32), str(i + 1), fontsize=10)
+    if not scan:
+        doc.save(path, garbage=3, deflate=True)
+        doc.close()
+        return
+
+    scans = fitz.open()
+    for page in doc:
+        pixmap = page.get_pixmap(matrix=fitz.Matrix(dpi / 72, dpi / 72), colorspace=fitz.csGRAY)
+        image = np.frombuffer(pixmap.samples, np.uint8).reshape(pixmap.height, pixmap.width) * 0.92
+        image = np.clip(image + rng.normal(0, 6, image.shape), 0, 255).astype(np.uint8)
+        scan_pixmap = fitz.Pixmap(fitz.csGRAY, pixmap.width, pixmap.height, image.tobytes(), False)
+        scans.new_page(width=width, height=height).insert_image(fitz.Rect(0, 0, width, height),
+                                                                stream=scan_pixmap.tobytes('jpeg', jpg_quality=75))
+    doc.close()
+    scans.save(path)
+    scans.close()
+
+
+def make_corpus_pdf(path, num_pages, kind='text', rotations=(0,), width=842, height=595, dpi=30, seed=0):
+    """
+    Writes a reproducible document of two-page spreads for the benchmark
+    suite.
+
+    Args:
+        kind (str): 'text' (vector text on both halves), 'scan' (one
+            full-page grayscale image of random pixels per spread) or
+            'mixed' (text and scan spreads alternating).
+        rotations (tuple): /Rotate of the pages, cycled through; the
+            spreads are displayed upright whatever the rotation.
+        dpi (int): Resolution of the scan images.
+    """
+    rng = np.random.default_rng(seed)
+    px_w = int(width / 72 * dpi)
+    px_h = int(height / 72 * dpi)
+    words = ['lorem', 'ipsum', 'dolor', 'sit', 'amet', 'consectetur', 'adipiscing', 'elit', 'sed', 'do']
+
+    doc = fitz.open()
+    for i in range(num_pages):
+        rotation = rotations[i % len(rotations)]
+        if rotation in (90, 270):
+            page = doc.new_page(width=height, height=width)
+        else:
+            page = doc.new_page(width=width, height=height)
+        page.set_rotation(rotation)
+
+        if kind == 'scan' or (kind == 'mixed' and i % 2):
+            pixmap = fitz.Pixmap(fitz.csGRAY, px_w, px_h, rng.integers(0, 256, px_w * px_h, dtype=np.uint8).tobytes(),
+                                 False)
+            page.insert_image(page.mediabox, pixmap=pixmap, rotate=rotation)
+        else:
+            # Text is placed on the displayed page and drawn in unrotated page space
+            for x in (48, width / 2 + 48):
+                lines = [' '.join(rng.choice(words, 8)) for _ in range(30)]
+                point = fitz.Point(x, 60) * page.derotation_matrix
+                page.insert_text(point, f"Page {i + 1}\n" + '\n'.join(lines), fontsize=10, rotate=rotation)
+    doc.save(path, garbage=3, deflate=True)
+    doc.close()
@@ -0,0 +1,234 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+# Content-addressed storage for PDFs. Every distinct file is stored once as
+# blobs/<first two hex digits>/<sha256>.pdf; the files users see in their
+# temp and saved folders are hardlinks to these blobs, so the hardlink
+# count doubles as the reference count.
+BLOB_DIR = os.path.join('edited_files', 'blobs')
+
+CHUNK_SIZE = 1024 * 1024
+
+# Blobs changed more recently than this are never collected, so a blob that
+# was just stored is not removed before it is linked into a user folder
+GC_GRACE_SECONDS = 60
+
+
+def get_blob_path(digest):
+    """Get the path of the blob for a SHA-256 hex digest."""
+    return os.path.join(BLOB_DIR, digest[:2], f"{digest}.pdf")
+
+
+def hash_file(path):
+    """Return the SHA-256 hex digest of a file."""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(CHUNK_SIZE):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+# (path, inode, size, mtime) -> digest of recently hashed files
+_digests = OrderedDict()
+_digests_lock = threading.Lock()
+DIGEST_MEMO_SIZE = 1024
+
+
+def get_file_digest(path):
+    """
+    Return the SHA-256 hex digest of a file, hashing it only if it changed
+    since it was last hashed.
+    """
+    stats = os.stat(path)
+    memo_key = (os.path.abspath(path), stats.st_ino, stats.st_size, stats.st_mtime_ns)
+
+    with _digests_lock:
+        digest = _digests.get(memo_key)
+        if digest is not None:
+            _digests.move_to_end(memo_key)
+            return digest
+
+    digest = hash_file(path)
+
+    with _digests_lock:
+        _digests[memo_key] = digest
+        if len(_digests) > DIGEST_MEMO_SIZE:
+            _digests.popitem(last=False)
+    return digest
+
+
+def store_stream(stream):
+    """
+    Store the contents of a binary stream, hashing it while it is written.
+
+    Args:
+        stream: File-like object, e.g. the stream of an uploaded file.
+
+    Returns:
+        tuple: (digest, blob_path)
+    """
+    tmp_dir = os.path.join(BLOB_DIR, 'tmp')
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    h = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir, suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            while chunk := stream.read(CHUNK_SIZE):
+                h.update(chunk)
+                f.write(chunk)
+
+        digest = h.hexdigest()
+        blob_path = get_blob_path(digest)
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+
+        if os.path.exists(blob_path):
+            # Already stored: the upload costs nothing but this temp file
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, blob_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return digest, blob_path
+
+
+def store_file(path):
+    """
+    Store an existing file without copying its bytes.
+
+    The file is hashed and, if its content is new, hardlinked into the
+    store.
+
+    Returns:
+        tuple: (digest, blob_path)
+    """
+    digest = hash_file(path)
+    blob_path = get_blob_path(digest)
+
+    if not os.path.exists(blob_path):
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        try:
+            os.link(path, blob_path)
+        except FileExistsError:
+            pass
+        except OSError:
+            # Hardlinks not supported here: fall back to a copy
+            shutil.copy2(path, blob_path)
+
+    return digest, blob_path
+
+
+def store_hashed_file(path, digest):
+    """
+    Move a file whose SHA-256 is already known into the store, without
+    reading it again. The file is gone afterwards.
+
+    Returns:
+        str: The blob path.
+    """
+    blob_path = get_blob_path(digest)
+    os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+    if os.path.exists(blob_path):
+        os.remove(path)
+    else:
+        os.replace(path, blob_path)
+    return blob_path
+
+
+def _link_or_copy(src, dst):
+    """Hardlink src to dst, copying if the filesystem can't link. Fails if dst exists."""
+    try:
+        os.link(src, dst)
+    except FileExistsError:
+        raise
+    except OSError:
+        with open(src, 'rb') as f_src, open(dst, 'xb') as f_dst:
+            shutil.copyfileobj(f_src, f_dst, CHUNK_SIZE)
+
+
+def link_blob(blob_path, dst_path):
+    """Make dst_path point to a blob, atomically replacing any existing file."""
+    tmp_path = f"{dst_path}.{os.getpid()}.link"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    _link_or_copy(blob_path, tmp_path)
+    os.replace(tmp_path, dst_path)
+    # Renaming onto another link to the same file leaves both in place
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+
+def link_unique(blob_path, folder, filename):
+    """
+    Link a blob into folder under filename, or name(1), name(2)... if taken.
+
+    If a name is already linked to the same blob (the same file uploaded
+    again) that name is reused.
+
+    Returns:
+        str: The name used.
+    """
+    base, ext = os.path.splitext(filename)
+    candidate = filename
+    counter = 1
+
+    while True:
+        path = os.path.join(folder, candidate)
+        try:
+            _link_or_copy(blob_path, path)
+            return candidate
+        except FileExistsError:
+            if os.path.samefile(blob_path, path):
+                return candidate
+
+        candidate = f"{base}({counter}){ext}"
+        counter += 1
+
+
+def detach(path):
+    """
+    Give path its own copy of the data before it is edited in place.
+
+    Files are shared with the store (and possibly other users) through
+    hardlinks, so in-place edits such as incremental saves must never
+    touch a linked file.
+    """
+    if os.stat(path).st_nlink > 1:
+        tmp_path = f"{path}.{os.getpid()}.detach"
+        shutil.copy2(path, tmp_path)
+        os.replace(tmp_path, path)
+
+
+def collect_garbage():
+    """
+    Remove blobs no user file links to any more.
+
+    Returns:
+        int: Bytes freed.
+    """
+    freed = 0
+    if not os.path.exists(BLOB_DIR):
+        return freed
+
+    cutoff = time.time() - GC_GRACE_SECONDS
+
+    for prefix in os.scandir(BLOB_DIR):
+        if not prefix.is_dir() or prefix.name == 'tmp':
+            continue
+        for entry in os.scandir(prefix.path):
+            stats = entry.stat()
+            if stats.st_nlink == 1 and stats.st_ctime < cutoff:
+                try:
+                    os.remove(entry.path)
+                    freed += stats.st_size
+                except OSError as e:
+                    print(f"Error removing {entry.path}: {e}")
+    return freed
@@ -0,0 +1,159 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# How long a statement waits for another connection's write lock before
+# failing with "database is locked", in seconds
+BUSY_TIMEOUT = 30
+
+# Prepared statements kept per connection (sqlite3 caches them by SQL text)
+STATEMENT_CACHE_SIZE = 256
+
+
+class Database:
+    """
+    A small pooled SQLite layer with the calling convention of cs50.SQL.
+
+    execute(sql, *args) returns a list of dicts for statements that return
+    rows, the new row id for an INSERT (None if no row was inserted), the
+    number of rows matched for an UPDATE or DELETE, and True otherwise. A
+    constraint violation raises ValueError, as cs50 does.
+
+    Connections are opened in WAL mode, so readers never block the writer
+    and vice versa, and are shared between threads through a pool. Every
+    statement runs in autocommit mode; use transaction() to group several.
+    """
+
+    def __init__(self, path, pool_size=8):
+        # Like cs50, refuse to silently create an empty database
+        if not os.path.exists(path):
+            raise RuntimeError(f"does not exist: {path}")
+
+        self.path = path
+        self.pool_size = pool_size
+
+        self._lock = threading.Lock()
+        self._pool = queue.LifoQueue()
+        self._opened = 0
+        self._pid = os.getpid()
+
+        # WAL is a property of the file; setting it once is enough
+        with self._connection() as connection:
+            connection.execute("PRAGMA journal_mode = WAL")
+
+    def execute(self, sql, *args):
+        with self._connection() as connection:
+            return _run(connection, sql, args)
+
+    @contextmanager
+    def transaction(self):
+        """
+        Run several statements on one connection in one transaction.
+
+        Usage:
+            with db.transaction() as tx:
+                tx.execute(...)
+        """
+        with self._connection() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield _Transaction(connection)
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+
+    def close(self):
+        """Close the idle connections of the pool."""
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+            with self._lock:
+                self._opened -= 1
+
+    @contextmanager
+    def _connection(self):
+        self._check_fork()
+        connection = self._acquire()
+        try:
+            yield connection
+        except BaseException:
+            # Never hand out a connection left inside a transaction
+            if connection.in_transaction:
+                connection.rollback()
+            raise
+        finally:
+            self._pool.put(connection)
+
+    def _acquire(self):
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_open = self._opened < self.pool_size
+            if can_open:
+                self._opened += 1
+
+        if can_open:
+            try:
+                return self._open()
+            except BaseException:
+                with self._lock:
+                    self._opened -= 1
+                raise
+
+        # Pool exhausted: wait for a connection to come back
+        return self._pool.get()
+
+    def _open(self):
+        connection = sqlite3.connect(
+            self.path,
+            timeout=BUSY_TIMEOUT,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA synchronous = NORMAL")
+        return connection
+
+    def _check_fork(self):
+        # Connections must not be shared with a forked child (e.g. gunicorn
+        # workers forked from a preloaded app); start with an empty pool
+        if os.getpid() != self._pid:
+            with self._lock:
+                if os.getpid() != self._pid:
+                    self._pool = queue.LifoQueue()
+                    self._opened = 0
+                    self._pid = os.getpid()
+
+
+class _Transaction:
+    def __init__(self, connection):
+        self._connection = connection
+
+    def execute(self, sql, *args):
+        return _run(self._connection, sql, args)
+
+
+def _run(connection, sql, args):
+    try:
+        cursor = connection.execute(sql, args)
+    except sqlite3.IntegrityError as e:
+        raise ValueError(str(e)) from e
+
+    if cursor.description is not None:
+        return [dict(row) for row in cursor.fetchall()]
+
+    command = sql.lstrip().split(None, 1)[0].upper()
+    if command == "INSERT":
+        return cursor.lastrowid if cursor.rowcount == 1 else None
+    if command in ("UPDATE", "DELETE"):
+        return cursor.rowcount
+    return True
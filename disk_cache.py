@@ -0,0 +1,159 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class DiskCache:
+    """
+    A size-bounded LRU cache of files on disk.
+
+    Entries are files named after their key. The files' access times record
+    recency (set explicitly on every hit, so this works on noatime mounts
+    too), so the LRU order survives restarts and is shared by every process
+    using the same folder. Modification times are left alone because
+    entries may be hardlinked into user folders. The in-memory index is
+    only an estimate for this process and is rebuilt from disk whenever it
+    says the budget is exceeded.
+    """
+
+    def __init__(self, root, max_bytes, suffix=''):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._entries = None  # key -> size, least recently used first
+        self._total = 0
+
+    def path_for(self, key):
+        return os.path.join(self.root, key[:2], f"{key}{self.suffix}")
+
+    def get(self, key):
+        """Return the path of a cached entry, or None on a miss."""
+        path = self.path_for(key)
+        try:
+            _touch(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+            if self._entries is not None and key in self._entries:
+                self._entries.move_to_end(key)
+        return path
+
+    def put_file(self, key, src_path, link=True):
+        """
+        Add a file to the cache, as a hardlink if possible.
+
+        Returns:
+            str: Path of the cached entry.
+        """
+        def write(tmp_path):
+            if link:
+                try:
+                    os.link(src_path, tmp_path)
+                    return
+                except OSError:
+                    pass
+            with open(src_path, 'rb') as f_src, open(tmp_path, 'wb') as f_dst:
+                while chunk := f_src.read(1024 * 1024):
+                    f_dst.write(chunk)
+
+        return self._put(key, write)
+
+    def put_bytes(self, key, data):
+        """Add a value to the cache. Returns the path of the cached entry."""
+        def write(tmp_path):
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+
+        return self._put(key, write)
+
+    def _put(self, key, write):
+        path = self.path_for(key)
+        folder = os.path.dirname(path)
+        os.makedirs(folder, exist_ok=True)
+
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            write(tmp_path)
+            _touch(tmp_path)
+            size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        with self._lock:
+            self._load()
+            self._total += size - self._entries.pop(key, 0)
+            self._entries[key] = size
+            if self._total > self.max_bytes:
+                self._evict()
+        return path
+
+    def stats(self):
+        with self._lock:
+            self._load()
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._total,
+                'max_bytes': self.max_bytes,
+            }
+
+    def _scan(self):
+        """Read the entries on disk, least recently used first."""
+        found = []
+        if os.path.exists(self.root):
+            for prefix in os.scandir(self.root):
+                if not prefix.is_dir():
+                    continue
+                for entry in os.scandir(prefix.path):
+                    if not entry.name.endswith(self.suffix) or entry.name.endswith('.tmp'):
+                        continue
+                    try:
+                        stats = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    key = entry.name[:len(entry.name) - len(self.suffix)] if self.suffix else entry.name
+                    found.append((stats.st_atime, key, stats.st_size))
+
+        found.sort()
+        self._entries = OrderedDict((key, size) for _, key, size in found)
+        self._total = sum(self._entries.values())
+
+    def _load(self):
+        if self._entries is None:
+            self._scan()
+
+    def _evict(self):
+        # Other processes may have added or used entries; trust the disk
+        self._scan()
+        while self._total > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            try:
+                os.remove(self.path_for(key))
+            except FileNotFoundError:
+                pass
+            self._total -= size
+            self.evictions += 1
+
+
+def _touch(path):
+    """Mark a cache entry as used now, keeping its modification time."""
+    stats = os.stat(path)
+    os.utime(path, (time.time(), stats.st_mtime))
@@ -0,0 +1,180 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import fitz
+
+
+class _Entry:
+    def __init__(self, doc, stats):
+        self.doc = doc
+        self.inode = stats.st_ino
+        self.signature = (stats.st_size, stats.st_mtime_ns)
+        self.size = stats.st_size
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+        self.in_use = 0
+
+
+class DocPool:
+    """
+    An LRU pool of open fitz documents keyed by (user, file).
+
+    Consecutive requests on the same file reuse the parsed document instead
+    of reopening it. A document is reopened if the file was changed by
+    anything but the pool's own users, and closed after idle_seconds
+    without use or when the pool exceeds max_bytes. The memory of a parsed
+    document is estimated by its file size.
+
+    Documents are only used by one request at a time; if a request fails
+    while holding one, the document (which may hold half-applied changes)
+    is closed instead of returned to the pool.
+
+    Edits save a document in full to a temporary file that replaces the
+    file (see apply_page_edits), so the same document serves the next edit.
+    A file replaced while checked out for editing is taken to be that save.
+    """
+
+    def __init__(self, max_bytes, idle_seconds=300):
+        self.max_bytes = max_bytes
+        self.idle_seconds = idle_seconds
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (user_id, path) -> _Entry, least recently used first
+        self._total = 0
+
+    @contextmanager
+    def checkout(self, user_id, path, edit=False):
+        """
+        Use the open document of a file, opening it if needed.
+        Pass edit=True if the document will be changed and saved.
+
+        Usage:
+            with pool.checkout(user_id, path) as doc:
+                ...
+        """
+        key = (user_id, os.path.abspath(path))
+
+        while True:
+            entry = self._acquire(key, path, edit)
+            entry.lock.acquire()
+            with self._lock:
+                current = self._entries.get(key) is entry
+            if current:
+                break
+            # Dropped from the pool while we waited (e.g. a failed edit)
+            entry.lock.release()
+            self._release(key, entry, keep=False)
+
+        try:
+            try:
+                yield entry.doc
+            except BaseException:
+                self._release(key, entry, keep=False)
+                raise
+
+            # Reads keep the inode; a file replaced under them means the
+            # document is stale
+            try:
+                stats = os.stat(path)
+                keep = edit or stats.st_ino == entry.inode
+            except FileNotFoundError:
+                keep = False
+
+            if keep:
+                with self._lock:
+                    if self._entries.get(key) is entry:
+                        self._total += stats.st_size - entry.size
+                    entry.size = stats.st_size
+                entry.inode = stats.st_ino
+                entry.signature = (stats.st_size, stats.st_mtime_ns)
+            self._release(key, entry, keep=keep)
+        finally:
+            entry.lock.release()
+
+    def flush(self, user_id=None, path=None):
+        """Close the documents of a user, of a file, or all of them."""
+        abspath = os.path.abspath(path) if path else None
+        with self._lock:
+            for key in list(self._entries):
+                if (user_id is None or key[0] == user_id) and (abspath is None or key[1] == abspath):
+                    self._close(key)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._total,
+                'max_bytes': self.max_bytes,
+            }
+
+    def _acquire(self, key, path, edit):
+        stats = os.stat(path)
+
+        with self._lock:
+            self._close_idle()
+
+            entry = self._entries.get(key)
+            if entry is not None and (entry.inode != stats.st_ino or
+                                      entry.signature != (stats.st_size, stats.st_mtime_ns)):
+                # Changed on disk since it was parsed
+                self._close(key)
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                entry = _Entry(fitz.open(path), stats)
+                self._entries[key] = entry
+                self._total += entry.size
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+
+            entry.in_use += 1
+            entry.last_used = time.monotonic()
+            self._evict()
+            return entry
+
+    def _release(self, key, entry, keep):
+        with self._lock:
+            entry.in_use -= 1
+            entry.last_used = time.monotonic()
+            if self._entries.get(key) is entry:
+                if not keep:
+                    self._close(key)
+            elif entry.in_use == 0 and not entry.doc.is_closed:
+                # Removed from the pool while in use
+                entry.doc.close()
+
+    def _close(self, key):
+        entry = self._entries.pop(key)
+        self._total -= entry.size
+        # A document in use is closed by its user when it is released
+        if entry.in_use == 0:
+            entry.doc.close()
+
+    def _close_idle(self):
+        cutoff = time.monotonic() - self.idle_seconds
+        for key, entry in list(self._entries.items()):
+            if entry.in_use == 0 and entry.last_used < cutoff:
+                self._close(key)
+                self.evictions += 1
+
+    def _evict(self):
+        for key, entry in list(self._entries.items()):
+            if self._total <= self.max_bytes:
+                break
+            if entry.in_use == 0:
+                self._close(key)
+                self.evictions += 1
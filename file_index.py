@@ -0,0 +1,173 @@
+import base64
+import json
+import os
+
+import fitz
+
+from blob_store import get_file_digest
+from helpers import get_user_files_dir
+
+FILES_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS files (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, name TEXT NOT NULL,
+        size INTEGER NOT NULL, page_count INTEGER, sha256 TEXT NOT NULL, modified_at REAL NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)""",
+    "CREATE UNIQUE INDEX IF NOT EXISTS files_user_name ON files (user_id, name)",
+    "CREATE INDEX IF NOT EXISTS files_user_modified ON files (user_id, modified_at, id)",
+    "CREATE INDEX IF NOT EXISTS files_user_size ON files (user_id, size, id)",
+]
+
+# Sort keys accepted by list_files, mapped to their column. Every sort ends
+# with the id so the order (and with it the cursor) is total.
+FILE_SORTS = {
+    'date': 'modified_at',
+    'name': 'name',
+    'size': 'size',
+}
+
+PAGE_SIZE = 50
+
+
+def init_file_index(db):
+    """Creates the files table if needed."""
+    for statement in FILES_SCHEMA:
+        db.execute(statement)
+
+
+def record_file(db, user_id, name):
+    """
+    Adds or updates the index entry of a file in a user's saved folder.
+
+    Returns:
+        bool: False if the file does not exist.
+    """
+    path = os.path.join(get_user_files_dir(user_id, 'saved'), name)
+    try:
+        stats = os.stat(path)
+    except FileNotFoundError:
+        return False
+
+    try:
+        with fitz.open(path) as doc:
+            page_count = len(doc)
+    except Exception:
+        # Still listed, just without a page count
+        page_count = None
+
+    db.execute(
+        """INSERT INTO files (user_id, name, size, page_count, sha256, modified_at) VALUES (?, ?, ?, ?, ?, ?)
+           ON CONFLICT (user_id, name) DO UPDATE SET size = excluded.size, page_count = excluded.page_count,
+           sha256 = excluded.sha256, modified_at = excluded.modified_at""",
+        user_id, name, stats.st_size, page_count, get_file_digest(path), stats.st_mtime)
+    return True
+
+
+def remove_file(db, user_id, name):
+    """
+    Removes the index entry of a file.
+
+    Returns:
+        str: SHA-256 of the removed file, or None if it wasn't indexed.
+    """
+    rows = db.execute("SELECT sha256 FROM files WHERE user_id = ? AND name = ?", user_id, name)
+    db.execute("DELETE FROM files WHERE user_id = ? AND name = ?", user_id, name)
+    return rows[0]["sha256"] if rows else None
+
+
+def list_files(db, user_id, sort='date', descending=True, cursor=None, limit=PAGE_SIZE):
+    """
+    One page of a user's saved files, in index order.
+
+    Args:
+        sort (str): One of FILE_SORTS.
+        descending (bool): Sort order.
+        cursor (str): Cursor returned for the previous page, or None for
+            the first page.
+        limit (int): Page size.
+
+    Returns:
+        tuple: (rows, next_cursor); next_cursor is None on the last page.
+
+    Raises:
+        ValueError: If sort or cursor is invalid.
+    """
+    column = FILE_SORTS.get(sort)
+    if column is None:
+        raise ValueError(f"Invalid sort: {sort}")
+
+    direction = "DESC" if descending else "ASC"
+    query = "SELECT * FROM files WHERE user_id = ?"
+    args = [user_id]
+
+    if cursor:
+        value, last_id = _decode_cursor(cursor)
+        # Keyset pagination: continue after the last row shown, so pages
+        # cost the same however deep they are
+        query += f" AND ({column}, id) {'<' if descending else '>'} (?, ?)"
+        args += [value, last_id]
+
+    query += f" ORDER BY {column} {direction}, id {direction} LIMIT ?"
+    args.append(limit + 1)
+
+    rows = db.execute(query, *args)
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1][column], rows[-1]["id"])
+    return rows, next_cursor
+
+
+def count_files(db, user_id):
+    return db.execute("SELECT COUNT(*) AS n FROM files WHERE user_id = ?", user_id)[0]["n"]
+
+
+def reconcile(db, user_id):
+    """
+    Brings the index of a user in line with their saved folder.
+
+    Files that are new or changed on disk are (re)indexed; entries of
+    files that are gone are removed.
+
+    Returns:
+        dict: Number of entries added, updated and removed.
+    """
+    saved_dir = get_user_files_dir(user_id, 'saved')
+    on_disk = {}
+    if os.path.exists(saved_dir):
+        for entry in os.scandir(saved_dir):
+            if entry.is_file():
+                stats = entry.stat()
+                on_disk[entry.name] = (stats.st_size, stats.st_mtime)
+
+    indexed = {
+        row["name"]: (row["size"], row["modified_at"])
+        for row in db.execute("SELECT name, size, modified_at FROM files WHERE user_id = ?", user_id)
+    }
+
+    counts = {'added': 0, 'updated': 0, 'removed': 0}
+    for name, signature in on_disk.items():
+        if name not in indexed:
+            counts['added'] += record_file(db, user_id, name)
+        elif indexed[name] != signature:
+            counts['updated'] += record_file(db, user_id, name)
+
+    for name in indexed.keys() - on_disk.keys():
+        remove_file(db, user_id, name)
+        counts['removed'] += 1
+
+    return counts
+
+
+def _encode_cursor(value, last_id):
+    data = json.dumps([value, last_id]).encode()
+    return base64.urlsafe_b64encode(data).decode()
+
+
+def _decode_cursor(cursor):
+    try:
+        value, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(last_id, int):
+        raise ValueError("Invalid cursor")
+    return value, last_id
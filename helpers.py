@@ -2,10 +2,11 @@ from functools import wraps
 from flask import redirect, session
 from werkzeug.security import check_password_hash, generate_password_hash
 import os
-import shutil
-import glob
 from werkzeug.utils import secure_filename
 
+from blob_store import store_stream, store_file, link_blob, link_unique
+from uploads import finish_upload
+
 def login_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
@@ -85,12 +86,13 @@ def validate_register(username, password, confirmation):
 def clean_folders(folders_to_clean):
     """Empty the specified folders."""
     for folder in folders_to_clean:
-        files = glob.glob(os.path.join(folder, '*'))
-        for f in files:
+        if not os.path.isdir(folder):
+            continue
+        for entry in os.scandir(folder):
             try:
-                os.remove(f)
+                os.remove(entry.path)
             except Exception as e:
-                print(f"Error removing {f}: {e}")
+                print(f"Error removing {entry.path}: {e}")
 
 
 def get_user_folder(user_id):
@@ -107,6 +109,36 @@ def get_user_temp_dir(user_id, type='old'):
     return os.path.join(base, 'temp', type)
 
 
+def get_user_files_dir(user_id, folder_type):
+    """
+    Get the folder holding a user's files of a folder type.
+    folder_type: 'processed' (temp/new), 'old' (temp/old) or 'saved'.
+    Returns None for an unknown folder type.
+    """
+    if folder_type == 'processed':
+        return get_user_temp_dir(user_id, 'new')
+    elif folder_type == 'old':
+        return get_user_temp_dir(user_id, 'old')
+    elif folder_type == 'saved':
+        return os.path.join(get_user_folder(user_id), 'saved')
+    return None
+
+
+def get_user_file_path(user_id, folder_type, filename):
+    """
+    Get the path of a user's file in the folder of a folder type.
+    Returns None for an unknown folder type or a filename that would lead
+    out of the folder (e.g. '../1/saved/a.pdf' or an absolute path).
+    """
+    folder = get_user_files_dir(user_id, folder_type)
+    if folder is None:
+        return None
+    file_path = os.path.normpath(os.path.join(folder, filename))
+    if os.path.dirname(file_path) != os.path.normpath(folder):
+        return None
+    return file_path
+
+
 def init_user_folders(user_id):
     """Ensure user folders exist."""
     old_dir = get_user_temp_dir(user_id, 'old')
@@ -141,7 +173,9 @@ def save_user_file(user_id, filename, folder_type):
     dst_path = os.path.join(saved_dir, filename)
 
     try:
-        shutil.copy2(src_path, dst_path)
+        # Saving links the file's blob instead of copying its bytes
+        _, blob_path = store_file(src_path)
+        link_blob(blob_path, dst_path)
         return True, "File saved successfully"
     except Exception as e:
         return False, str(e)
@@ -150,26 +184,38 @@ def save_user_file(user_id, filename, folder_type):
 def save_uploaded_file(file, user_id):
     """
     Securely save an uploaded file to the user's temp/old directory.
-    If file exists, appends (1), (2), etc.
-    Returns (filename, filepath)
+    The content is stored once in the blob store and linked into the folder.
+    If the name is taken by a different file, appends (1), (2), etc.
+    Returns (filename, filepath, digest)
     """
     original_filename = secure_filename(file.filename)
     old_dir = get_user_temp_dir(user_id, 'old')
-    
-    # Split filename and extension
-    base, ext = os.path.splitext(original_filename)
-    
-    filename = original_filename
-    counter = 1
-    
-    # While file exists, add counter
-    while os.path.exists(os.path.join(old_dir, filename)):
-        filename = f"{base}({counter}){ext}"
-        counter += 1
-        
+
+    # Hash while the upload streams into the store
+    digest, blob_path = store_stream(file.stream)
+
+    filename = link_unique(blob_path, old_dir, original_filename)
+    filepath = os.path.join(old_dir, filename)
+    return filename, filepath, digest
+
+
+def save_chunked_upload(db, upload_id, user_id):
+    """
+    Move a finished chunked upload (see uploads.py) into the user's
+    temp/old directory, like save_uploaded_file.
+    Raises ValueError if the upload is unknown, incomplete or not a PDF.
+    Returns (filename, filepath, digest)
+    """
+    name, digest, blob_path = finish_upload(db, upload_id, user_id)
+    old_dir = get_user_temp_dir(user_id, 'old')
+
+    # Names of only non-ASCII characters or dots come out empty or as 'pdf'
+    filename = secure_filename(name)
+    if not filename.endswith('.pdf'):
+        filename = 'upload.pdf'
+    filename = link_unique(blob_path, old_dir, filename)
     filepath = os.path.join(old_dir, filename)
-    file.save(filepath)
-    return filename, filepath
+    return filename, filepath, digest
 
 
 def get_file_url(user_id, folder_type, filename):
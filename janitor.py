@@ -0,0 +1,240 @@
+import multiprocessing
+import os
+import threading
+import time
+
+from blob_store import collect_garbage
+from helpers import get_user_temp_dir
+from jobs import QUEUED, RUNNING
+
+# Ledger of temp files (uploads and processed outputs). It is updated as
+# files are written and used, so the janitor never has to walk the tree.
+LEDGER_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS temp_files (path TEXT PRIMARY KEY, user_id INTEGER NOT NULL, size INTEGER NOT NULL,
+        last_used REAL NOT NULL)""",
+    "CREATE INDEX IF NOT EXISTS temp_files_last_used ON temp_files (last_used)",
+    "CREATE INDEX IF NOT EXISTS temp_files_user ON temp_files (user_id, last_used)",
+]
+
+# Uses of a file closer together than this only update its recency once
+TOUCH_INTERVAL = 60
+
+
+class Janitor:
+    """
+    Evicts temp files in the background.
+
+    Every interval seconds it removes files unused for longer than ttl,
+    then the least recently used files of users over user_quota bytes,
+    then the least recently used files overall while the total is over
+    global_quota bytes. Inputs and outputs of queued or running jobs are
+    never removed.
+    """
+
+    def __init__(self, db, ttl, user_quota, global_quota, interval=300, on_evict=None):
+        """
+        Args:
+            db: Database holding the ledger (and the jobs table).
+            ttl (float): Seconds a temp file is kept after its last use.
+            user_quota (int): Bytes of temp files per user.
+            global_quota (int): Bytes of temp files of all users together.
+            interval (float): Seconds between runs.
+            on_evict (callable): Called as on_evict(user_id, path) before a
+                file is removed, e.g. to close open handles.
+        """
+        self.db = db
+        self.ttl = ttl
+        self.user_quota = user_quota
+        self.global_quota = global_quota
+        self.interval = interval
+        self.on_evict = on_evict
+
+        self.runs = 0
+        self.files_removed = 0
+        self.bytes_reclaimed = 0
+        self.last_report = None
+
+        self._stop = threading.Event()
+        self._thread = None
+
+        for statement in LEDGER_SCHEMA:
+            db.execute(statement)
+
+    def track(self, user_id, path):
+        """Record a temp file that was written or changed."""
+        try:
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            self.forget(path)
+            return
+        self.db.execute(
+            """INSERT INTO temp_files (path, user_id, size, last_used) VALUES (?, ?, ?, ?)
+               ON CONFLICT (path) DO UPDATE SET size = excluded.size, last_used = excluded.last_used""",
+            os.path.abspath(path), user_id, size, time.time())
+
+    def touch(self, path):
+        """Record a use of a temp file (read, viewed, downloaded)."""
+        now = time.time()
+        self.db.execute("UPDATE temp_files SET last_used = ? WHERE path = ? AND last_used < ?",
+                        now, os.path.abspath(path), now - TOUCH_INTERVAL)
+
+    def forget(self, path):
+        """Drop a file that was removed by other means from the ledger."""
+        self.db.execute("DELETE FROM temp_files WHERE path = ?", os.path.abspath(path))
+
+    def forget_user(self, user_id):
+        self.db.execute("DELETE FROM temp_files WHERE user_id = ?", user_id)
+
+    def rebuild(self, root='edited_files'):
+        """
+        Fill the ledger from the temp folders on disk. Only needed once, for
+        files written before the ledger existed.
+
+        Returns:
+            int: Number of files recorded.
+        """
+        count = 0
+        if not os.path.exists(root):
+            return count
+        for user in os.scandir(root):
+            if not user.is_dir() or not user.name.isdigit():
+                continue
+            for kind in ('old', 'new'):
+                folder = get_user_temp_dir(user.name, kind)
+                if os.path.isdir(folder):
+                    for entry in os.scandir(folder):
+                        if entry.is_file():
+                            self.track(int(user.name), entry.path)
+                            count += 1
+        return count
+
+    def start(self):
+        """Run in a daemon thread of the web process."""
+        # Spawned job workers import the app again; they must not clean up too
+        if multiprocessing.current_process().name != 'MainProcess' or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name='janitor', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        if self.db.execute("SELECT COUNT(*) AS n FROM temp_files")[0]["n"] == 0:
+            self.rebuild()
+
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Janitor run failed: {e}")
+
+    def run_once(self, now=None):
+        """
+        One eviction pass.
+
+        Returns:
+            dict: Files removed, bytes reclaimed, and temp bytes left.
+        """
+        now = time.time() if now is None else now
+        busy = self._get_busy_paths()
+        removed = []
+
+        # 1. Age
+        for row in self.db.execute("SELECT path, user_id, size FROM temp_files WHERE last_used < ? ORDER BY last_used",
+                                   now - self.ttl):
+            if row["path"] not in busy:
+                removed.append(row)
+
+        # 2. Per-user quota, least recently used first
+        removed_paths = {row["path"] for row in removed}
+        over_quota = self.db.execute(
+            "SELECT user_id, SUM(size) AS total FROM temp_files GROUP BY user_id HAVING total > ?", self.user_quota)
+        for user in over_quota:
+            user_total = user["total"] - sum(row["size"] for row in removed if row["user_id"] == user["user_id"])
+            rows = self.db.execute("SELECT path, user_id, size FROM temp_files WHERE user_id = ? ORDER BY last_used",
+                                   user["user_id"])
+            self._pick(rows, user_total, self.user_quota, busy, removed, removed_paths)
+
+        # 3. Global quota
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) AS total FROM temp_files")[0]["total"]
+        total -= sum(row["size"] for row in removed)
+        if total > self.global_quota:
+            rows = self.db.execute("SELECT path, user_id, size FROM temp_files ORDER BY last_used")
+            total = self._pick(rows, total, self.global_quota, busy, removed, removed_paths)
+
+        reclaimed = 0
+        for row in removed:
+            reclaimed += self._remove(row)
+
+        # Uploads are hardlinks to blobs, which go once unreferenced (and
+        # past their grace period, so possibly on a later run)
+        reclaimed += collect_garbage()
+
+        report = {
+            'files_removed': len(removed),
+            'bytes_reclaimed': reclaimed,
+            'temp_bytes': total,
+        }
+        self.runs += 1
+        self.files_removed += len(removed)
+        self.bytes_reclaimed += reclaimed
+        self.last_report = report
+        if removed or reclaimed:
+            print(f"Janitor removed {len(removed)} temp files, reclaimed {reclaimed / 1024 ** 2:.1f} MB")
+        return report
+
+    def stats(self):
+        usage = self.db.execute("SELECT COUNT(*) AS files, COALESCE(SUM(size), 0) AS bytes FROM temp_files")[0]
+        return {
+            'runs': self.runs,
+            'files_removed': self.files_removed,
+            'bytes_reclaimed': self.bytes_reclaimed,
+            'last_report': self.last_report,
+            'temp_files': usage["files"],
+            'temp_bytes': usage["bytes"],
+            'user_quota': self.user_quota,
+            'global_quota': self.global_quota,
+        }
+
+    def _pick(self, rows, total, quota, busy, removed, removed_paths):
+        """Add rows to removed, oldest first, until total fits quota. Returns the new total."""
+        for row in rows:
+            if total <= quota:
+                break
+            if row["path"] in busy or row["path"] in removed_paths:
+                continue
+            removed.append(row)
+            removed_paths.add(row["path"])
+            total -= row["size"]
+        return total
+
+    def _get_busy_paths(self):
+        rows = self.db.execute("SELECT input_path, output_path FROM jobs WHERE status IN (?, ?)", QUEUED, RUNNING)
+        busy = set()
+        for row in rows:
+            busy.add(os.path.abspath(row["input_path"]))
+            busy.add(os.path.abspath(row["output_path"]))
+        return busy
+
+    def _remove(self, row):
+        """Remove one file. Returns the bytes freed on disk."""
+        path = row["path"]
+        if self.on_evict:
+            self.on_evict(row["user_id"], path)
+
+        freed = 0
+        try:
+            # A file still linked elsewhere (blob store, cache, saved
+            # folder) frees nothing by itself
+            if os.stat(path).st_nlink == 1:
+                freed = row["size"]
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Error removing {path}: {e}")
+            return 0
+
+        self.forget(path)
+        return freed
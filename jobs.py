@@ -0,0 +1,308 @@
+import calendar
+import json
+import multiprocessing
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from database import Database
+from disk_cache import DiskCache
+from ocr.pipeline import ocr_pdf
+from result_cache import fetch_result, store_result
+from slice_and_reorder.pipeline import slice_and_reorder_pdf
+from slice_and_reorder.stream import MEMORY_LIMIT
+
+# Job states. queued and running jobs are picked up again after a restart.
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+# Gutters detected for auto-split slicing, per file (see gutter.py)
+SPLIT_CACHE_DIR = os.path.join('edited_files', 'cache', 'splits')
+SPLIT_CACHE_BYTES = 64 * 1024 ** 2
+
+# How often a worker writes progress (and checks for cancellation), in seconds
+PROGRESS_INTERVAL = 0.5
+
+JOBS_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, user_id INTEGER NOT NULL, kind TEXT NOT NULL,
+        status TEXT NOT NULL, params TEXT NOT NULL, input_path TEXT NOT NULL, output_path TEXT NOT NULL,
+        pages_done INTEGER NOT NULL DEFAULT 0, pages_total INTEGER NOT NULL DEFAULT 0, error TEXT, pid INTEGER, cache_key TEXT,
+        result TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)""",
+    "CREATE INDEX IF NOT EXISTS jobs_user ON jobs (user_id)",
+    "CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)",
+]
+
+_executor = None
+_db = None
+_db_path = None
+_result_cache = None
+_on_done = None
+
+
+class JobCancelled(Exception):
+    """Raised inside a worker when its job was cancelled."""
+
+
+def init_jobs(db, db_path, max_workers=None, result_cache=None, on_done=None):
+    """
+    Creates the jobs table if needed and re-queues jobs interrupted by a restart.
+
+    Args:
+        db: Database of the web process.
+        db_path (str): Path to the SQLite file, opened again by the workers.
+        max_workers (int): Size of the process pool (default: CPU count, at most 4).
+        result_cache (DiskCache): Cache of finished outputs, see result_cache.py.
+        on_done (callable): Called as on_done(user_id, output_path) in the web
+            process when a job finishes successfully.
+    """
+    global _executor, _db, _db_path, _result_cache, _on_done
+
+    # Spawned pool workers import the main module again; only the web
+    # process owns the pool
+    if multiprocessing.current_process().name != 'MainProcess':
+        return
+
+    for statement in JOBS_SCHEMA:
+        db.execute(statement)
+    # Tables created before results were recorded
+    if 'result' not in {column["name"] for column in db.execute("PRAGMA table_info(jobs)")}:
+        db.execute("ALTER TABLE jobs ADD COLUMN result TEXT")
+
+    _db = db
+    _db_path = db_path
+    _result_cache = result_cache
+    _on_done = on_done
+    if max_workers is None:
+        max_workers = min(4, os.cpu_count() or 1)
+
+    # spawn, so workers never inherit the web process' open database handles
+    _executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'))
+
+    resume_jobs(db)
+
+
+def resume_jobs(db):
+    """Resubmits queued jobs and running jobs whose worker has died."""
+    rows = db.execute("SELECT id, status, pid, cache_key, updated_at FROM jobs WHERE status IN (?, ?)",
+                      QUEUED, RUNNING)
+    for row in rows:
+        if row["status"] == RUNNING and _worker_alive(row["pid"], row["updated_at"]):
+            continue
+        db.execute("UPDATE jobs SET status = ?, pages_done = 0, pid = NULL WHERE id = ?", QUEUED, row["id"])
+        _submit(row["id"], row["cache_key"])
+
+
+def create_job(db, user_id, kind, input_path, output_path, cache_key=None, **params):
+    """
+    Stores a new job and queues it. Returns the job id.
+
+    If cache_key is given and its result is cached, the result is linked to
+    output_path and the job is stored as done without running it.
+    """
+    if kind not in RUNNERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+
+    status = QUEUED
+    if cache_key and _result_cache is not None and fetch_result(_result_cache, cache_key, output_path):
+        status = DONE
+
+    job_id = uuid.uuid4().hex
+    db.execute(
+        "INSERT INTO jobs (id, user_id, kind, status, params, input_path, output_path, cache_key) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        job_id, user_id, kind, status, json.dumps(params), input_path, output_path, cache_key
+    )
+    if status == QUEUED:
+        _submit(job_id, cache_key)
+    elif _on_done is not None:
+        _on_done(user_id, output_path)
+    return job_id
+
+
+def get_job(db, job_id, user_id):
+    """Returns the job as a dict, or None if it does not belong to user_id."""
+    rows = db.execute("SELECT * FROM jobs WHERE id = ? AND user_id = ?", job_id, user_id)
+    if len(rows) != 1:
+        return None
+    job = rows[0]
+    job["params"] = json.loads(job["params"])
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+
+def cancel_job(db, job_id, user_id):
+    """
+    Marks a queued or running job as cancelled.
+
+    A queued job is skipped when a worker reaches it; a running job stops at
+    its next progress update.
+
+    Returns:
+        bool: True if the job was still active.
+    """
+    count = db.execute(
+        "UPDATE jobs SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ? AND user_id = ? AND status IN (?, ?)",
+        CANCELLED, job_id, user_id, QUEUED, RUNNING
+    )
+    return count == 1
+
+
+def run_in_pool(fn, *args):
+    """
+    Runs fn(*args) in the job process pool, for other CPU-bound work of the
+    web process. fn must be importable by the workers.
+
+    Returns:
+        Future: Completed with the return value of fn.
+    """
+    return _executor.submit(fn, *args)
+
+
+def _submit(job_id, cache_key):
+    future = _executor.submit(run_job, _db_path, job_id)
+    future.add_done_callback(lambda f: _job_finished(job_id, cache_key))
+
+
+def _job_finished(job_id, cache_key):
+    """Adds the output of a finished job to the result cache and reports it."""
+    rows = _db.execute("SELECT user_id, status, output_path FROM jobs WHERE id = ?", job_id)
+    if len(rows) != 1 or rows[0]["status"] != DONE or not os.path.exists(rows[0]["output_path"]):
+        return
+
+    if cache_key and _result_cache is not None:
+        store_result(_result_cache, cache_key, rows[0]["output_path"])
+    if _on_done is not None:
+        _on_done(rows[0]["user_id"], rows[0]["output_path"])
+
+
+def _worker_alive(pid, updated_at):
+    """
+    Whether the worker that last updated a job at updated_at (UTC, from
+    CURRENT_TIMESTAMP) still runs as pid. The worker claimed the job after
+    it started, so a process started since then only reused the pid.
+    """
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+
+    started = _get_start_time(pid)
+    if started is None or not updated_at:
+        return True
+    # Both times are to the second
+    return started <= calendar.timegm(time.strptime(updated_at, '%Y-%m-%d %H:%M:%S')) + 2
+
+
+def _get_start_time(pid):
+    """Unix time a process started, from /proc (Linux only), or None."""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            # The command name before the other fields may contain spaces
+            fields = f.read().rsplit(')', 1)[1].split()
+        with open('/proc/stat') as f:
+            boot_time = next(int(line.split()[1]) for line in f if line.startswith('btime '))
+    except (OSError, IndexError, StopIteration, ValueError):
+        return None
+    # Field 22 of stat, in clock ticks since boot
+    return boot_time + int(fields[19]) / os.sysconf('SC_CLK_TCK')
+
+
+# --- Worker side ---
+
+_worker_db = None
+_split_cache = None
+
+
+def _get_worker_db(db_path):
+    global _worker_db
+    if _worker_db is None:
+        _worker_db = Database(db_path, pool_size=1)
+    return _worker_db
+
+
+def get_split_cache():
+    """The gutter cache of this process, shared on disk with the others."""
+    global _split_cache
+    if _split_cache is None:
+        _split_cache = DiskCache(SPLIT_CACHE_DIR, SPLIT_CACHE_BYTES, suffix='.json')
+    return _split_cache
+
+
+def run_job(db_path, job_id):
+    """Runs a job inside a pool worker, recording its progress and outcome."""
+    db = _get_worker_db(db_path)
+
+    # Claim the job; it may have been cancelled (or claimed) in the meantime
+    claimed = db.execute(
+        "UPDATE jobs SET status = ?, pid = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ? AND status = ?",
+        RUNNING, os.getpid(), job_id, QUEUED
+    )
+    if claimed != 1:
+        return
+
+    job = db.execute("SELECT * FROM jobs WHERE id = ?", job_id)[0]
+    params = json.loads(job["params"])
+    last_update = 0
+
+    def progress(done, total):
+        nonlocal last_update
+        now = time.monotonic()
+        if done < total and now - last_update < PROGRESS_INTERVAL:
+            return
+        last_update = now
+
+        updated = db.execute(
+            "UPDATE jobs SET pages_done = ?, pages_total = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ? AND status = ?",
+            done, total, job_id, RUNNING
+        )
+        if updated != 1:
+            raise JobCancelled()
+
+    try:
+        result = RUNNERS[job["kind"]](job["input_path"], job["output_path"], params, progress)
+    except JobCancelled:
+        if os.path.exists(job["output_path"]):
+            os.remove(job["output_path"])
+        return
+    except Exception as e:
+        if os.path.exists(job["output_path"]):
+            os.remove(job["output_path"])
+        db.execute(
+            "UPDATE jobs SET status = ?, error = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ? AND status = ?",
+            FAILED, str(e), job_id, RUNNING
+        )
+        return
+
+    db.execute(
+        "UPDATE jobs SET status = ?, result = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ? AND status = ?",
+        DONE, json.dumps(result) if result is not None else None, job_id, RUNNING
+    )
+
+
+def run_slice(input_path, output_path, params, progress):
+    # Jobs queued before engines could be chosen ran on pypdf
+    return slice_and_reorder_pdf(input_path, output_path, mode=params["mode"], progress=progress,
+                                 shards=params.get("shards", 1), auto_split=params.get("auto_split", False),
+                                 split_cache=get_split_cache(), optimize=params.get("optimize", False),
+                                 linearize=params.get("linearize", False), engine=params.get("engine", 'pypdf'),
+                                 memory_limit=params.get("memory_limit", MEMORY_LIMIT))
+
+
+def run_ocr(input_path, output_path, params, progress):
+    ocr_pdf(input_path, output_path, engine=params["engine"], language=params["language"], dpi=params["dpi"],
+            workers=params.get("workers"), cache_bytes=params["cache_bytes"], progress=progress)
+
+
+# Job kind -> function(input_path, output_path, params, progress), returning
+# a JSON-serialisable report stored with the job, or None
+RUNNERS = {
+    'slice': run_slice,
+    'ocr': run_ocr,
+}
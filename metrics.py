@@ -0,0 +1,248 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Help text of every metric, by name
+METRICS_HELP = {
+    'request_seconds': ('histogram', "Time spent handling instrumented requests."),
+    'stage_seconds': ('histogram', "Time spent in each stage of instrumented requests."),
+    'pages_total': ('counter', "PDF pages processed."),
+    'bytes_total': ('counter', "Bytes of PDF files processed."),
+    'requests_total': ('counter', "Instrumented requests handled, by status code."),
+}
+
+# The trace of the request handled by the current thread, if any
+_local = threading.local()
+
+
+class Trace:
+    """Stage timings and counts of one request."""
+
+    def __init__(self, route):
+        self.route = route
+        self.start = time.perf_counter()
+        self.stages = []  # (stage, seconds), in order
+        self.counts = Counter()
+
+
+def start_trace(route):
+    """Starts collecting stage timings for the request of this thread."""
+    _local.trace = Trace(route)
+    return _local.trace
+
+
+def end_trace():
+    """Stops collecting; returns the trace, or None if none was started."""
+    trace = getattr(_local, 'trace', None)
+    _local.trace = None
+    return trace
+
+
+@contextmanager
+def stage(name):
+    """
+    Times a stage of the current request. Outside of a traced request
+    (e.g. in job workers or benchmarks) this only costs a clock read.
+
+    Usage:
+        with stage('parse'):
+            reader = PdfReader(path)
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace = getattr(_local, 'trace', None)
+        if trace is not None:
+            trace.stages.append((name, time.perf_counter() - start))
+
+
+def count(pages=0, nbytes=0):
+    """Adds to the pages and bytes processed by the current request."""
+    trace = getattr(_local, 'trace', None)
+    if trace is not None:
+        trace.counts['pages'] += pages
+        trace.counts['bytes'] += nbytes
+
+
+class Metrics:
+    """
+    Latency histograms and counters of the instrumented requests, exposed in
+    the Prometheus text format.
+
+    Every series is kept as {labels: [bucket counts..., sum, count]} under
+    one lock; requests only add to them, so the lock is held briefly.
+    """
+
+    def __init__(self, prefix='pdfeditor', buckets=LATENCY_BUCKETS):
+        self.prefix = prefix
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._histograms = {}  # name -> {labels: [per-bucket counts, ..., sum, count]}
+        self._counters = {}  # name -> {labels: value}
+
+    def observe(self, name, value, **labels):
+        """Adds value to the histogram name."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            counts = series.get(key)
+            if counts is None:
+                counts = series[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            counts[-2] += value
+            counts[-1] += 1
+
+    def inc(self, name, value=1, **labels):
+        """Adds value to the counter name."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def record(self, trace, status):
+        """Adds a finished request's trace to the metrics."""
+        total = time.perf_counter() - trace.start
+        self.observe('request_seconds', total, route=trace.route)
+        for name, seconds in trace.stages:
+            self.observe('stage_seconds', seconds, route=trace.route, stage=name)
+        self.inc('requests_total', route=trace.route, status=str(status))
+        if trace.counts['pages']:
+            self.inc('pages_total', trace.counts['pages'], route=trace.route)
+        if trace.counts['bytes']:
+            self.inc('bytes_total', trace.counts['bytes'], route=trace.route)
+        return total
+
+    def render(self):
+        """The metrics in the Prometheus text exposition format (0.0.4)."""
+        with self._lock:
+            histograms = {name: {key: list(counts) for key, counts in series.items()}
+                          for name, series in self._histograms.items()}
+            counters = {name: dict(series) for name, series in self._counters.items()}
+
+        lines = []
+        for name, series in sorted(histograms.items()):
+            full_name = f"{self.prefix}_{name}"
+            lines += self._header(name, full_name)
+            for key, counts in sorted(series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f"{full_name}_bucket{_format_labels(key, le=f'{bound:g}')} {cumulative}")
+                lines.append(f"{full_name}_bucket{_format_labels(key, le='+Inf')} {counts[-1]}")
+                lines.append(f"{full_name}_sum{_format_labels(key)} {counts[-2]:.6f}")
+                lines.append(f"{full_name}_count{_format_labels(key)} {counts[-1]}")
+
+        for name, series in sorted(counters.items()):
+            full_name = f"{self.prefix}_{name}"
+            lines += self._header(name, full_name)
+            for key, value in sorted(series.items()):
+                lines.append(f"{full_name}{_format_labels(key)} {value}")
+
+        return '\n'.join(lines) + '\n'
+
+    def _header(self, name, full_name):
+        kind, help_text = METRICS_HELP.get(name, ('untyped', name))
+        return [f"# HELP {full_name} {help_text}", f"# TYPE {full_name} {kind}"]
+
+
+def _format_labels(key, **extra):
+    labels = list(key) + list(extra.items())
+    if not labels:
+        return ''
+    values = ','.join(f'{name}="{_escape(value)}"' for name, value in labels)
+    return '{' + values + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class SamplingProfiler:
+    """
+    Samples the stack of one thread at a fixed interval from a background
+    thread, without tracing every call, so the request runs at nearly full
+    speed.
+
+    Usage:
+        profiler = SamplingProfiler(threading.get_ident())
+        profiler.start()
+        ...
+        stacks = profiler.stop()  # Counter of 'outer;...;inner' -> samples
+    """
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                return
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(names))] += 1
+
+
+class SlowestProfiles:
+    """
+    Keeps the profiles of the slowest requests seen so far on disk, in the
+    collapsed stack format read by flamegraph.pl and speedscope.
+
+    Args:
+        folder (str): Where the profiles are written.
+        keep (int): Number of slowest requests kept; a faster one is
+            deleted when a slower one comes in.
+    """
+
+    def __init__(self, folder, keep=10):
+        self.folder = folder
+        self.keep = keep
+        self._lock = threading.Lock()
+        self._kept = []  # (seconds, path), fastest first
+
+    def offer(self, trace, seconds, stacks):
+        """Writes the profile of a request if it is among the slowest."""
+        with self._lock:
+            if len(self._kept) >= self.keep and seconds <= self._kept[0][0]:
+                return None
+            os.makedirs(self.folder, exist_ok=True)
+            stamp = time.strftime('%Y%m%d-%H%M%S')
+            path = os.path.join(self.folder, f"{trace.route}-{stamp}-{round(seconds * 1000)}ms.txt")
+            with open(path, 'w') as f:
+                for name, stage_seconds in trace.stages:
+                    f.write(f"# stage {name}: {stage_seconds * 1000:.1f} ms\n")
+                for stack, samples in stacks.most_common():
+                    f.write(f"{stack} {samples}\n")
+
+            self._kept.append((seconds, path))
+            self._kept.sort()
+            while len(self._kept) > self.keep:
+                _, dropped = self._kept.pop(0)
+                if os.path.exists(dropped):
+                    os.remove(dropped)
+            return path
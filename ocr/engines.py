@@ -0,0 +1,99 @@
+import csv
+import hashlib
+import io
+import os
+import shutil
+import subprocess
+
+# An engine turns a page image into words. Every word is a tuple
+# (text, x0, y0, x1, y1), its box in pixels of the image.
+
+
+class TesseractEngine:
+    """The tesseract command line program, run once per page."""
+
+    name = 'tesseract'
+
+    def __init__(self, command='tesseract', timeout=300):
+        self.command = command
+        self.timeout = timeout
+        self._version = None
+
+    def is_available(self):
+        return shutil.which(self.command) is not None
+
+    @property
+    def version(self):
+        """First line of `tesseract --version`, part of every cache key."""
+        if self._version is None:
+            result = subprocess.run([self.command, '--version'], capture_output=True, text=True, check=True)
+            self._version = (result.stdout or result.stderr).splitlines()[0].strip()
+        return self._version
+
+    def recognize(self, image, width, height, language, dpi):
+        """
+        Args:
+            image (bytes): The page as PNG.
+            width, height (int): Size of the image in pixels.
+            language (str): Tesseract language code(s), e.g. 'eng' or 'heb+eng'.
+            dpi (int): Resolution the page was rendered at.
+
+        Returns:
+            list: Words in reading order.
+        """
+        # The pages of a document are already spread over processes, so
+        # tesseract's own threads would only compete with each other
+        env = dict(os.environ, OMP_THREAD_LIMIT='1')
+        result = subprocess.run(
+            [self.command, 'stdin', 'stdout', '-l', language, '--dpi', str(dpi), 'tsv'],
+            input=image, capture_output=True, timeout=self.timeout, env=env)
+        if result.returncode != 0:
+            message = result.stderr.decode(errors='replace').strip().splitlines()
+            raise RuntimeError(f"tesseract failed: {message[-1] if message else result.returncode}")
+
+        words = []
+        rows = csv.DictReader(io.StringIO(result.stdout.decode()), delimiter='\t', quoting=csv.QUOTE_NONE)
+        for row in rows:
+            text = (row.get('text') or '').strip()
+            # Level 5 rows are words; the others are blocks, lines etc.
+            if row['level'] != '5' or not text or float(row['conf']) < 0:
+                continue
+            left, top = int(row['left']), int(row['top'])
+            words.append((text, left, top, left + int(row['width']), top + int(row['height'])))
+        return words
+
+
+class StubEngine:
+    """
+    Recognizes one made-up word per page, derived from the image, so the
+    pipeline can be run and timed without an OCR program. The same image
+    always gives the same word.
+    """
+
+    name = 'stub'
+    version = '1'
+
+    def is_available(self):
+        return True
+
+    def recognize(self, image, width, height, language, dpi):
+        word = f"stub{hashlib.sha256(image).hexdigest()[:12]}"
+        margin = dpi // 2
+        return [(word, margin, margin, min(width, margin + dpi * 2), min(height, margin + dpi // 4))]
+
+
+ENGINES = {
+    'tesseract': TesseractEngine,
+    'stub': StubEngine,
+}
+
+_engines = {}
+
+
+def get_engine(name):
+    """Returns the (shared) engine called name. Raises ValueError if unknown."""
+    if name not in ENGINES:
+        raise ValueError(f"Unknown OCR engine: {name}")
+    if name not in _engines:
+        _engines[name] = ENGINES[name]()
+    return _engines[name]
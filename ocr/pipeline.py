@@ -0,0 +1,203 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import fitz
+
+from disk_cache import DiskCache
+from ocr.engines import get_engine
+
+# Bump whenever the text layer written by ocr_pdf changes, so cached
+# results from older versions are not served
+OCR_VERSION = 1
+
+# Recognized words per page image, keyed by a hash of the rendered pixels
+OCR_CACHE_DIR = os.path.join('edited_files', 'cache', 'ocr')
+OCR_CACHE_BYTES = 256 * 1024 ** 2
+
+DEFAULT_DPI = 300
+
+# Words that the built-in Helvetica can't show are written in a Noto font
+# for the script of the document's language
+LANGUAGE_SCRIPTS = {
+    'heb': fitz.mupdf.UCDN_SCRIPT_HEBREW,
+    'ara': fitz.mupdf.UCDN_SCRIPT_ARABIC,
+    'rus': fitz.mupdf.UCDN_SCRIPT_CYRILLIC,
+    'ell': fitz.mupdf.UCDN_SCRIPT_GREEK,
+}
+
+
+def ocr_pdf(input_path, output_path, engine='tesseract', language='eng', dpi=DEFAULT_DPI, workers=None,
+            cache_dir=OCR_CACHE_DIR, cache_bytes=OCR_CACHE_BYTES, progress=None):
+    """
+    Makes the text of a scanned PDF searchable and selectable.
+
+    Pages are rendered and recognized in parallel worker processes; the
+    words are then written over each page as invisible text. Pages that
+    already have text are left alone, and pages whose image was recognized
+    before (by the same engine and language) are taken from the cache.
+
+    Args:
+        input_path (str): Path to source PDF.
+        output_path (str): Path to save the PDF with the text layer.
+        engine (str): Name of the OCR engine, see engines.py.
+        language (str): Language code passed to the engine, e.g. 'eng'.
+        dpi (int): Resolution pages are rendered at for recognition.
+        workers (int): Number of worker processes (default: CPU count).
+        cache_dir (str): Folder of the page cache.
+        cache_bytes (int): Disk budget of the page cache.
+        progress (callable): Called as progress(done, total) after every page.
+
+    Returns:
+        dict: Number of pages recognized, taken from the cache, and skipped
+        because they had text.
+    """
+    if not os.path.exists(input_path):
+        raise FileNotFoundError(f"File '{input_path}' not found.")
+
+    with fitz.open(input_path) as doc:
+        total = len(doc)
+        counts = {'recognized': 0, 'cached': 0, 'skipped': 0}
+        words = [None] * total
+
+        workers = max(1, min(workers or os.cpu_count() or 1, total))
+        pool = ProcessPoolExecutor(max_workers=workers)
+        try:
+            futures = {
+                pool.submit(recognize_page, input_path, index, engine, language, dpi, cache_dir, cache_bytes): index
+                for index in range(total)
+            }
+            for done, future in enumerate(as_completed(futures), 1):
+                outcome, page_words = future.result()
+                counts[outcome] += 1
+                words[futures[future]] = page_words
+                if progress:
+                    progress(done, total)
+        finally:
+            # On an error or cancellation, don't wait for the queued pages
+            pool.shutdown(cancel_futures=True)
+
+        fonts = {}
+        for page, page_words in zip(doc, words):
+            if page_words:
+                add_text_layer(page, page_words, dpi, language, fonts)
+
+        # Through a temporary file, so a crash or cancellation never leaves a
+        # truncated output behind
+        tmp_path = f"{output_path}.{os.getpid()}.tmp"
+        try:
+            doc.save(tmp_path, garbage=3, deflate=True)
+            os.replace(tmp_path, output_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    return counts
+
+
+def recognize_page(input_path, page_index, engine, language, dpi, cache_dir, cache_bytes):
+    """
+    Recognizes one page. Runs in a worker process.
+
+    Returns:
+        tuple: ('recognized' | 'cached' | 'skipped', words or None).
+    """
+    page = _open(input_path)[page_index]
+    if page.get_text("text").strip():
+        return 'skipped', None
+
+    pixmap = page.get_pixmap(matrix=fitz.Matrix(dpi / 72, dpi / 72), colorspace=fitz.csGRAY, alpha=False)
+    ocr_engine = get_engine(engine)
+    key = get_page_key(pixmap, ocr_engine, language, dpi)
+
+    cache = _get_cache(cache_dir, cache_bytes)
+    path = cache.get(key)
+    if path is not None:
+        with open(path) as f:
+            return 'cached', json.load(f)
+
+    words = ocr_engine.recognize(pixmap.tobytes("png"), pixmap.width, pixmap.height, language, dpi)
+    cache.put_bytes(key, json.dumps(words).encode())
+    return 'recognized', words
+
+
+def get_page_key(pixmap, engine, language, dpi):
+    """Cache key of a page image recognized by engine in language."""
+    digest = hashlib.sha256(pixmap.samples_mv)
+    digest.update(json.dumps([pixmap.width, pixmap.height, engine.name, engine.version, language, dpi,
+                              OCR_VERSION]).encode())
+    return digest.hexdigest()
+
+
+def add_text_layer(page, words, dpi, language, fonts):
+    """
+    Writes words (in pixels of a rendering at dpi) over page as invisible
+    text, each stretched to the width of its box.
+
+    Args:
+        fonts (dict): Fonts loaded so far, by language; shared by the pages
+            of a document.
+    """
+    scale = 72 / dpi
+    inserted = set()
+    shape = page.new_shape()
+    for text, x0, y0, x1, y1 in words:
+        fontname = 'helv'
+        width = fitz.get_text_length(text, fontname='helv', fontsize=1)
+        if not all(ord(char) < 256 for char in text):
+            font = _get_font(language, fonts)
+            if font is not None:
+                fontname = font[0]
+                width = font[1].text_length(text, fontsize=1)
+                if fontname not in inserted:
+                    page.insert_font(fontname=fontname, fontbuffer=font[1].buffer)
+                    inserted.add(fontname)
+
+        box_width = (x1 - x0) * scale
+        box_height = (y1 - y0) * scale
+        fontsize = min(box_width / width, box_height * 1.5) if width else box_height
+        if fontsize <= 0:
+            continue
+
+        # Words are positioned on the page as displayed; the text is drawn
+        # in unrotated page space
+        baseline = fitz.Point(x0 * scale, y1 * scale) * page.derotation_matrix
+        shape.insert_text(baseline, text, fontsize=fontsize, fontname=fontname, rotate=page.rotation, render_mode=3)
+    shape.commit()
+
+
+def _get_font(language, fonts):
+    """(name, Font) for the script of language, or None if unknown."""
+    script = LANGUAGE_SCRIPTS.get(language.split('+')[0])
+    if script is None:
+        return None
+    if language not in fonts:
+        fonts[language] = (f"ocr-{language.split('+')[0]}", fitz.Font(script=script))
+    return fonts[language]
+
+
+# --- Worker side ---
+
+_doc = None
+_doc_path = None
+_cache = None
+
+
+def _open(input_path):
+    """The document of this worker, opened once for all its pages."""
+    global _doc, _doc_path
+    if _doc_path != input_path:
+        if _doc is not None:
+            _doc.close()
+        _doc = fitz.open(input_path)
+        _doc_path = input_path
+    return _doc
+
+
+def _get_cache(cache_dir, cache_bytes):
+    global _cache
+    if _cache is None or _cache.root != cache_dir:
+        _cache = DiskCache(cache_dir, cache_bytes, suffix='.json')
+    return _cache
@@ -0,0 +1,35 @@
+import hashlib
+import json
+import os
+
+from blob_store import link_blob
+from slice_and_reorder.pipeline import ENGINE_VERSION
+
+RESULT_CACHE_DIR = os.path.join('edited_files', 'cache', 'results')
+
+
+def get_result_key(digest, kind, **params):
+    """
+    Cache key of a processed file.
+
+    Args:
+        digest (str): SHA-256 of the input file.
+        kind (str): Job kind, e.g. 'slice'.
+        **params: Parameters that change the output, e.g. mode.
+    """
+    key = json.dumps([digest, kind, ENGINE_VERSION, params], sort_keys=True)
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def fetch_result(cache, key, output_path):
+    """Link a cached result to output_path. Returns False on a cache miss."""
+    path = cache.get(key)
+    if path is None:
+        return False
+    link_blob(path, output_path)
+    return True
+
+
+def store_result(cache, key, output_path):
+    """Add a finished output file to the cache."""
+    cache.put_file(key, output_path)
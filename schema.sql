@@ -1,2 +1,18 @@
 CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT NOT NULL, hash TEXT NOT NULL);
 CREATE UNIQUE INDEX username ON users (username);
+CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, user_id INTEGER NOT NULL, kind TEXT NOT NULL, status TEXT NOT NULL, params TEXT NOT NULL, input_path TEXT NOT NULL, output_path TEXT NOT NULL, pages_done INTEGER NOT NULL DEFAULT 0, pages_total INTEGER NOT NULL DEFAULT 0, error TEXT, pid INTEGER, cache_key TEXT, result TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+CREATE INDEX IF NOT EXISTS jobs_user ON jobs (user_id);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status);
+CREATE TABLE IF NOT EXISTS files (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, name TEXT NOT NULL, size INTEGER NOT NULL, page_count INTEGER, sha256 TEXT NOT NULL, modified_at REAL NOT NULL, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+CREATE UNIQUE INDEX IF NOT EXISTS files_user_name ON files (user_id, name);
+CREATE INDEX IF NOT EXISTS files_user_modified ON files (user_id, modified_at, id);
+CREATE INDEX IF NOT EXISTS files_user_size ON files (user_id, size, id);
+CREATE TABLE IF NOT EXISTS temp_files (path TEXT PRIMARY KEY, user_id INTEGER NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS temp_files_last_used ON temp_files (last_used);
+CREATE INDEX IF NOT EXISTS temp_files_user ON temp_files (user_id, last_used);
+CREATE TABLE IF NOT EXISTS search_docs (id INTEGER PRIMARY KEY AUTOINCREMENT, sha256 TEXT NOT NULL UNIQUE, status TEXT NOT NULL, page_count INTEGER, indexed_at TIMESTAMP);
+CREATE VIRTUAL TABLE IF NOT EXISTS search_pages USING fts5(text, tokenize = 'unicode61 remove_diacritics 2');
+CREATE INDEX IF NOT EXISTS files_user_sha256 ON files (user_id, sha256);
+CREATE TABLE IF NOT EXISTS uploads (id TEXT PRIMARY KEY, user_id INTEGER NOT NULL, filename TEXT NOT NULL, size INTEGER NOT NULL, chunk_size INTEGER NOT NULL, status TEXT NOT NULL, error TEXT, digest TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS uploads_updated ON uploads (updated_at);
+CREATE TABLE IF NOT EXISTS upload_chunks (upload_id TEXT NOT NULL, chunk_index INTEGER NOT NULL, PRIMARY KEY (upload_id, chunk_index));
@@ -1,6 +1,6 @@
 import os
 import shutil
-from cs50 import SQL
+import sys
 from flask import Flask, render_template_string, request, redirect, url_for
 
 app = Flask(__name__)
@@ -10,7 +10,10 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DB_PATH = os.path.join(BASE_DIR, 'pdfeditor.db')
 EDITED_FILES_DIR = os.path.join(BASE_DIR, 'edited_files')
 
-db = SQL(f"sqlite:///{DB_PATH}")
+sys.path.insert(0, BASE_DIR)
+from database import Database
+
+db = Database(DB_PATH)
 
 @app.after_request
 def after_request(response):
@@ -83,6 +86,7 @@ def delete(user_id):
     # 2. Delete user from DB
     try:
         db.execute("DELETE FROM users WHERE id = ?", user_id)
+        db.execute("DELETE FROM files WHERE user_id = ?", user_id)
     except Exception as e:
         print(f"Error deleting user from DB: {e}")
         
@@ -0,0 +1,36 @@
+import argparse
+import os
+import sys
+
+# Run from anywhere: the file index works with paths relative to the app folder
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+os.chdir(BASE_DIR)
+
+from database import Database
+from file_index import init_file_index, reconcile
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the saved files index from disk.")
+    parser.add_argument("user_ids", nargs="*", type=int, help="Users to reconcile (default: all)")
+    args = parser.parse_args()
+
+    db = Database("pdfeditor.db")
+    init_file_index(db)
+
+    user_ids = args.user_ids or [row["id"] for row in db.execute("SELECT id FROM users")]
+
+    totals = {'added': 0, 'updated': 0, 'removed': 0}
+    for user_id in user_ids:
+        counts = reconcile(db, user_id)
+        if any(counts.values()):
+            print(f"User {user_id}: {counts['added']} added, {counts['updated']} updated, {counts['removed']} removed")
+        for key in totals:
+            totals[key] += counts[key]
+
+    print(f"{len(user_ids)} users: {totals['added']} added, {totals['updated']} updated, {totals['removed']} removed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+import html
+import multiprocessing
+import os
+import re
+import time
+
+import fitz
+
+from blob_store import get_blob_path
+from helpers import get_user_files_dir
+from jobs import run_in_pool
+
+# Text of every page of every saved file, indexed once per distinct content
+# (SHA-256): the same booklet saved by several users or under several names
+# is extracted and stored once. A page's rowid in search_pages is
+# (document id << PAGE_BITS) + page index, so a document's pages are one
+# rowid range and can be found or deleted without a scan.
+PAGE_BITS = 20
+PAGE_MASK = (1 << PAGE_BITS) - 1
+
+SEARCH_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS search_docs (id INTEGER PRIMARY KEY AUTOINCREMENT, sha256 TEXT NOT NULL UNIQUE,
+        status TEXT NOT NULL, page_count INTEGER, indexed_at TIMESTAMP)""",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS search_pages USING fts5(text, tokenize = 'unicode61 remove_diacritics 2')",
+    "CREATE INDEX IF NOT EXISTS files_user_sha256 ON files (user_id, sha256)",
+]
+
+PENDING = 'pending'
+INDEXED = 'indexed'
+FAILED = 'failed'
+
+# Markers put around matches by snippet(); the text is escaped afterwards
+_MARK_START = '\x02'
+_MARK_END = '\x03'
+
+
+def init_search_index(db):
+    """Creates the search tables if needed (after the files table)."""
+    for statement in SEARCH_SCHEMA:
+        db.execute(statement)
+
+
+def extract_text(path):
+    """
+    Text layer of every page of a PDF. Runs in a worker process.
+
+    Returns:
+        list: One string per page.
+    """
+    with fitz.open(path) as doc:
+        return [page.get_text("text") for page in doc]
+
+
+def index_file(db, digest, path):
+    """
+    Queues a saved file for indexing unless its content is indexed already.
+
+    Args:
+        digest (str): SHA-256 of the file.
+        path (str): The file; its blob is read instead if there is one,
+            as blobs never change.
+    """
+    try:
+        doc_id = db.execute("INSERT INTO search_docs (sha256, status) VALUES (?, ?)", digest, PENDING)
+    except ValueError:
+        # Indexed, or being indexed
+        return
+
+    blob_path = get_blob_path(digest)
+    source = blob_path if os.path.exists(blob_path) else path
+    future = run_in_pool(extract_text, source)
+    future.add_done_callback(lambda f: _store_pages(db, doc_id, f))
+
+
+def unindex(db, digest):
+    """Drops the pages of a content hash no saved file has any more."""
+    if db.execute("SELECT 1 FROM files WHERE sha256 = ? LIMIT 1", digest):
+        return
+
+    rows = db.execute("SELECT id FROM search_docs WHERE sha256 = ?", digest)
+    if rows:
+        _delete_pages(db, rows[0]["id"])
+        db.execute("DELETE FROM search_docs WHERE id = ?", rows[0]["id"])
+
+
+def sync_search_index(db):
+    """
+    Indexes saved files whose content isn't indexed, retries documents left
+    pending by a restart, and drops documents no file refers to.
+    """
+    # Spawned pool workers import the main module again
+    if multiprocessing.current_process().name != 'MainProcess':
+        return
+
+    stale = db.execute("SELECT id FROM search_docs WHERE status = ? OR sha256 NOT IN (SELECT sha256 FROM files)",
+                       PENDING)
+    for row in stale:
+        _delete_pages(db, row["id"])
+        db.execute("DELETE FROM search_docs WHERE id = ?", row["id"])
+
+    missing = db.execute(
+        """SELECT f.sha256, MIN(f.user_id) AS user_id, MIN(f.name) AS name FROM files f
+           LEFT JOIN search_docs d ON d.sha256 = f.sha256 WHERE d.id IS NULL GROUP BY f.sha256""")
+    for row in missing:
+        path = os.path.join(get_user_files_dir(row["user_id"], 'saved'), row["name"])
+        index_file(db, row["sha256"], path)
+
+
+def search(db, user_id, query, limit=20):
+    """
+    Finds pages of a user's saved files containing all words of query
+    (the last one as a prefix), or the exact phrase if query is quoted.
+
+    Returns:
+        list: Dicts with name, page (1-indexed) and snippet, an HTML-escaped
+        excerpt with the matches in <mark> tags. Best matches first.
+    """
+    match = to_fts_query(query)
+    if not match:
+        return []
+
+    rows = db.execute(
+        f"""SELECT f.name, (p.rowid & {PAGE_MASK}) + 1 AS page,
+                   snippet(search_pages, 0, ?, ?, '…', 12) AS snippet
+            FROM search_pages p
+            JOIN search_docs d ON d.id = p.rowid >> {PAGE_BITS}
+            JOIN files f ON f.sha256 = d.sha256 AND f.user_id = ?
+            WHERE search_pages MATCH ?
+            ORDER BY p.rank, f.name, page
+            LIMIT ?""",
+        _MARK_START, _MARK_END, user_id, match, limit)
+
+    for row in rows:
+        row["snippet"] = (html.escape(row["snippet"])
+                          .replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>'))
+    return rows
+
+
+def to_fts_query(query):
+    """
+    Turns user input into an FTS5 query that can't be a syntax error.
+
+    Every word is quoted, so FTS5 operators typed by the user are searched
+    for literally.
+    """
+    query = query.strip()
+    if len(query) > 1 and query.startswith('"') and query.endswith('"'):
+        phrase = query[1:-1].replace('"', '""').strip()
+        return f'"{phrase}"' if phrase else ''
+
+    words = [word.replace('"', '""') for word in re.findall(r'\w+', query)]
+    if not words:
+        return ''
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def search_stats(db):
+    row = db.execute(
+        """SELECT COUNT(*) AS documents, COALESCE(SUM(page_count), 0) AS pages,
+                  SUM(status = ?) AS pending, SUM(status = ?) AS failed FROM search_docs""",
+        PENDING, FAILED)[0]
+    return {key: row[key] or 0 for key in row}
+
+
+def _store_pages(db, doc_id, future):
+    """Writes the pages extracted for a document (in the web process)."""
+    try:
+        pages = future.result()
+    except Exception as e:
+        print(f"Error extracting text for search: {e}")
+        db.execute("UPDATE search_docs SET status = ? WHERE id = ?", FAILED, doc_id)
+        return
+
+    pages = pages[:PAGE_MASK + 1]
+    base = doc_id << PAGE_BITS
+    with db.transaction() as tx:
+        # Gone if the file was deleted in the meantime
+        if not tx.execute("SELECT 1 FROM search_docs WHERE id = ?", doc_id):
+            return
+        for i, text in enumerate(pages):
+            if text.strip():
+                tx.execute("INSERT INTO search_pages (rowid, text) VALUES (?, ?)", base + i, text)
+        tx.execute("UPDATE search_docs SET status = ?, page_count = ?, indexed_at = ? WHERE id = ?",
+                   INDEXED, len(pages), time.strftime('%Y-%m-%d %H:%M:%S'), doc_id)
+
+
+def _delete_pages(db, doc_id):
+    base = doc_id << PAGE_BITS
+    db.execute("DELETE FROM search_pages WHERE rowid BETWEEN ? AND ?", base, base + PAGE_MASK)
@@ -0,0 +1,191 @@
+import secrets
+import sqlite3
+import threading
+import time
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+from database import Database
+
+# Expired sessions are removed at most this often, in batches
+SWEEP_INTERVAL = 60
+SWEEP_BATCH = 1000
+
+SESSIONS_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL NOT NULL) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS sessions_expires ON sessions (expires_at)",
+]
+
+
+class SqliteSessionStore:
+    """
+    Sessions in an SQLite file, shared by every worker process.
+
+    Lookups go through the primary key; the expiry index keeps sweeps from
+    scanning the table.
+    """
+
+    def __init__(self, path, pool_size=8):
+        # Create the file if needed; Database only opens existing ones
+        sqlite3.connect(path).close()
+        self.db = Database(path, pool_size=pool_size)
+        for statement in SESSIONS_SCHEMA:
+            self.db.execute(statement)
+
+    def get(self, sid, now):
+        rows = self.db.execute("SELECT data, expires_at FROM sessions WHERE id = ? AND expires_at > ?", sid, now)
+        return (rows[0]["data"], rows[0]["expires_at"]) if rows else None
+
+    def set(self, sid, data, expires_at):
+        self.db.execute(
+            """INSERT INTO sessions (id, data, expires_at) VALUES (?, ?, ?)
+               ON CONFLICT (id) DO UPDATE SET data = excluded.data, expires_at = excluded.expires_at""",
+            sid, data, expires_at)
+
+    def touch(self, sid, expires_at):
+        self.db.execute("UPDATE sessions SET expires_at = ? WHERE id = ?", expires_at, sid)
+
+    def delete(self, sid):
+        self.db.execute("DELETE FROM sessions WHERE id = ?", sid)
+
+    def sweep(self, now):
+        return self.db.execute(
+            "DELETE FROM sessions WHERE id IN (SELECT id FROM sessions WHERE expires_at <= ? LIMIT ?)",
+            now, SWEEP_BATCH)
+
+
+class MemorySessionStore:
+    """
+    Sessions in a dict. Only for a single worker process (e.g. the
+    development server), as every process has its own copy.
+    """
+
+    def __init__(self):
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def get(self, sid, now):
+        entry = self._sessions.get(sid)
+        return entry if entry is not None and entry[1] > now else None
+
+    def set(self, sid, data, expires_at):
+        self._sessions[sid] = (data, expires_at)
+
+    def touch(self, sid, expires_at):
+        with self._lock:
+            entry = self._sessions.get(sid)
+            if entry is not None:
+                self._sessions[sid] = (entry[0], expires_at)
+
+    def delete(self, sid):
+        self._sessions.pop(sid, None)
+
+    def sweep(self, now):
+        with self._lock:
+            expired = [sid for sid, (_, expires_at) in self._sessions.items() if expires_at <= now]
+            for sid in expired[:SWEEP_BATCH]:
+                del self._sessions[sid]
+        return min(len(expired), SWEEP_BATCH)
+
+
+class StoredSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, expires_at=None):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.expires_at = expires_at
+        self.modified = False
+        # Set by clear() (login/logout), so the next save uses a new id
+        self.regenerate = False
+
+    def clear(self):
+        super().clear()
+        self.regenerate = True
+
+
+class StoredSessionInterface(SessionInterface):
+    """
+    Keeps session data in a store and only a random id in the cookie.
+
+    A session is written only when it changes. Its expiry slides with use
+    but is extended at most once per half lifetime, so plain page views are
+    reads only.
+    """
+
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, store):
+        self.store = store
+        self._last_sweep = 0.0
+
+    def open_session(self, app, request):
+        now = time.time()
+        if now - self._last_sweep > SWEEP_INTERVAL:
+            self._last_sweep = now
+            self.store.sweep(now)
+
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            found = self.store.get(sid, now)
+            if found is not None:
+                data, expires_at = found
+                return StoredSession(self.serializer.loads(data), sid=sid, expires_at=expires_at)
+
+        return StoredSession(sid=secrets.token_urlsafe(32))
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if session.accessed:
+            response.vary.add("Cookie")
+
+        if not session:
+            if session.expires_at is not None:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        lifetime = app.permanent_session_lifetime.total_seconds()
+        now = time.time()
+
+        if session.regenerate:
+            # Don't carry a session id across login, so it can't be fixed in advance
+            if session.expires_at is not None:
+                self.store.delete(session.sid)
+            session.sid = secrets.token_urlsafe(32)
+            session.expires_at = None
+
+        if session.modified or session.expires_at is None:
+            self.store.set(session.sid, self.serializer.dumps(dict(session)), now + lifetime)
+        elif session.expires_at - now < lifetime / 2:
+            self.store.touch(session.sid, now + lifetime)
+        else:
+            return
+
+        response.set_cookie(
+            name,
+            session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+
+
+def make_session_interface(backend, path=None):
+    """
+    Session interface for a backend name: 'sqlite' (needs path) or 'memory'.
+    """
+    if backend == 'sqlite':
+        return StoredSessionInterface(SqliteSessionStore(path))
+    elif backend == 'memory':
+        return StoredSessionInterface(MemorySessionStore())
+    raise ValueError(f"Unknown session backend: {backend}")
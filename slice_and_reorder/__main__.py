@@ -0,0 +1,7 @@
+import sys
+
+from slice_and_reorder.cli import main
+
+# Spawned workers import this module again under another name
+if __name__ == '__main__':
+    sys.exit(main())
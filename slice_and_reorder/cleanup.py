@@ -0,0 +1,186 @@
+import os
+
+import fitz
+import numpy as np
+
+from slice_and_reorder.utils import apply_page_edits
+
+# Pages are analysed at this resolution; lines of body text are still apart
+CLEANUP_DPI = 24
+
+# Strips this close to the edges (scanner borders, the shadow of the fold
+# after slicing) are ignored
+EDGE_FRACTION = 0.08
+
+# The paper is the brightness of this percentile of pixels (text may cover
+# more than half of a page); a pixel this much darker is ink
+PAPER_PERCENTILE = 90
+INK_CONTRAST = 64
+
+# A page with less than this share of ink pixels is blank; a page number
+# alone stays below it, a line of text does not
+BLANK_COVERAGE = 0.001
+
+# The ink of a page is averaged over a grid of this many cells (about 6 pt
+# each on A4, a few letters wide), then blurred over about a cell, so a
+# sheet scanned twice a few points off still gives a similar signature
+GRID_ROWS = 128
+GRID_COLUMNS = 96
+BLUR_CELLS = 1.0
+
+# Pages whose signatures correlate at least this much are duplicates.
+# Rescans of one page correlate above 0.85; distinct pages of body text,
+# which share their margins and line spacing, stay below 0.5 because the
+# mean ink of every row and column is taken out of the signature
+MIN_SIMILARITY = 0.75
+
+# Signatures of this many pages are compared with all others at a time
+COMPARE_BLOCK = 256
+
+
+def find_cleanup_pages(file_path, doc=None, dpi=CLEANUP_DPI):
+    """
+    Finds blank pages and near-duplicate pages (e.g. a sheet fed twice).
+
+    Pages are rendered one at a time at thumbnail resolution and reduced to
+    a signature: the share of ink pixels and a perceptual hash of where the
+    ink is (see get_signature). Only the signatures are kept, so memory
+    does not grow with the size of the pages.
+
+    Args:
+        file_path (str): Path to the PDF file.
+        doc (fitz.Document): The already open file_path, e.g. from a DocPool.
+        dpi (int): Resolution pages are analysed at.
+
+    Returns:
+        dict: {'blank': [page, ...], 'duplicates': [{'page': n, 'of': m}, ...]}
+        with 1-indexed pages; each duplicate names the earlier page it repeats.
+    """
+    if doc is None:
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"File not found: {file_path}")
+        with fitz.open(file_path) as doc:
+            return find_cleanup_pages(file_path, doc, dpi)
+
+    num_pages = len(doc)
+    coverage = np.empty(num_pages)
+    signatures = np.empty((num_pages, GRID_ROWS * GRID_COLUMNS), dtype=np.float16)
+    for i, page in enumerate(doc):
+        coverage[i], signatures[i] = get_signature(page, dpi)
+        # MuPDF keeps decoded images for reuse (up to 256 MB); no page
+        # is rendered twice here
+        fitz.TOOLS.store_shrink(100)
+
+    blank = coverage < BLANK_COVERAGE
+    originals = find_duplicates(signatures, ~blank)
+    return {
+        'blank': [int(i) + 1 for i in np.flatnonzero(blank)],
+        'duplicates': [{'page': int(i) + 1, 'of': int(originals[i]) + 1} for i in np.flatnonzero(originals >= 0)],
+    }
+
+
+def get_signature(page, dpi=CLEANUP_DPI):
+    """
+    Ink coverage and perceptual hash of the displayed page.
+
+    The hash is the darkness of the page averaged over a grid and blurred,
+    less the mean darkness of its row and of its column: what is left is
+    where the words, line ends and figures are, which the margins and line
+    spacing every page shares would otherwise outweigh. It is scaled to unit
+    length, so pages with more or less ink compare alike, and two hashes
+    correlate as their dot product.
+
+    Returns:
+        tuple: (share of ink pixels, GRID_ROWS * GRID_COLUMNS hash)
+    """
+    # Small pages are rendered larger, so every cell gets a pixel
+    zoom = max(dpi / 72, GRID_ROWS / (1 - 2 * EDGE_FRACTION) / page.rect.height,
+               GRID_COLUMNS / (1 - 2 * EDGE_FRACTION) / page.rect.width)
+    pixmap = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY, alpha=False)
+    image = np.frombuffer(pixmap.samples_mv, dtype=np.uint8).reshape(pixmap.height, pixmap.stride)[:, :pixmap.width]
+    y_edge = int(pixmap.height * EDGE_FRACTION)
+    x_edge = int(pixmap.width * EDGE_FRACTION)
+    image = image[y_edge:pixmap.height - y_edge, x_edge:pixmap.width - x_edge]
+
+    paper = np.percentile(image, PAPER_PERCENTILE)
+    coverage = float((image < paper - INK_CONTRAST).mean())
+
+    darkness = np.clip(paper - image.astype(np.float32), 0, None) / 255
+    grid = _blur(_resample_grid(darkness, GRID_ROWS, GRID_COLUMNS), BLUR_CELLS)
+    grid -= grid.mean(axis=1, keepdims=True)
+    grid -= grid.mean(axis=0, keepdims=True)
+    signature = grid.ravel()
+    norm = np.linalg.norm(signature)
+    return coverage, signature / norm if norm else signature
+
+
+def find_duplicates(signatures, candidates):
+    """
+    Matches every page with the first earlier page it is a near duplicate of.
+
+    Args:
+        signatures (ndarray): Hash of every page, see get_signature.
+        candidates (ndarray): Pages that may be compared (not blank).
+
+    Returns:
+        ndarray: For every page, the index of the page it repeats, or -1.
+    """
+    originals = np.full(len(signatures), -1)
+    indices = np.flatnonzero(candidates)
+
+    for start in range(0, len(indices), COMPARE_BLOCK):
+        stop = min(start + COMPARE_BLOCK, len(indices))
+        block = signatures[indices[start:stop]].astype(np.float32)
+        similar = np.empty((stop - start, len(indices)), dtype=bool)
+        # Only earlier pages count as originals, so later blocks are skipped
+        for other in range(0, stop, COMPARE_BLOCK):
+            others = signatures[indices[other:other + COMPARE_BLOCK]].astype(np.float32)
+            similar[:, other:other + COMPARE_BLOCK] = block @ others.T >= MIN_SIMILARITY
+        similar[:, stop:] = False
+        similar &= np.arange(len(indices))[None, :] < np.arange(start, stop)[:, None]
+        found = np.flatnonzero(similar.any(axis=1))
+        originals[indices[start + found]] = indices[similar[found].argmax(axis=1)]
+    return originals
+
+
+def remove_pages(file_path, pages, doc=None):
+    """
+    Removes pages (e.g. those found by find_cleanup_pages) and rewrites the
+    file in full, so the space of the removed pages is given back.
+
+    Args:
+        file_path (str): Path to the PDF file.
+        pages (list): Page numbers to remove (1-indexed).
+        doc (fitz.Document): The already open file_path, see apply_page_edits.
+
+    Returns:
+        dict: {'page_count': pages left, 'compacted': True}
+
+    Raises:
+        ValueError: If a page does not exist or no page would be left.
+    """
+    # Later pages first, so the numbers of the others don't shift
+    ops = [{'op': 'delete', 'page': page} for page in sorted(set(pages), reverse=True)]
+    return apply_page_edits(file_path, ops, doc=doc, compact=True)
+
+
+def _resample_grid(image, rows, columns):
+    """Means of image over rows x columns equal cells."""
+    height, width = image.shape
+    row_edges = np.arange(rows) * height // rows
+    column_edges = np.arange(columns) * width // columns
+    sums = np.add.reduceat(np.add.reduceat(image, row_edges, axis=0), column_edges, axis=1)
+    counts = np.outer(np.diff(row_edges, append=height), np.diff(column_edges, append=width))
+    return sums / counts
+
+
+def _blur(grid, sigma):
+    """Gaussian blur of grid over sigma cells, in both directions."""
+    radius = int(3 * sigma)
+    kernel = np.exp(-0.5 * (np.arange(-radius, radius + 1) / sigma) ** 2)
+    kernel /= kernel.sum()
+    for axis in (0, 1):
+        padded = np.pad(grid, [(radius, radius) if a == axis else (0, 0) for a in (0, 1)], mode='edge')
+        length = grid.shape[axis]
+        grid = sum(weight * np.take(padded, np.arange(k, k + length), axis=axis) for k, weight in enumerate(kernel))
+    return grid.astype(np.float32)
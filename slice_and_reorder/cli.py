@@ -0,0 +1,290 @@
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import signal
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import fitz
+
+from blob_store import hash_file
+from result_cache import get_result_key
+from slice_and_reorder.engines import DEFAULT_ENGINE, ENGINES
+from slice_and_reorder.pipeline import slice_and_reorder_pdf
+from slice_and_reorder.reorder import REORDER_MODES
+
+# Batch slicing of whole directories, e.g. a scanner's output share:
+#
+#   python -m slice_and_reorder scans/ sliced/ --mode booklet_rtl
+#   python -m slice_and_reorder scans/ sliced/ --mode spreads_ltr --watch
+#
+# Every PDF under the input folder is sliced into the same relative path
+# under the output folder by a pool of worker processes. A manifest in the
+# output folder records the result of every input by content hash and
+# options, so files already processed (also under another name) are
+# skipped on the next run, even if their outputs were moved away since.
+# Outputs are written under a hidden temporary name and renamed when
+# complete, so whatever picks them up never sees a partial file.
+MANIFEST_NAME = '.slice_manifest.json'
+MANIFEST_VERSION = 1
+
+# In watch mode, files changed more recently than this are left for the
+# next scan: the scanner may still be writing them
+SETTLE_SECONDS = 5
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m slice_and_reorder',
+                                     description="Slice and reorder every PDF in a directory tree.")
+    parser.add_argument('input_dir', help="folder to read PDFs from (recursively)")
+    parser.add_argument('output_dir', help="folder to write the results to, mirroring input_dir")
+    parser.add_argument('--mode', choices=REORDER_MODES, default='booklet_rtl')
+    parser.add_argument('--engine', choices=ENGINES, default=DEFAULT_ENGINE)
+    parser.add_argument('--auto-split', action='store_true', help="cut every page at its detected gutter")
+    parser.add_argument('--optimize', action='store_true', help="rewrite the outputs to take less space")
+    parser.add_argument('--force', action='store_true', help="slice files the manifest lists as done again")
+    parser.add_argument('--workers', type=int, default=0, help="worker processes (default: CPU count)")
+    parser.add_argument('--watch', action='store_true', help="keep watching input_dir for new files")
+    parser.add_argument('--interval', type=float, default=10, help="seconds between scans with --watch")
+    parser.add_argument('--settle', type=float, default=SETTLE_SECONDS,
+                        help="with --watch, skip files changed less than this many seconds ago")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.input_dir):
+        parser.error(f"not a directory: {args.input_dir}")
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    options = {
+        'mode': REORDER_MODES[args.mode],
+        'engine': args.engine,
+        'auto_split': args.auto_split,
+        'optimize': args.optimize,
+    }
+    manifest_path = os.path.join(args.output_dir, MANIFEST_NAME)
+    manifest = load_manifest(manifest_path, force=args.force)
+    totals = Summary()
+    # Inputs handled by this run, by (path, size, mtime); one that failed is
+    # not retried until it changes
+    seen = set()
+
+    # spawn, like the job queue, so workers start from a clean interpreter
+    executor = ProcessPoolExecutor(max_workers=args.workers or os.cpu_count(),
+                                   mp_context=multiprocessing.get_context('spawn'), initializer=_ignore_interrupt)
+    try:
+        while True:
+            settle = args.settle if args.watch else 0
+            batch = Summary()
+            run_batch(executor, args.input_dir, args.output_dir, options, manifest, manifest_path, seen, settle,
+                      batch)
+            totals.add(batch)
+            if batch.files or not args.watch:
+                print(batch.report(), flush=True)
+            if not args.watch:
+                break
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        executor.shutdown(wait=False, cancel_futures=True)
+        print(f"Stopped. Total: {totals.report()}")
+    else:
+        executor.shutdown()
+
+    return 1 if totals.failed else 0
+
+
+class Summary:
+    """Counts of a batch of files, for the throughput report."""
+
+    def __init__(self):
+        self.done = 0
+        self.skipped = 0
+        self.failed = 0
+        self.pages = 0
+        self.bytes = 0
+        self.seconds = 0.0
+
+    @property
+    def files(self):
+        return self.done + self.skipped + self.failed
+
+    def add(self, other):
+        self.done += other.done
+        self.skipped += other.skipped
+        self.failed += other.failed
+        self.pages += other.pages
+        self.bytes += other.bytes
+        self.seconds += other.seconds
+
+    def report(self):
+        pages_per_second = self.pages / self.seconds if self.seconds else 0
+        mb_per_second = self.bytes / 2**20 / self.seconds if self.seconds else 0
+        return (f"{self.done} sliced, {self.skipped} skipped, {self.failed} failed; "
+                f"{self.pages} pages in {self.seconds:.1f} s ({pages_per_second:.1f} pages/s, "
+                f"{mb_per_second:.1f} MB/s)")
+
+
+def run_batch(executor, input_dir, output_dir, options, manifest, manifest_path, seen, settle, summary):
+    """
+    Slices every PDF under input_dir not in seen on the executor, updating
+    the manifest as each one finishes.
+    """
+    start = time.perf_counter()
+    futures = {}
+    # Inputs with the same content as one submitted in this batch
+    duplicates = []
+    submitted = set()
+    for source in find_pdfs(input_dir, output_dir, settle):
+        relative = os.path.relpath(source, input_dir)
+        try:
+            stats = os.stat(source)
+            if (source, stats.st_size, stats.st_mtime_ns) in seen:
+                continue
+            digest = get_source_digest(manifest, relative, source, stats)
+        except FileNotFoundError:
+            # Moved away since the folder was listed
+            continue
+        seen.add((source, stats.st_size, stats.st_mtime_ns))
+        key = get_result_key(digest, 'slice', **options)
+        output_path = os.path.join(output_dir, relative)
+
+        if key in manifest['outputs']:
+            # Same content and options as an earlier input; under a new name
+            # it gets a link to that output if it is still there
+            previous = os.path.join(output_dir, manifest['outputs'][key]['output'])
+            if previous != output_path and os.path.exists(previous) and not os.path.exists(output_path):
+                _link_or_copy(previous, output_path)
+            summary.skipped += 1
+            continue
+        if key in submitted:
+            duplicates.append((key, output_path))
+            continue
+        submitted.add(key)
+
+        future = executor.submit(process_file, source, output_path, options)
+        futures[future] = (source, relative, stats, key)
+
+    for future in as_completed(futures):
+        source, relative, stats, key = futures[future]
+        try:
+            pages, seconds = future.result()
+        except Exception as e:
+            summary.failed += 1
+            print(f"FAILED {relative}: {e}", file=sys.stderr, flush=True)
+            continue
+
+        manifest['outputs'][key] = {'source': relative, 'output': relative, 'pages': pages,
+                                    'finished_at': time.time()}
+        save_manifest(manifest_path, manifest)
+        summary.done += 1
+        summary.pages += pages
+        summary.bytes += stats.st_size
+        print(f"{relative}: {pages} pages in {seconds:.2f} s", flush=True)
+
+    for key, output_path in duplicates:
+        if key in manifest['outputs']:
+            _link_or_copy(os.path.join(output_dir, manifest['outputs'][key]['output']), output_path)
+            summary.skipped += 1
+        else:
+            summary.failed += 1
+
+    if futures:
+        summary.seconds = time.perf_counter() - start
+
+
+def process_file(source, output_path, options):
+    """
+    Slices one file inside a worker, writing output_path atomically.
+
+    Returns:
+        tuple: (pages of the input, seconds)
+    """
+    start = time.perf_counter()
+    with fitz.open(source) as doc:
+        pages = doc.page_count
+
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    folder, name = os.path.split(output_path)
+    tmp_path = os.path.join(folder, f".{name}.{os.getpid()}.part")
+    try:
+        slice_and_reorder_pdf(source, tmp_path, **options)
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return pages, time.perf_counter() - start
+
+
+def find_pdfs(input_dir, output_dir, settle=0):
+    """
+    Paths of the PDFs under input_dir, in order, leaving out output_dir
+    (if inside), hidden files and files changed less than settle seconds ago.
+    """
+    output_dir = os.path.abspath(output_dir)
+    cutoff = time.time() - settle
+    for root, dirs, files in os.walk(input_dir):
+        dirs[:] = sorted(d for d in dirs
+                         if not d.startswith('.') and os.path.abspath(os.path.join(root, d)) != output_dir)
+        for name in sorted(files):
+            if name.startswith('.') or not name.lower().endswith('.pdf'):
+                continue
+            path = os.path.join(root, name)
+            try:
+                if settle and os.stat(path).st_mtime > cutoff:
+                    continue
+            except FileNotFoundError:
+                continue
+            yield path
+
+
+def get_source_digest(manifest, relative, path, stats):
+    """SHA-256 of an input, hashed again only if its size or mtime changed."""
+    memo = manifest['files'].get(relative)
+    if memo and memo['size'] == stats.st_size and memo['mtime_ns'] == stats.st_mtime_ns:
+        return memo['digest']
+    digest = hash_file(path)
+    manifest['files'][relative] = {'size': stats.st_size, 'mtime_ns': stats.st_mtime_ns, 'digest': digest}
+    return digest
+
+
+def load_manifest(path, force=False):
+    """
+    The manifest at path, or an empty one if missing or from another
+    version. With force, only the remembered hashes of inputs are kept.
+    """
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+        if manifest.get('version') == MANIFEST_VERSION:
+            if force:
+                manifest['outputs'] = {}
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return {'version': MANIFEST_VERSION, 'outputs': {}, 'files': {}}
+
+
+def save_manifest(path, manifest):
+    """Writes the manifest through a temporary file, so a crash never leaves half of it."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def _ignore_interrupt():
+    # Ctrl-C reaches the whole process group; the main process stops the pool
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _link_or_copy(src, dst):
+    """Makes dst a copy of src (a hardlink where possible), atomically."""
+    os.makedirs(os.path.dirname(dst) or '.', exist_ok=True)
+    folder, name = os.path.split(dst)
+    tmp_path = os.path.join(folder, f".{name}.{os.getpid()}.part")
+    try:
+        os.link(src, tmp_path)
+    except OSError:
+        shutil.copyfile(src, tmp_path)
+    os.replace(tmp_path, dst)
@@ -0,0 +1,198 @@
+import os
+
+import fitz
+from fitz import mupdf
+from pypdf import PdfReader
+
+from metrics import stage, count
+from slice_and_reorder.reorder import get_page_order, reorder_pdf
+from slice_and_reorder.shard import sharded_slice_and_reorder_pdf
+from slice_and_reorder.slice import write_halves, split_media_box
+from slice_and_reorder.stream import MEMORY_LIMIT, stream_reorder_pdf, stream_slice_and_reorder_pdf
+
+# An engine writes the sliced halves of a PDF's pages in the order of a
+# reorder mode (see reorder.py), or reorders whole pages. Every engine gives
+# the same pages: each half keeps the /MediaBox and /Rotate of its page and
+# gets the /CropBox of get_half_boxes, so the output only differs in how
+# the file is laid out. benchmarks/check_engines.py checks this.
+
+class PypdfEngine:
+    """pypdf, in pure Python; see slice.py and shard.py."""
+
+    name = 'pypdf'
+
+    def slice_and_reorder(self, input_path, output_path, mode, shared=True, progress=None, shards=1, splits=None,
+                          memory_limit=MEMORY_LIMIT):
+        """
+        Args:
+            input_path (str): Path to source PDF.
+            output_path (str): Path to save processed PDF.
+            mode (int): Reorder mode (1-4).
+            shared (bool): Share page content between the two halves of a
+                page instead of deep copying them.
+            progress (callable): Called as progress(done, total).
+            shards (int): Slice page ranges in this many worker processes.
+            splits (list): Split position of every page, see get_half_boxes.
+            memory_limit (int): Memory ceiling in bytes (stream engine only).
+        """
+        if shards > 1 and shared:
+            sharded_slice_and_reorder_pdf(input_path, output_path, mode, shards=shards, progress=progress,
+                                          splits=splits)
+            return
+
+        with stage('parse'):
+            reader = PdfReader(input_path)
+            num_pages = len(reader.pages)
+        count(pages=num_pages)
+        order = get_page_order(2 * num_pages, mode)
+
+        write_halves(reader, order, output_path, shared=shared, progress=progress, splits=splits)
+
+    def reorder(self, input_path, output_path, mode, memory_limit=MEMORY_LIMIT):
+        """Reorders the pages of an already sliced PDF."""
+        reorder_pdf(input_path, output_path, mode)
+
+
+class FitzEngine:
+    """
+    PyMuPDF, through MuPDF's own object API. The source document is edited
+    in memory and saved under the new name: every half is a copy of its page's
+    dictionary (pointing to the same content and resources) with its own
+    /CropBox, and the page tree is replaced by one list of the halves in
+    output order. Page content, fonts and images are copied from the source
+    as they are, never parsed.
+
+    Halves always share their content, and the work is done in C, so
+    shards are not used.
+    """
+
+    name = 'fitz'
+
+    def slice_and_reorder(self, input_path, output_path, mode, shared=True, progress=None, shards=1, splits=None,
+                          memory_limit=MEMORY_LIMIT):
+        """Same arguments as PypdfEngine.slice_and_reorder."""
+        with stage('parse'):
+            doc = fitz.open(input_path)
+        with doc:
+            pdf = mupdf.pdf_document_from_fz_document(doc.this)
+            pages = _get_flat_pages(pdf)
+            count(pages=len(pages))
+            order = get_page_order(2 * len(pages), mode)
+
+            with stage('crop'):
+                boxes = []
+                for page_index, page in enumerate(pages):
+                    media_box = mupdf.pdf_dict_get_rect(page, mupdf.PDF_ENUM_NAME_MediaBox)
+                    rotation = mupdf.pdf_dict_get_int(page, mupdf.PDF_ENUM_NAME_Rotate)
+                    split = splits[page_index] if splits is not None else 0.5
+                    boxes.append(split_media_box(rotation, media_box.x1 - media_box.x0, media_box.y1 - media_box.y0,
+                                                 split))
+
+                halves = []
+                used = set()
+                total = len(order)
+                for done, half_index in enumerate(order, 1):
+                    page_index = half_index // 2
+                    half = pages[page_index]
+                    if page_index in used:
+                        # The other half was added already; copy the page
+                        # dictionary, which only refers to the content
+                        half = mupdf.pdf_add_object(pdf, mupdf.pdf_copy_dict(half))
+                    used.add(page_index)
+
+                    box = boxes[page_index][half_index % 2]
+                    mupdf.pdf_dict_put(half, mupdf.PDF_ENUM_NAME_CropBox, mupdf.pdf_new_rect(pdf, mupdf.FzRect(*box)))
+                    halves.append(half)
+
+                    if progress:
+                        progress(done, total)
+
+                _set_page_list(pdf, halves)
+
+            with stage('write'):
+                _save(doc, output_path)
+
+    def reorder(self, input_path, output_path, mode, memory_limit=MEMORY_LIMIT):
+        """Reorders the pages of an already sliced PDF."""
+        with fitz.open(input_path) as doc:
+            pdf = mupdf.pdf_document_from_fz_document(doc.this)
+            pages = _get_flat_pages(pdf)
+            _set_page_list(pdf, [pages[i] for i in get_page_order(len(pages), mode)])
+            _save(doc, output_path)
+
+
+class StreamEngine:
+    """
+    Writes the output one page at a time with memory that does not grow
+    with the size of the document, for scans too large to hold; see
+    stream.py. Slower than fitz, about as fast as pypdf.
+    """
+
+    name = 'stream'
+
+    def slice_and_reorder(self, input_path, output_path, mode, shared=True, progress=None, shards=1, splits=None,
+                          memory_limit=MEMORY_LIMIT):
+        """Same arguments as PypdfEngine.slice_and_reorder."""
+        stream_slice_and_reorder_pdf(input_path, output_path, mode, progress=progress, splits=splits,
+                                     memory_limit=memory_limit)
+
+    def reorder(self, input_path, output_path, mode, memory_limit=MEMORY_LIMIT):
+        """Reorders the pages of an already sliced PDF."""
+        stream_reorder_pdf(input_path, output_path, mode, memory_limit=memory_limit)
+
+
+ENGINES = {
+    'pypdf': PypdfEngine,
+    'fitz': FitzEngine,
+    'stream': StreamEngine,
+}
+
+# See benchmarks/bench_engines.py
+DEFAULT_ENGINE = 'fitz'
+
+_engines = {}
+
+
+def get_engine(name):
+    """Returns the (shared) engine called name. Raises ValueError if unknown."""
+    if name not in ENGINES:
+        raise ValueError(f"Unknown slicing engine: {name}")
+    if name not in _engines:
+        _engines[name] = ENGINES[name]()
+    return _engines[name]
+
+
+def _get_flat_pages(pdf):
+    """
+    The page dictionaries of pdf, with the attributes they inherit from the
+    page tree copied into them, so they can be moved out of their nodes.
+    """
+    # Look all pages up first: changing a page drops MuPDF's page map
+    pages = [mupdf.pdf_lookup_page_obj(pdf, i) for i in range(mupdf.pdf_count_pages(pdf))]
+    for page in pages:
+        mupdf.pdf_flatten_inheritable_page_items(page)
+    return pages
+
+
+def _set_page_list(pdf, pages):
+    """Makes pages, in order, the only pages of pdf, under its root page tree node."""
+    root = mupdf.pdf_dict_getp(mupdf.pdf_trailer(pdf), 'Root/Pages')
+    kids = mupdf.pdf_new_array(pdf, len(pages))
+    for page in pages:
+        mupdf.pdf_dict_put(page, mupdf.PDF_ENUM_NAME_Parent, root)
+        mupdf.pdf_array_push(kids, page)
+    mupdf.pdf_dict_put(root, mupdf.PDF_ENUM_NAME_Kids, kids)
+    mupdf.pdf_dict_put_int(root, mupdf.PDF_ENUM_NAME_Count, len(pages))
+
+
+def _save(doc, output_path):
+    """Saves doc through a temporary file, see write_pdf."""
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    try:
+        # garbage=1 drops the old page tree nodes
+        doc.save(tmp_path, garbage=1)
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
@@ -0,0 +1,211 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz
+import numpy as np
+
+# Bump whenever find_splits gives different results, so cached splits from
+# older versions are not used
+GUTTER_VERSION = 2
+
+# Pages are analysed at this resolution (about 0.85 mm per pixel)
+GUTTER_DPI = 30
+
+# Profiles of this many pages are analysed together
+BATCH_SIZE = 64
+
+# The gutter is searched within this fraction of the width either side of
+# the centre; only that band is rendered
+SEARCH_FRACTION = 0.2
+
+# Column profiles of the band are resampled to this many bins, so pages of
+# different sizes can be stacked
+PROFILE_BINS = 256
+
+# Below this many pages per worker process, start-up costs more than the
+# parallel rendering saves
+MIN_WORKER_PAGES = 100
+
+# Rows this close to the top or bottom edge (headers, scanner borders) are ignored
+EDGE_FRACTION = 0.05
+
+# Only the band down to this fraction of the height is rendered at first: a
+# scan is decoded from the top and only as far as the last row needed, so
+# this strip costs about a third of the whole band. Pages without a clear
+# gutter in it (e.g. a chapter opening, blank at the top) get the whole band.
+STRIP_FRACTION = 0.3
+
+# A pixel darker than this is ink; a column with a larger fraction of ink
+# pixels has text on it
+INK_LEVEL = 128
+INK_FRACTION = 0.01
+
+# Runs of text narrower than this (the spine line or its shadow) are
+# treated as part of the gutter, in points
+MAX_SPINE_WIDTH = 12
+
+# A gap between the halves must be at least this wide, in points
+MIN_GAP_WIDTH = 4
+
+
+def find_splits(input_path, cache=None, dpi=GUTTER_DPI, workers=1):
+    """
+    Finds where each page of a scan of two-page spreads should be split.
+
+    The central band of every page is rendered at low resolution as
+    displayed (rotation applied), first only its top strip. Its column
+    profile (share of ink pixels per column) then locates the gutter: the
+    widest text-free band near the centre, across a narrow dark spine if
+    there is one.
+
+    Args:
+        input_path (str): Path to the PDF.
+        cache: DiskCache for the results, keyed by the file (see
+            disk_cache.py); optional.
+        dpi (int): Resolution pages are analysed at.
+        workers (int): Render page ranges in this many worker processes.
+
+    Returns:
+        list: For every page, the split position as a fraction of the
+        displayed width from the visual left edge (0.5 if no clear gutter
+        was found).
+    """
+    key = _get_cache_key(input_path, dpi)
+    if cache is not None:
+        path = cache.get(key)
+        if path is not None:
+            with open(path) as f:
+                return json.load(f)
+
+    with fitz.open(input_path) as doc:
+        num_pages = len(doc)
+
+    workers = max(1, min(workers, num_pages // MIN_WORKER_PAGES))
+    if workers == 1:
+        splits = find_range_splits(input_path, 0, num_pages, dpi)
+    else:
+        bounds = np.linspace(0, num_pages, workers + 1).astype(int)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(find_range_splits, input_path, start, stop, dpi)
+                       for start, stop in zip(bounds[:-1], bounds[1:])]
+            splits = [split for future in futures for split in future.result()]
+
+    if cache is not None:
+        cache.put_bytes(key, json.dumps(splits).encode())
+    return splits
+
+
+def find_range_splits(input_path, start, stop, dpi=GUTTER_DPI):
+    """Splits of pages [start, stop), in batches. May run in a worker process."""
+    splits = []
+    with fitz.open(input_path) as doc:
+        for batch_start in range(start, stop, BATCH_SIZE):
+            pages = [doc[i] for i in range(batch_start, min(batch_start + BATCH_SIZE, stop))]
+            profiles, widths = zip(*(get_profile(page, dpi, STRIP_FRACTION) for page in pages))
+            batch = find_gutters(np.stack(profiles), np.array(widths))
+
+            unclear = [i for i, split in enumerate(batch) if split == 0.5]
+            if unclear:
+                profiles, widths = zip(*(get_profile(pages[i], dpi) for i in unclear))
+                for i, split in zip(unclear, find_gutters(np.stack(profiles), np.array(widths))):
+                    batch[i] = split
+            splits.extend(batch)
+            # MuPDF keeps decoded images for reuse (up to 256 MB), which slows
+            # down what follows in this process; no page is rendered again
+            fitz.TOOLS.store_shrink(100)
+    return splits
+
+
+def get_profile(page, dpi=GUTTER_DPI, bottom=1 - EDGE_FRACTION):
+    """
+    Share of ink pixels in every column of the central band of the
+    displayed page, from the top edge strip down to bottom (a fraction of
+    the height).
+
+    Returns:
+        tuple: (profile resampled to PROFILE_BINS, displayed width in points).
+    """
+    # Halves are cut from the media box, so measure that (setting it is
+    # slow, and scans rarely have another crop box)
+    if page.cropbox != page.mediabox:
+        page.set_cropbox(page.mediabox)
+    rect = page.rect
+    band = fitz.Rect(rect.x0 + rect.width * (0.5 - SEARCH_FRACTION), rect.y0 + rect.height * EDGE_FRACTION,
+                     rect.x0 + rect.width * (0.5 + SEARCH_FRACTION), rect.y0 + rect.height * bottom)
+    pixmap = page.get_pixmap(matrix=fitz.Matrix(dpi / 72, dpi / 72), colorspace=fitz.csGRAY, alpha=False,
+                             clip=band)
+
+    image = np.frombuffer(pixmap.samples_mv, dtype=np.uint8).reshape(pixmap.height, pixmap.stride)[:, :pixmap.width]
+    profile = (image < INK_LEVEL).mean(axis=0)
+
+    # Sample at bin centres
+    positions = (np.arange(PROFILE_BINS) + 0.5) * pixmap.width / PROFILE_BINS - 0.5
+    return np.interp(positions, np.arange(pixmap.width), profile), rect.width
+
+
+def find_gutters(profiles, widths):
+    """
+    Locates the gutter in a batch of column profiles of the central band.
+
+    Args:
+        profiles (ndarray): One row of PROFILE_BINS per page.
+        widths (ndarray): Displayed width of every page in points.
+
+    Returns:
+        list: Split position of every page as a fraction of its width.
+    """
+    count, bins = profiles.shape
+    bins_per_point = bins / (2 * SEARCH_FRACTION * widths)
+    text = profiles > INK_FRACTION
+
+    # Opening: text runs narrower than the spine width disappear, wider
+    # ones keep their extent
+    spine = np.maximum(1, np.round(MAX_SPINE_WIDTH * bins_per_point)).astype(int)
+    for width in np.unique(spine):
+        rows = spine == width
+        text[rows] = _dilate(_erode(text[rows], width), width)
+
+    # Length of the gap run ending at every column; the longest one per page
+    gap = ~text
+    columns = np.arange(bins)
+    last_text = np.maximum.accumulate(np.where(gap, -1, columns), axis=1)
+    run_lengths = columns - last_text
+    ends = run_lengths.argmax(axis=1)
+    lengths = run_lengths[np.arange(count), ends]
+    centres = ends - (lengths - 1) / 2
+
+    splits = 0.5 - SEARCH_FRACTION + (centres + 0.5) / bins * 2 * SEARCH_FRACTION
+
+    # No gap, a gap too narrow to be a gutter, or one running off the band
+    # (a blank half): keep the middle
+    unclear = (lengths < MIN_GAP_WIDTH * bins_per_point) | (ends - lengths + 1 <= 0) | (ends >= bins - 1)
+    splits[unclear] = 0.5
+    return [round(float(split), 4) for split in splits]
+
+
+def _erode(mask, width):
+    """True where all of the width columns centred there are True."""
+    if width <= 1:
+        return mask
+    padded = np.pad(mask, ((0, 0), (width // 2, (width - 1) // 2)), constant_values=True)
+    return np.lib.stride_tricks.sliding_window_view(padded, width, axis=1).all(axis=2)
+
+
+def _dilate(mask, width):
+    """True where any of the width columns centred there is True."""
+    if width <= 1:
+        return mask
+    padded = np.pad(mask, ((0, 0), ((width - 1) // 2, width // 2)), constant_values=False)
+    return np.lib.stride_tricks.sliding_window_view(padded, width, axis=1).any(axis=2)
+
+
+def _get_cache_key(input_path, dpi):
+    """
+    Cache key of a file's splits. Uploads of the same content are links to
+    one blob (the same inode), so they share their key.
+    """
+    stats = os.stat(input_path)
+    key = [stats.st_dev, stats.st_ino, stats.st_size, stats.st_mtime_ns, dpi, GUTTER_VERSION]
+    return hashlib.sha256(json.dumps(key).encode()).hexdigest()
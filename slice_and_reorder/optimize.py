@@ -0,0 +1,78 @@
+import os
+import shutil
+import subprocess
+import time
+
+import fitz
+
+# MuPDF dropped linearisation (1.26), so fast web view needs qpdf
+QPDF = 'qpdf'
+
+
+def optimize_pdf(input_path, output_path=None, linearize=False):
+    """
+    Rewrites a PDF to take less space.
+
+    Identical objects, including identical streams such as a scan image
+    repeated on both halves of a page, are merged into one; objects no
+    page refers to any more are dropped; streams are deflated and the
+    remaining small objects are packed into compressed object streams.
+
+    Args:
+        input_path (str): Path to the PDF.
+        output_path (str): Where to write the result (default: input_path,
+            replaced once the result is complete).
+        linearize (bool): Also linearize the result for fast web view, so
+            browsers can show the first page before the rest is loaded.
+            Needs qpdf on the PATH; skipped without it.
+
+    Returns:
+        dict: {'bytes_before', 'bytes_after', 'seconds', 'linearized'}. If
+        the rewrite is not smaller, the file is kept as it was.
+    """
+    if not os.path.exists(input_path):
+        raise FileNotFoundError(f"File '{input_path}' not found.")
+    if output_path is None:
+        output_path = input_path
+
+    start = time.perf_counter()
+    bytes_before = os.path.getsize(input_path)
+    tmp_path = f"{output_path}.{os.getpid()}.optimize"
+    try:
+        with fitz.open(input_path) as doc:
+            doc.save(tmp_path, garbage=4, deflate=True, deflate_images=True, deflate_fonts=True,
+                     use_objstms=True)
+
+        if os.path.getsize(tmp_path) >= bytes_before:
+            shutil.copyfile(input_path, tmp_path)
+
+        linearized = linearize and _linearize(tmp_path)
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return {
+        'bytes_before': bytes_before,
+        'bytes_after': os.path.getsize(output_path),
+        'seconds': round(time.perf_counter() - start, 3),
+        'linearized': linearized,
+    }
+
+
+def _linearize(path):
+    """Linearizes path in place with qpdf; returns False if qpdf is missing."""
+    qpdf = shutil.which(QPDF)
+    if qpdf is None:
+        return False
+
+    linear_path = f"{path}.linear"
+    # Exit code 3 means success with warnings
+    result = subprocess.run([qpdf, '--linearize', '--object-streams=generate', path, linear_path],
+                            capture_output=True)
+    if result.returncode not in (0, 3):
+        if os.path.exists(linear_path):
+            os.remove(linear_path)
+        raise RuntimeError(f"qpdf failed: {result.stderr.decode(errors='replace').strip()}")
+    os.replace(linear_path, path)
+    return True
@@ -0,0 +1,61 @@
+import os
+
+from metrics import stage
+from slice_and_reorder.engines import DEFAULT_ENGINE, get_engine
+from slice_and_reorder.gutter import find_splits
+from slice_and_reorder.optimize import optimize_pdf
+from slice_and_reorder.stream import MEMORY_LIMIT
+
+# Bump whenever the output of slice_and_reorder_pdf changes, so cached
+# results from older versions are not served
+ENGINE_VERSION = 2
+
+
+def slice_and_reorder_pdf(input_path, output_path, mode, shared=True, progress=None, shards=1, auto_split=False,
+                          split_cache=None, optimize=False, linearize=False, engine=DEFAULT_ENGINE,
+                          memory_limit=MEMORY_LIMIT):
+    """
+    Slices and reorders a PDF in a single pass.
+
+    The final page order is computed up front, so the cropped halves are
+    written straight into one output file in order, without an
+    intermediate sliced file on disk.
+
+    Args:
+        input_path (str): Path to source PDF.
+        output_path (str): Path to save processed PDF.
+        mode (int): Reorder mode (1-4), see reorder.py.
+        shared (bool): Share page content between the two halves of a
+            page instead of deep copying them.
+        progress (callable): Called as progress(done, total) after every
+            output page.
+        shards (int): Slice page ranges in this many worker processes
+            (see shard.py; pypdf engine only); 1 runs in the calling process.
+        auto_split (bool): Cut every page at its detected gutter instead
+            of the middle (see gutter.py).
+        split_cache (DiskCache): Cache of detected gutters, per file.
+        optimize (bool): Rewrite the output to take less space (see
+            optimize.py).
+        linearize (bool): Also linearize the optimized output for fast
+            web view.
+        engine (str): Name of the engine that writes the halves (see
+            engines.py).
+        memory_limit (int): Memory ceiling in bytes of the stream engine,
+            which fails rather than exceed it.
+
+    Returns:
+        dict: The report of optimize_pdf, or None without optimize.
+    """
+    if not os.path.exists(input_path):
+        raise FileNotFoundError(f"File '{input_path}' not found.")
+
+    engine = get_engine(engine)
+    splits = find_splits(input_path, cache=split_cache, workers=shards) if auto_split else None
+
+    engine.slice_and_reorder(input_path, output_path, mode, shared=shared, progress=progress, shards=shards,
+                             splits=splits, memory_limit=memory_limit)
+
+    if not (optimize or linearize):
+        return None
+    with stage('optimize'):
+        return optimize_pdf(output_path, linearize=linearize)
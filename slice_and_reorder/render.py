@@ -0,0 +1,92 @@
+import io
+import os
+import fitz
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional; only needed for WebP output
+    Image = None
+
+# Side of a square zoom tile, in pixels
+TILE_SIZE = 512
+
+IMAGE_FORMATS = ['png', 'jpeg'] + (['webp'] if Image is not None else [])
+
+MIME_TYPES = {
+    'png': 'image/png',
+    'jpeg': 'image/jpeg',
+    'webp': 'image/webp',
+}
+
+
+def get_page_sizes(file_path, doc=None):
+    """
+    Returns the displayed size of every page (rotation applied).
+
+    Args:
+        file_path (str): Path to the PDF file.
+        doc (fitz.Document): The already open file_path, e.g. from a DocPool.
+
+    Returns:
+        list: (width, height) in points for each page.
+    """
+    if doc is None:
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"File not found: {file_path}")
+        with fitz.open(file_path) as doc:
+            return get_page_sizes(file_path, doc)
+
+    return [(page.rect.width, page.rect.height) for page in doc]
+
+
+def render_page(file_path, page_number_1_based, scale=1.0, tile=None, fmt='png', doc=None):
+    """
+    Renders one page, or one zoom tile of it, to an image.
+
+    Args:
+        file_path (str): Path to the PDF file.
+        page_number_1_based (int): The page to render (1-indexed).
+        scale (float): Zoom factor; 1.0 renders at 72 dpi.
+        tile (tuple): Optional (column, row) of a TILE_SIZE x TILE_SIZE
+            tile of the page rendered at scale.
+        fmt (str): One of IMAGE_FORMATS.
+        doc (fitz.Document): The already open file_path, e.g. from a DocPool.
+
+    Returns:
+        bytes: The encoded image, or None if the page or tile does not exist.
+    """
+    if fmt not in IMAGE_FORMATS:
+        raise ValueError(f"Unsupported image format: {fmt}")
+
+    if doc is None:
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"File not found: {file_path}")
+        with fitz.open(file_path) as doc:
+            return render_page(file_path, page_number_1_based, scale, tile, fmt, doc)
+
+    # fitz uses 0-based indexing
+    page_idx = int(page_number_1_based) - 1
+    if not 0 <= page_idx < len(doc):
+        return None
+
+    page = doc[page_idx]
+    clip = None
+    if tile is not None:
+        col, row = tile
+        step = TILE_SIZE / scale
+        clip = fitz.Rect(col * step, row * step, (col + 1) * step, (row + 1) * step) & page.rect
+        if clip.is_empty:
+            return None
+
+    pix = page.get_pixmap(matrix=fitz.Matrix(scale, scale), clip=clip, alpha=False)
+
+    if fmt == 'webp':
+        image = Image.frombytes('RGB', (pix.width, pix.height), pix.samples)
+        out = io.BytesIO()
+        image.save(out, format='WEBP', quality=80)
+        return out.getvalue()
+
+    if fmt == 'jpeg':
+        return pix.tobytes('jpeg', jpg_quality=80)
+
+    return pix.tobytes('png')
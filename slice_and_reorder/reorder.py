@@ -2,70 +2,96 @@ import sys
 import os
 from pypdf import PdfReader, PdfWriter
 
-def reorder_pdf(input_path, output_path, mode):
-    if not os.path.exists(input_path):
-        raise FileNotFoundError(f"File '{input_path}' not found.")
+from slice_and_reorder.utils import write_pdf
 
-    reader = PdfReader(input_path)
-    num_pages = len(reader.pages)
-    
+# Map action string (as sent by the slice form) to reorder mode
+REORDER_MODES = {
+    'booklet_rtl': 1,
+    'booklet_ltr': 2,
+    'spreads_rtl': 3,
+    'spreads_ltr': 4
+}
+
+
+def get_page_order(num_pages, mode):
+    """
+    Computes the output order of a sliced document.
+
+    Args:
+        num_pages (int): Number of sliced pages ([Visual Left, Visual Right] pairs).
+        mode (int): Reorder mode (1-4).
+
+    Returns:
+        list: Input page index for every output position.
+    """
     # Validation: Must be even number of pages
     if num_pages % 2 != 0:
         raise ValueError("Input file must have an even number of pages.")
 
-    writer = PdfWriter()
-    
     # Prepare list for new page order
     new_order = [None] * num_pages
-    
+
     # Mode Logic
     if mode == 1: # Booklet RTL
         num_spreads = num_pages // 2
         for s in range(num_spreads):
             in_left = 2 * s
             in_right = 2 * s + 1
-            
+
             out_low = s
             out_high = num_pages - 1 - s
-            
+
             if s % 2 == 0:
-                new_order[out_low] = reader.pages[in_left]
-                new_order[out_high] = reader.pages[in_right]
+                new_order[out_low] = in_left
+                new_order[out_high] = in_right
             else:
-                new_order[out_low] = reader.pages[in_right]
-                new_order[out_high] = reader.pages[in_left]
+                new_order[out_low] = in_right
+                new_order[out_high] = in_left
 
     elif mode == 2: # Booklet LTR
         num_spreads = num_pages // 2
         for s in range(num_spreads):
             in_left = 2 * s
             in_right = 2 * s + 1
-            
+
             out_low = s
             out_high = num_pages - 1 - s
-            
+
             if s % 2 == 0:
-                new_order[out_low] = reader.pages[in_right]
-                new_order[out_high] = reader.pages[in_left]
+                new_order[out_low] = in_right
+                new_order[out_high] = in_left
             else:
-                new_order[out_low] = reader.pages[in_left]
-                new_order[out_high] = reader.pages[in_right]
+                new_order[out_low] = in_left
+                new_order[out_high] = in_right
 
     elif mode == 3: # Spreads RTL
         for i in range(0, num_pages, 2):
-            new_order[i] = reader.pages[i+1]
-            new_order[i+1] = reader.pages[i]
+            new_order[i] = i + 1
+            new_order[i+1] = i
 
     elif mode == 4: # Spreads LTR
         for i in range(num_pages):
-            new_order[i] = reader.pages[i]
-            
+            new_order[i] = i
+
     else:
         raise ValueError("Invalid mode selected. Options 1-4.")
 
+    return new_order
+
+
+def reorder_pdf(input_path, output_path, mode):
+    if not os.path.exists(input_path):
+        raise FileNotFoundError(f"File '{input_path}' not found.")
+
+    reader = PdfReader(input_path)
+    num_pages = len(reader.pages)
+
+    new_order = get_page_order(num_pages, mode)
+
+    writer = PdfWriter()
+
     # Add pages to writer
-    for p in new_order:
-        writer.add_page(p)
+    for i in new_order:
+        writer.add_page(reader.pages[i])
 
-    with open(output_path, "wb") as f_out:
-        writer.write(f_out)
+    write_pdf(writer, output_path)
@@ -0,0 +1,115 @@
+import os
+import tempfile
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import NameObject
+
+from slice_and_reorder.slice import write_halves
+from slice_and_reorder.reorder import get_page_order
+from slice_and_reorder.utils import write_pdf
+
+# Below this many source pages per shard, process start-up and the extra
+# merge pass cost more than the parallel slicing saves
+MIN_SHARD_PAGES = 200
+
+
+def get_shard_ranges(num_pages, shards):
+    """Splits range(num_pages) into `shards` contiguous (start, stop) ranges."""
+    size, extra = divmod(num_pages, shards)
+    ranges = []
+    start = 0
+    for i in range(shards):
+        stop = start + size + (1 if i < extra else 0)
+        ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
+def slice_range(input_path, output_path, start, stop, splits=None):
+    """
+    Slices source pages [start, stop) into output_path as
+    [Visual Left, Visual Right] pairs. Runs in a worker process.
+    """
+    reader = PdfReader(input_path)
+    write_halves(reader, range(2 * start, 2 * stop), output_path, splits=splits)
+    return 2 * (stop - start)
+
+
+def sharded_slice_and_reorder_pdf(input_path, output_path, mode, shards=None, progress=None, splits=None):
+    """
+    Slices and reorders a PDF with page ranges sliced in parallel.
+
+    Each range of source pages is sliced in its own worker process; the
+    partial outputs are then merged in the order computed for mode.
+
+    Args:
+        input_path (str): Path to source PDF.
+        output_path (str): Path to save processed PDF.
+        mode (int): Reorder mode (1-4), see reorder.py.
+        shards (int): Number of page ranges (default: CPU count).
+        progress (callable): Called as progress(done, total); slicing and
+            merging each count once per output page.
+        splits (list): Split position of every page, see get_half_boxes.
+
+    Returns:
+        int: Number of shards actually used.
+    """
+    if not os.path.exists(input_path):
+        raise FileNotFoundError(f"File '{input_path}' not found.")
+
+    reader = PdfReader(input_path)
+    num_pages = len(reader.pages)
+    order = get_page_order(2 * num_pages, mode)
+
+    shards = shards or os.cpu_count() or 1
+    shards = max(1, min(shards, num_pages // MIN_SHARD_PAGES))
+    if shards == 1:
+        write_halves(reader, order, output_path, progress=progress, splits=splits)
+        return 1
+
+    ranges = get_shard_ranges(num_pages, shards)
+    starts = [start for start, _ in ranges]
+    total = 2 * len(order)
+    done = 0
+
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(output_path))) as tmp:
+        part_paths = [os.path.join(tmp, f"part_{i}.pdf") for i in range(shards)]
+
+        with ProcessPoolExecutor(max_workers=shards) as pool:
+            futures = [
+                pool.submit(slice_range, input_path, part_path, start, stop, splits)
+                for part_path, (start, stop) in zip(part_paths, ranges)
+            ]
+            for future in futures:
+                done += future.result()
+                if progress:
+                    progress(done, total)
+
+        parts = [PdfReader(path) for path in part_paths]
+        writer = PdfWriter()
+
+        # /Contents of pages with only one half merged so far
+        pending_contents = {}
+
+        for half_index in order:
+            page_index = half_index // 2
+            shard = bisect_right(starts, page_index) - 1
+            half = parts[shard].pages[half_index - 2 * starts[shard]]
+
+            # Keep both halves pointing to one content stream, as in the parts
+            if pending_contents.get(page_index) is not None:
+                merged = writer.add_page(half, excluded_keys=['/Contents'])
+                merged[NameObject('/Contents')] = pending_contents.pop(page_index)
+            else:
+                merged = writer.add_page(half)
+                pending_contents[page_index] = merged.raw_get('/Contents') if '/Contents' in merged else None
+
+            done += 1
+            if progress:
+                progress(done, total)
+
+        write_pdf(writer, output_path)
+
+    return shards
@@ -2,88 +2,154 @@ import sys
 import os
 import copy
 from pypdf import PdfReader, PdfWriter
+from pypdf.generic import NameObject, RectangleObject
 
-def slice_pdf(input_path, output_path):
+from metrics import stage
+from slice_and_reorder.utils import write_pdf
+
+
+def get_half_boxes(page, split=0.5):
+    """
+    Calculates the crop boxes of the two visual halves of a page.
+
+    Args:
+        page (PageObject): Source page.
+        split (float): Where to cut, as a fraction of the displayed width
+            from the visual left edge (see gutter.py).
+
+    Returns:
+        tuple: (left_box, right_box), each as (x0, y0, x1, y1).
+    """
+    # Determine Rotation
+    rot = page.rotation if page.rotation is not None else 0
+    return split_media_box(rot, page.mediabox.width, page.mediabox.height, split)
+
+
+def split_media_box(rotation, w, h, split=0.5):
+    """
+    Crop boxes of the two visual halves of a media box of w x h points
+    shown with /Rotate rotation; see get_half_boxes.
+    """
+    rot = int(rotation) % 360
+
+    # Logic for Visual Left vs Visual Right based on rotation
+    if rot == 90:
+        # Visual Left is Bottom (y=0..cut), Visual Right is Top (y=cut..h)
+        cut = h * split
+        return (0, 0, w, cut), (0, cut, w, h)
+
+    elif rot == 180:
+        # Visual Left is Physical Right (x=cut..w), Visual Right is Physical Left (0..cut)
+        cut = w * (1 - split)
+        return (cut, 0, w, h), (0, 0, cut, h)
+
+    elif rot == 270:
+        # Visual Left is Top (y=cut..h), Visual Right is Bottom (y=0..cut)
+        cut = h * (1 - split)
+        return (0, cut, w, h), (0, 0, w, cut)
+
+    # rot == 0 (and default): Visual Left x=0..cut, Visual Right x=cut..w
+    cut = w * split
+    return (0, 0, cut, h), (cut, 0, w, h)
+
+
+def make_half(page, box):
+    """Returns a deep copy of the page cropped to box."""
+    half = copy.deepcopy(page)
+    half.cropbox.lower_left = (box[0], box[1])
+    half.cropbox.upper_right = (box[2], box[3])
+    return half
+
+
+def add_shared_half(writer, page, box, contents=None):
+    """
+    Adds a half of the page to writer without copying its content.
+
+    Both halves of a page point to the same content stream and resources
+    (fonts, scan images) and differ only in their crop box.
+
+    Args:
+        writer (PdfWriter): Output document.
+        page (PageObject): Source page.
+        box (tuple): Crop box as (x0, y0, x1, y1).
+        contents: /Contents of the other half, if it was already added.
+
+    Returns:
+        PageObject: The page added to writer.
+    """
+    if contents is None:
+        half = writer.add_page(page)
+    else:
+        # pypdf duplicates content streams on every clone, so reuse the
+        # ones written for the other half instead
+        half = writer.add_page(page, excluded_keys=['/Contents'])
+        half[NameObject('/Contents')] = contents
+
+    half.cropbox = RectangleObject(box)
+    return half
+
+
+def write_halves(reader, order, output_path, shared=True, progress=None, splits=None):
+    """
+    Writes sliced halves of the reader's pages straight to output_path.
+
+    Args:
+        reader (PdfReader): Source document.
+        order (list): Half index for every output position
+            (2 * page for Visual Left, 2 * page + 1 for Visual Right).
+        output_path (str): Path to save processed PDF.
+        shared (bool): Share page content between the two halves instead
+            of deep copying each half.
+        progress (callable): Called as progress(done, total) after every
+            output page.
+        splits (list): Split position of every source page (see
+            get_half_boxes); None cuts every page in the middle.
+    """
+    writer = PdfWriter()
+    total = len(order)
+
+    # /Contents of pages with only one half written so far
+    pending_contents = {}
+
+    with stage('crop'):
+        for done, half_index in enumerate(order, 1):
+            page_index = half_index // 2
+            p_orig = reader.pages[page_index]
+            split = splits[page_index] if splits is not None else 0.5
+            box = get_half_boxes(p_orig, split)[half_index % 2]
+
+            if not shared:
+                writer.add_page(make_half(p_orig, box))
+            elif page_index in pending_contents:
+                add_shared_half(writer, p_orig, box, pending_contents.pop(page_index))
+            else:
+                half = add_shared_half(writer, p_orig, box)
+                pending_contents[page_index] = half.raw_get('/Contents') if '/Contents' in half else None
+
+            if progress:
+                progress(done, total)
+
+    with stage('write'):
+        write_pdf(writer, output_path)
+
+
+def slice_pdf(input_path, output_path, shared=True):
     """
     Slices a PDF file by splitting each page into two.
     Always outputs [Visual Left, Visual Right] sequence.
-    
+
     Args:
         input_path (str): Path to source PDF.
         output_path (str): Path to save processed PDF.
+        shared (bool): Share page content between the two halves.
     """
     if not os.path.exists(input_path):
         raise FileNotFoundError(f"File '{input_path}' not found.")
 
     reader = PdfReader(input_path)
-    writer = PdfWriter()
-    
-    num_pages = len(reader.pages)
-
-    for i in range(num_pages):
-        p_orig = reader.pages[i]
-        
-        # Determine Rotation
-        rot = p_orig.rotation if p_orig.rotation is not None else 0
-        rot = int(rot) % 360
-        
-        w = p_orig.mediabox.width
-        h = p_orig.mediabox.height
-        
-        # Prepare two copies
-        p_left = copy.deepcopy(p_orig) # Visual Left
-        p_right = copy.deepcopy(p_orig) # Visual Right
-        
-        # Logic for Visual Left vs Visual Right based on rotation
-        if rot == 0:
-            # Visual Left: x=0..w/2
-            p_left.cropbox.lower_left = (0, 0)
-            p_left.cropbox.upper_right = (w/2, h)
-            
-            # Visual Right: x=w/2..w
-            p_right.cropbox.lower_left = (w/2, 0)
-            p_right.cropbox.upper_right = (w, h)
-            
-        elif rot == 90:
-            # Visual Left is Bottom (y=0..h/2)
-            p_left.cropbox.lower_left = (0, 0)
-            p_left.cropbox.upper_right = (w, h/2)
-            
-            # Visual Right is Top (y=h/2..h)
-            p_right.cropbox.lower_left = (0, h/2)
-            p_right.cropbox.upper_right = (w, h)
-            
-        elif rot == 180:
-            # Visual Left is Physical Right (x=w/2..w)
-            p_left.cropbox.lower_left = (w/2, 0)
-            p_left.cropbox.upper_right = (w, h)
-            
-            # Visual Right is Physical Left (0..w/2)
-            p_right.cropbox.lower_left = (0, 0)
-            p_right.cropbox.upper_right = (w/2, h)
-            
-        elif rot == 270:
-            # Visual Left is Top (y=h/2..h)
-            p_left.cropbox.lower_left = (0, h/2)
-            p_left.cropbox.upper_right = (w, h)
-            
-            # Visual Right is Bottom (y=0..h/2)
-            p_right.cropbox.lower_left = (0, 0)
-            p_right.cropbox.upper_right = (w, h/2)
-            
-        else:
-            # Default to 0
-            p_left.cropbox.lower_left = (0, 0)
-            p_left.cropbox.upper_right = (w/2, h)
-            p_right.cropbox.lower_left = (w/2, 0)
-            p_right.cropbox.upper_right = (w, h)
-
-        # Output Order: Always Left then Right
-        # Reordering is handled by reorder.py
-        writer.add_page(p_left)
-        writer.add_page(p_right)
-
-    with open(output_path, "wb") as f_out:
-        writer.write(f_out)
-        
+
+    # Output Order: Always Left then Right
+    # Reordering is handled by reorder.py
+    write_halves(reader, range(2 * len(reader.pages)), output_path, shared=shared)
+
     print(f"Success. Sliced PDF saved as: {output_path}")
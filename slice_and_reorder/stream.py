@@ -0,0 +1,261 @@
+import os
+import re
+from array import array
+
+import fitz
+from fitz import mupdf
+
+from metrics import stage, count
+from slice_and_reorder.reorder import get_page_order
+from slice_and_reorder.slice import split_media_box
+
+# Output pages written between flushes of the output file and of MuPDF's
+# cache of parsed source objects
+WINDOW_PAGES = 256
+
+# Default memory ceiling of the process, in bytes
+MEMORY_LIMIT = 1024 ** 3
+
+# An indirect reference in a serialized object. Text in a string may look
+# like one too; at worst that copies an object nothing uses.
+REFERENCE = re.compile(rb'(\d+) (\d+) R')
+
+# Page attributes a page may inherit from the page tree
+INHERITABLE_KEYS = (mupdf.PDF_ENUM_NAME_Resources, mupdf.PDF_ENUM_NAME_MediaBox, mupdf.PDF_ENUM_NAME_CropBox,
+                    mupdf.PDF_ENUM_NAME_Rotate)
+
+
+def stream_slice_and_reorder_pdf(input_path, output_path, mode, progress=None, splits=None, window=WINDOW_PAGES,
+                                 memory_limit=MEMORY_LIMIT):
+    """
+    Slices and reorders a PDF with memory that does not grow with its size.
+
+    The halves are written to the output one at a time, each followed by
+    the objects it needs that were not written yet (content, fonts, scan
+    images, copied as they are). After every window of pages the output is
+    flushed and the parsed source objects are dropped, so only a window of
+    pages, the largest single object and one number per object are held.
+
+    Args:
+        input_path (str): Path to source PDF.
+        output_path (str): Path to save processed PDF.
+        mode (int): Reorder mode (1-4), see reorder.py.
+        progress (callable): Called as progress(done, total).
+        splits (list): Split position of every page, see get_half_boxes.
+        window (int): Output pages per window.
+        memory_limit (int): Ceiling for the RSS of the process, in bytes.
+            Above it the window is halved; at one page per window a
+            MemoryError is raised instead of growing further.
+    """
+    with stage('parse'):
+        doc = fitz.open(input_path)
+    with doc:
+        pdf = mupdf.pdf_document_from_fz_document(doc.this)
+        num_pages = mupdf.pdf_count_pages(pdf)
+        count(pages=num_pages)
+        order = get_page_order(2 * num_pages, mode)
+
+        def get_box(half_index, page):
+            media_box = mupdf.pdf_dict_get_inheritable_rect(page, mupdf.PDF_ENUM_NAME_MediaBox)
+            rotation = mupdf.pdf_dict_get_inheritable_int(page, mupdf.PDF_ENUM_NAME_Rotate)
+            split = splits[half_index // 2] if splits is not None else 0.5
+            boxes = split_media_box(rotation, media_box.x1 - media_box.x0, media_box.y1 - media_box.y0, split)
+            return boxes[half_index % 2]
+
+        with stage('write'):
+            _stream_pages(pdf, output_path, [(half_index // 2, half_index) for half_index in order], get_box,
+                          progress, window, memory_limit)
+
+
+def stream_reorder_pdf(input_path, output_path, mode, window=WINDOW_PAGES, memory_limit=MEMORY_LIMIT):
+    """Reorders the pages of an already sliced PDF, see stream_slice_and_reorder_pdf."""
+    with fitz.open(input_path) as doc:
+        pdf = mupdf.pdf_document_from_fz_document(doc.this)
+        order = get_page_order(mupdf.pdf_count_pages(pdf), mode)
+        _stream_pages(pdf, output_path, [(page_index, None) for page_index in order], None, None, window,
+                      memory_limit)
+
+
+def get_rss():
+    """Current RSS of this process in bytes, or None where it can't be read."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return None
+
+
+def _stream_pages(pdf, output_path, pages, get_box, progress, window, memory_limit):
+    """
+    Writes pages, a list of (source page index, key), to output_path; each
+    page gets the crop box get_box(key, page) if get_box is given.
+    """
+    if mupdf.pdf_is_dict(mupdf.pdf_dict_get(mupdf.pdf_trailer(pdf), mupdf.PDF_ENUM_NAME_Encrypt)):
+        raise ValueError("Encrypted PDFs can't be streamed.")
+
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            writer = StreamWriter(pdf, f)
+            total = len(pages)
+            in_window = 0
+            for done, (page_index, key) in enumerate(pages, 1):
+                page = mupdf.pdf_lookup_page_obj(pdf, page_index)
+                half = mupdf.pdf_copy_dict(page)
+                for name in INHERITABLE_KEYS:
+                    value = mupdf.pdf_dict_get_inheritable(page, name)
+                    if value.m_internal:
+                        mupdf.pdf_dict_put(half, name, value)
+                if get_box is not None:
+                    box = mupdf.FzRect(*get_box(key, page))
+                    mupdf.pdf_dict_put(half, mupdf.PDF_ENUM_NAME_CropBox, mupdf.pdf_new_rect(pdf, box))
+                writer.add_page(half)
+
+                if progress:
+                    progress(done, total)
+
+                in_window += 1
+                if in_window >= window:
+                    in_window = 0
+                    window = _end_window(pdf, f, window, memory_limit)
+
+            writer.close()
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _end_window(pdf, f, window, memory_limit):
+    """Flushes the output and drops cached source objects; returns the next window size."""
+    f.flush()
+    mupdf.pdf_clear_xref(pdf)
+    fitz.TOOLS.store_shrink(100)
+
+    rss = get_rss()
+    if memory_limit is None or rss is None or rss <= memory_limit:
+        return window
+    if window == 1:
+        raise MemoryError(f"Streaming needs {rss // 2**20} MB, above the ceiling of {memory_limit // 2**20} MB.")
+    return max(1, window // 2)
+
+
+class StreamWriter:
+    """
+    Writes a PDF to a file object one page at a time.
+
+    Objects copied from the source keep their numbers, so their references
+    stay valid as they are; new objects (the pages, the page tree and the
+    catalog) are numbered after them. Source pages and page tree nodes are
+    never copied: references to them (e.g. from links) become null.
+
+    Usage:
+        writer = StreamWriter(pdf, f)
+        writer.add_page(page)  # a page dictionary of pdf
+        ...
+        writer.close()
+    """
+
+    def __init__(self, pdf, f):
+        self.pdf = pdf
+        self.f = f
+        self.source_length = self.next_number = mupdf.pdf_xref_len(pdf)
+        self.offsets = array('q', [-1]) * self.next_number  # -1: not written, -2: skipped
+        self.generations = {}  # number -> generation, where not 0
+        self.kids = array('q')
+        self.pages_number = self._reserve()
+        f.write(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+
+    def add_page(self, page):
+        """Writes a page dictionary and the objects it refers to."""
+        number = self._reserve()
+        mupdf.pdf_dict_put(page, mupdf.PDF_ENUM_NAME_Parent, mupdf.pdf_new_indirect(self.pdf, self.pages_number, 0))
+        source = _serialize(page)
+        self._write_raw(number, 0, source)
+        self.kids.append(number)
+        self._copy_references(source)
+
+    def close(self):
+        """Writes the page tree, catalog, cross-reference table and trailer."""
+        kids = ' '.join(f"{number} 0 R" for number in self.kids)
+        self._write_raw(self.pages_number, 0, f"<</Type/Pages/Count {len(self.kids)}/Kids[{kids}]>>".encode())
+        catalog_number = self._reserve()
+        self._write_raw(catalog_number, 0, f"<</Type/Catalog/Pages {self.pages_number} 0 R>>".encode())
+
+        xref_offset = self.f.tell()
+        lines = [f"xref\n0 {self.next_number}\n", "0000000000 65535 f \n"]
+        for number in range(1, self.next_number):
+            offset = self.offsets[number]
+            if offset >= 0:
+                lines.append(f"{offset:010d} {self.generations.get(number, 0):05d} n \n")
+            else:
+                lines.append("0000000000 00000 f \n")
+        self.f.write(''.join(lines).encode())
+        self.f.write(f"trailer\n<</Size {self.next_number}/Root {catalog_number} 0 R>>\n"
+                     f"startxref\n{xref_offset}\n%%EOF\n".encode())
+
+    def _reserve(self):
+        number = self.next_number
+        self.next_number += 1
+        self.offsets.append(-1)
+        return number
+
+    def _copy_references(self, source):
+        """Writes every object source refers to, directly or not, that was not written yet."""
+        pending = [source]
+        while pending:
+            for match in REFERENCE.finditer(pending.pop()):
+                number = int(match[1])
+                # Objects numbered from source_length on are this writer's own
+                if not 0 < number < self.source_length or self.offsets[number] != -1:
+                    continue
+                obj = mupdf.pdf_load_object(self.pdf, number)
+                if mupdf.pdf_is_null(obj) or _is_page_tree_node(obj):
+                    self.offsets[number] = -2
+                    continue
+                generation = int(match[2])
+                if mupdf.pdf_obj_num_is_stream(self.pdf, number):
+                    pending.append(self._write_stream(number, generation, obj))
+                else:
+                    source = _serialize(obj)
+                    self._write_raw(number, generation, source)
+                    pending.append(source)
+
+    def _write_stream(self, number, generation, obj):
+        """Copies a stream as it is (still compressed); returns its serialized dictionary."""
+        data = mupdf.fz_buffer_extract_copy(mupdf.pdf_load_raw_stream_number(self.pdf, number))
+        # /Length may be another object; write it directly
+        dictionary = mupdf.pdf_copy_dict(obj)
+        mupdf.pdf_dict_put_int(dictionary, mupdf.PDF_ENUM_NAME_Length, len(data))
+        source = _serialize(dictionary)
+        self._write_raw(number, generation, source, data)
+        return source
+
+    def _write_raw(self, number, generation, source, data=None):
+        self.offsets[number] = self.f.tell()
+        if generation:
+            self.generations[number] = generation
+        self.f.write(f"{number} {generation} obj\n".encode())
+        self.f.write(source)
+        if data is not None:
+            self.f.write(b"\nstream\n")
+            self.f.write(data)
+            self.f.write(b"\nendstream")
+        self.f.write(b"\nendobj\n")
+
+
+def _is_page_tree_node(obj):
+    if not mupdf.pdf_is_dict(obj):
+        return False
+    kind = mupdf.pdf_dict_get(obj, mupdf.PDF_ENUM_NAME_Type)
+    return (mupdf.pdf_name_eq(kind, mupdf.PDF_ENUM_NAME_Page)
+            or mupdf.pdf_name_eq(kind, mupdf.PDF_ENUM_NAME_Pages))
+
+
+def _serialize(obj):
+    buffer = mupdf.fz_new_buffer(512)
+    output = mupdf.FzOutput(buffer)
+    mupdf.pdf_print_obj(output, obj, 1, 0)
+    output.fz_close_output()
+    return mupdf.fz_buffer_extract_copy(buffer)
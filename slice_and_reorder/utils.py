@@ -1,6 +1,146 @@
 import os
 import fitz
 
+from metrics import stage
+
+# Once a file carries this many incremental updates, the next edit rewrites
+# it in full and drops the objects the earlier updates left behind
+COMPACT_AFTER_INCREMENTS = 20
+
+PAGE_EDIT_OPS = ('delete', 'rotate', 'move')
+
+
+def write_pdf(writer, output_path):
+    """
+    Writes a PdfWriter to output_path through a temporary file.
+
+    The finished file replaces output_path in one step, so readers never see
+    a half-written PDF and an existing file that is hardlinked elsewhere is
+    replaced rather than overwritten in place.
+    """
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f_out:
+            writer.write(f_out)
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def apply_page_edits(file_path, ops, doc=None, compact=False):
+    """
+    Applies a batch of page edits to a PDF file with one open and one save.
+
+    Operations run in order and page numbers refer to the document as left
+    by the previous operation, as if the edits were made one click at a time:
+        {'op': 'delete', 'page': n}
+        {'op': 'rotate', 'page': n, 'angle': 90}  (any multiple of 90)
+        {'op': 'move', 'page': n, 'to': m}        (page n ends up as page m)
+
+    The changes are appended as one incremental update; once the file has
+    COMPACT_AFTER_INCREMENTS updates it is rewritten with garbage collection.
+    An open document that is passed in is always saved in full instead,
+    through a temporary file, so it stays usable for the next edit (MuPDF
+    can't save one open document incrementally twice).
+
+    Args:
+        file_path (str): Path to the PDF file.
+        ops (list): Operations as above (1-indexed pages).
+        doc (fitz.Document): The already open file_path, e.g. from a
+            DocPool. The file is replaced by a full save of it. It must be
+            discarded if this raises, as it may hold some of the changes.
+        compact (bool): Rewrite the file even if it has fewer updates,
+            e.g. after removing many pages.
+
+    Returns:
+        dict: {'page_count': pages left, 'compacted': True if rewritten}
+
+    Raises:
+        ValueError: If an operation is invalid; the file is left unchanged.
+    """
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"File not found: {file_path}")
+
+    if not ops:
+        raise ValueError("No operations given.")
+
+    if doc is None:
+        with stage('parse'):
+            doc = fitz.open(file_path)
+        with doc:
+            return _edit_document(doc, file_path, ops, compact, incremental=True)
+    return _edit_document(doc, file_path, ops, compact, incremental=False)
+
+
+def _edit_document(doc, file_path, ops, compact=False, incremental=True):
+    with stage('edit'):
+        _apply_ops(doc, ops)
+
+    page_count = len(doc)
+    compact = compact or doc.version_count >= COMPACT_AFTER_INCREMENTS or not doc.can_save_incrementally()
+
+    with stage('write'):
+        if compact or not incremental:
+            # Dropping unused objects is cheap; merging duplicates is not
+            tmp_path = f"{file_path}.{os.getpid()}.tmp"
+            try:
+                doc.save(tmp_path, garbage=3 if compact else 1, deflate=True)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            os.replace(tmp_path, file_path)
+        else:
+            doc.saveIncr()
+
+    return {'page_count': page_count, 'compacted': compact}
+
+
+def _apply_ops(doc, ops):
+    for i, op in enumerate(ops):
+        kind = op.get('op')
+        if kind not in PAGE_EDIT_OPS:
+            raise ValueError(f"Operation {i + 1}: unknown operation {kind!r}.")
+
+        # fitz uses 0-based indexing
+        page_idx = _get_page_index(doc, op.get('page'), i)
+
+        if kind == 'delete':
+            if len(doc) == 1:
+                raise ValueError(f"Operation {i + 1}: cannot delete the last page.")
+            doc.delete_page(page_idx)
+
+        elif kind == 'rotate':
+            try:
+                angle = int(op.get('angle', 90))
+            except (TypeError, ValueError):
+                angle = None
+            if angle is None or angle % 90 != 0:
+                raise ValueError(f"Operation {i + 1}: angle must be a multiple of 90.")
+            page = doc[page_idx]
+            page.set_rotation((page.rotation + angle) % 360)
+
+        elif kind == 'move':
+            to_idx = _get_page_index(doc, op.get('to'), i)
+            if to_idx > page_idx:
+                # move_page inserts before its target, -1 meaning the end
+                doc.move_page(page_idx, to_idx + 1 if to_idx + 1 < len(doc) else -1)
+            elif to_idx < page_idx:
+                doc.move_page(page_idx, to_idx)
+
+
+def _get_page_index(doc, page_number_1_based, op_index):
+    try:
+        page_idx = int(page_number_1_based) - 1
+    except (TypeError, ValueError):
+        raise ValueError(f"Operation {op_index + 1}: invalid page number.")
+    if not 0 <= page_idx < len(doc):
+        raise ValueError(f"Operation {op_index + 1}: page {page_number_1_based} does not exist.")
+    return page_idx
+
+
 def delete_page_from_pdf(file_path, page_number_1_based):
     """
     Deletes a page from a PDF file.
@@ -12,22 +152,8 @@ def delete_page_from_pdf(file_path, page_number_1_based):
     Returns:
         bool: True if successful, False if page number was invalid.
     """
-    if not os.path.exists(file_path):
-        raise FileNotFoundError(f"File not found: {file_path}")
-        
     try:
-        doc = fitz.open(file_path)
-        # fitz uses 0-based indexing
-        page_idx = int(page_number_1_based) - 1
-        
-        if 0 <= page_idx < len(doc):
-            doc.delete_page(page_idx)
-            doc.saveIncr() # Incremental save to apply changes
-            doc.close()
-            return True
-        else:
-            doc.close()
-            return False
-            
-    except Exception as e:
-        raise e
+        apply_page_edits(file_path, [{'op': 'delete', 'page': page_number_1_based}])
+        return True
+    except ValueError:
+        return False
@@ -7,6 +7,8 @@ document.addEventListener('DOMContentLoaded', function () {
     const pdfUrl = container.dataset.pdfUrl;
     const filename = container.dataset.filename;
     const folderType = container.dataset.folderType;
+    // Set when pages should be shown as server-rendered images instead of pdf.js
+    const renderUrl = container.dataset.renderUrl;
 
     if (pdfUrl) {
         // --- PDF Viewer Logic ---
@@ -26,12 +28,66 @@ document.addEventListener('DOMContentLoaded', function () {
         const confirmDeleteNo = document.getElementById('confirmDeleteNo');
         const saveBtn = document.getElementById('saveBtn');
 
+        const cleanupBtn = document.getElementById('cleanupBtn');
+        const cleanupPopup = document.getElementById('cleanupPopup');
+        const cleanupSummary = document.getElementById('cleanupSummary');
+        const confirmCleanupYes = document.getElementById('confirmCleanupYes');
+        const confirmCleanupNo = document.getElementById('confirmCleanupNo');
+
         let pdfDoc = null;
         let pageNum = 1;
         let pageRendering = false;
         let pageNumPending = null;
         let scale = 1.0;
 
+        // Image mode state: page count and file version from /info
+        let numPages = 0;
+        let version = '';
+        let prefetched = null;
+
+        function pageCount() {
+            return renderUrl ? numPages : pdfDoc.numPages;
+        }
+
+        /**
+         * URL of the server-rendered image of a page at the current zoom.
+         * Rendered at device resolution so it stays sharp on HiDPI screens.
+         */
+        function imageUrl(num) {
+            const renderScale = (scale * (window.devicePixelRatio || 1)).toFixed(2);
+            return `${renderUrl}/${num}?scale=${renderScale}&v=${version}`;
+        }
+
+        /**
+         * Image mode: draw the server-rendered page into the canvas and
+         * prefetch the next page so flipping forward is instant.
+         */
+        function renderPageImage(num) {
+            const img = new Image();
+            img.onload = function () {
+                const ratio = window.devicePixelRatio || 1;
+                canvas.width = img.naturalWidth;
+                canvas.height = img.naturalHeight;
+                canvas.style.width = (img.naturalWidth / ratio) + 'px';
+                canvas.style.height = (img.naturalHeight / ratio) + 'px';
+                ctx.drawImage(img, 0, 0);
+
+                pageRendering = false;
+                if (pageNumPending !== null) {
+                    renderPage(pageNumPending);
+                    pageNumPending = null;
+                } else if (num < numPages) {
+                    prefetched = new Image();
+                    prefetched.src = imageUrl(num + 1);
+                }
+            };
+            img.onerror = function () {
+                pageRendering = false;
+                console.error('Error loading page image:', num);
+            };
+            img.src = imageUrl(num);
+        }
+
         /**
          * Get page info from document, resize canvas accordingly, and render page.
          * @param num Page number.
@@ -39,7 +95,28 @@ document.addEventListener('DOMContentLoaded', function () {
         function renderPage(num) {
             pageRendering = true;
 
-            // Fetch page
+            if (renderUrl) {
+                renderPageImage(num);
+            } else {
+                renderPageCanvas(num);
+            }
+
+            // Update page counters
+            if (pageNumSpan) pageNumSpan.textContent = num;
+
+            // Update button states
+            if (prevBtn) prevBtn.disabled = num <= 1;
+            if (nextBtn) nextBtn.disabled = num >= pageCount();
+
+            // Hide popups when changing pages
+            if (deleteConfirmPopup) deleteConfirmPopup.classList.add('d-none');
+            if (cleanupPopup) cleanupPopup.classList.add('d-none');
+        }
+
+        /**
+         * pdf.js mode: render the page from the downloaded document.
+         */
+        function renderPageCanvas(num) {
             pdfDoc.getPage(num).then(function (page) {
                 const viewport = page.getViewport({ scale: scale });
                 canvas.height = viewport.height;
@@ -61,16 +138,6 @@ document.addEventListener('DOMContentLoaded', function () {
                     }
                 });
             });
-
-            // Update page counters
-            if (pageNumSpan) pageNumSpan.textContent = num;
-
-            // Update button states
-            if (prevBtn) prevBtn.disabled = num <= 1;
-            if (nextBtn) nextBtn.disabled = num >= pdfDoc.numPages;
-
-            // Hide popup when changing pages
-            if (deleteConfirmPopup) deleteConfirmPopup.classList.add('d-none');
         }
 
         /**
@@ -86,9 +153,14 @@ document.addEventListener('DOMContentLoaded', function () {
         }
 
         /**
-         * Asynchronously downloads PDF.
+         * Asynchronously downloads PDF, or only its page count in image mode.
          */
         function loadPDF(url) {
+            if (renderUrl) {
+                loadPageInfo();
+                return;
+            }
+
             pdfjsLib.getDocument(url).promise.then(function (pdfDoc_) {
                 pdfDoc = pdfDoc_;
                 if (pageCountSpan) pageCountSpan.textContent = pdfDoc.numPages;
@@ -106,6 +178,27 @@ document.addEventListener('DOMContentLoaded', function () {
             });
         }
 
+        /**
+         * Image mode: fetch the page count; the version changes whenever
+         * the file does, so edited pages are never served from a stale cache.
+         */
+        function loadPageInfo() {
+            fetch(`${renderUrl}/info`).then(response => response.json()).then(function (info) {
+                numPages = info.page_count;
+                version = info.version;
+                if (pageCountSpan) pageCountSpan.textContent = numPages;
+
+                if (pageNum > numPages) {
+                    pageNum = numPages;
+                }
+                if (pageNum < 1) pageNum = 1;
+
+                renderPage(pageNum);
+            }).catch(err => {
+                console.error('Error loading page info:', err);
+            });
+        }
+
         // Initial Load
         loadPDF(pdfUrl);
 
@@ -120,7 +213,7 @@ document.addEventListener('DOMContentLoaded', function () {
 
         if (nextBtn) {
             nextBtn.addEventListener('click', () => {
-                if (pageNum >= pdfDoc.numPages) return;
+                if (pageNum >= pageCount()) return;
                 pageNum++;
                 queueRenderPage(pageNum);
             });
@@ -143,6 +236,94 @@ document.addEventListener('DOMContentLoaded', function () {
             });
         }
 
+        /**
+         * Reload the document after an edit; the timestamp prevents caching.
+         */
+        function reloadPDF() {
+            const timestamp = new Date().getTime();
+            const separator = pdfUrl.includes('?') ? '&' : '?';
+            loadPDF(`${pdfUrl}${separator}t=${timestamp}`);
+        }
+
+        // Cleanup Logic: find blank and duplicate pages, review, remove at once
+        if (cleanupBtn && cleanupPopup) {
+            let cleanupPages = [];
+
+            cleanupBtn.addEventListener('click', async (e) => {
+                e.stopPropagation();
+                if (!cleanupPopup.classList.contains('d-none')) {
+                    cleanupPopup.classList.add('d-none');
+                    return;
+                }
+
+                const originalContent = cleanupBtn.innerHTML;
+                cleanupBtn.innerHTML = '<span class="spinner-border spinner-border-sm"></span>';
+                cleanupBtn.disabled = true;
+                try {
+                    const response = await fetch('/analyze_pages', {
+                        method: 'POST',
+                        headers: { 'Content-Type': 'application/json' },
+                        body: JSON.stringify({ filename: filename, folder_type: folderType })
+                    });
+                    const data = await response.json();
+                    if (!data.success) {
+                        alert('Error analyzing pages: ' + (data.error || 'Unknown error'));
+                        return;
+                    }
+
+                    cleanupPages = data.blank.concat(data.duplicates.map(d => d.page));
+                    const lines = [];
+                    if (data.blank.length) {
+                        lines.push(`<b>${data.blank.length} blank:</b> page ${data.blank.join(', ')}`);
+                    }
+                    if (data.duplicates.length) {
+                        const pairs = data.duplicates.map(d => `${d.page} (of ${d.of})`);
+                        lines.push(`<b>${data.duplicates.length} duplicate:</b> page ${pairs.join(', ')}`);
+                    }
+                    cleanupSummary.innerHTML = lines.length ? lines.join('<br>') : 'No blank or duplicate pages found.';
+                    confirmCleanupYes.classList.toggle('d-none', !cleanupPages.length);
+                    cleanupPopup.classList.remove('d-none');
+                } catch (error) {
+                    console.error('Error:', error);
+                    alert('Failed to send analyze request.');
+                } finally {
+                    cleanupBtn.innerHTML = originalContent;
+                    cleanupBtn.disabled = false;
+                }
+            });
+
+            confirmCleanupNo.addEventListener('click', (e) => {
+                e.stopPropagation();
+                cleanupPopup.classList.add('d-none');
+            });
+
+            confirmCleanupYes.addEventListener('click', async (e) => {
+                e.stopPropagation();
+                cleanupPopup.classList.add('d-none');
+
+                try {
+                    const response = await fetch('/remove_pages', {
+                        method: 'POST',
+                        headers: { 'Content-Type': 'application/json' },
+                        body: JSON.stringify({ filename: filename, folder_type: folderType, pages: cleanupPages })
+                    });
+                    const data = await response.json();
+
+                    if (data.success) {
+                        reloadPDF();
+                    } else {
+                        alert('Error removing pages: ' + (data.error || 'Unknown error'));
+                    }
+                } catch (error) {
+                    console.error('Error:', error);
+                    alert('Failed to send remove request.');
+                }
+            });
+
+            cleanupPopup.addEventListener('click', (e) => e.stopPropagation());
+            document.addEventListener('click', () => cleanupPopup.classList.add('d-none'));
+        }
+
         // Delete Page Logic
         if (deletePageBtn && deleteConfirmPopup) {
 
@@ -172,15 +353,15 @@ document.addEventListener('DOMContentLoaded', function () {
                     deleteConfirmPopup.classList.add('d-none'); // Hide immediately
 
                     try {
-                        const response = await fetch('/delete_page', {
+                        const response = await fetch('/edit_pages', {
                             method: 'POST',
                             headers: {
                                 'Content-Type': 'application/json',
                             },
                             body: JSON.stringify({
                                 filename: filename,
-                                page_number: pageNum,
-                                folder_type: folderType
+                                folder_type: folderType,
+                                ops: [{ op: 'delete', page: pageNum }]
                             })
                         });
 
@@ -188,11 +369,7 @@ document.addEventListener('DOMContentLoaded', function () {
 
                         if (data.success) {
                             // Reload PDF without page refresh
-                            // Add timestamp to prevent caching
-                            const timestamp = new Date().getTime();
-                            const separator = pdfUrl.includes('?') ? '&' : '?';
-                            const newUrl = `${pdfUrl}${separator}t=${timestamp}`;
-                            loadPDF(newUrl);
+                            reloadPDF();
                         } else {
                             alert('Error deleting page: ' + (data.error || 'Unknown error'));
                         }
@@ -122,3 +122,180 @@ function initializeUploadPage(submitBtnId, actionInputId) {
         });
     });
 }
+
+// Chunks sent at the same time, and attempts per chunk before giving up
+const UPLOAD_PARALLEL = 3;
+const UPLOAD_ATTEMPTS = 5;
+
+/**
+ * Sends a file to /uploads in chunks (see uploads.py). A dropped chunk is
+ * retried, and an upload interrupted earlier (e.g. by a reload) is resumed
+ * from the chunks the server already has.
+ * @param {File} file - The file to send.
+ * @param {Function} onProgress - Called as onProgress(chunksDone, chunksTotal).
+ * @returns {Promise<string>} The upload id, to send with the form.
+ */
+async function uploadInChunks(file, onProgress) {
+    const resumeKey = `upload:${file.name}:${file.size}:${file.lastModified}`;
+    let upload = null;
+
+    const savedId = localStorage.getItem(resumeKey);
+    if (savedId) {
+        const response = await fetch(`/uploads/${savedId}`);
+        if (response.ok) {
+            const data = await response.json();
+            if (data.status === 'open') upload = data;
+        }
+    }
+
+    if (!upload) {
+        const body = new FormData();
+        body.set('filename', file.name);
+        body.set('size', file.size);
+        const response = await fetch('/uploads', { method: 'POST', body: body });
+        const data = await response.json();
+        if (!data.success) throw new Error(data.error);
+        upload = { ...data, received: [] };
+        localStorage.setItem(resumeKey, upload.upload_id);
+    }
+
+    const received = new Set(upload.received);
+    const pending = [];
+    for (let index = 0; index < upload.num_chunks; index++) {
+        if (!received.has(index)) pending.push(index);
+    }
+
+    let done = received.size;
+    onProgress(done, upload.num_chunks);
+
+    async function sendChunks() {
+        while (pending.length) {
+            const index = pending.shift();
+            const start = index * upload.chunk_size;
+            await putChunk(`/uploads/${upload.upload_id}/${index}`, file.slice(start, start + upload.chunk_size));
+            onProgress(++done, upload.num_chunks);
+        }
+    }
+
+    await Promise.all(Array.from({ length: UPLOAD_PARALLEL }, sendChunks));
+    return { uploadId: upload.upload_id, resumeKey: resumeKey };
+}
+
+async function putChunk(url, chunk) {
+    for (let attempt = 1; ; attempt++) {
+        let response;
+        try {
+            response = await fetch(url, { method: 'PUT', body: chunk });
+        } catch (error) {
+            // Connection dropped: wait and try again
+            if (attempt >= UPLOAD_ATTEMPTS) throw error;
+            await new Promise(resolve => setTimeout(resolve, 1000 * 2 ** attempt));
+            continue;
+        }
+
+        if (response.ok) return;
+        if (response.status >= 500 && attempt < UPLOAD_ATTEMPTS) continue;
+
+        // Rejected, e.g. not a PDF: retrying won't help
+        const data = await response.json().catch(() => ({}));
+        throw new Error(data.error || `Upload failed (${response.status})`);
+    }
+}
+
+/**
+ * Submits the form as a background job and shows its progress.
+ * The form is posted to its action URL (default: /jobs), which answers with the job id.
+ * Once the job is done the browser is sent to the result page.
+ * @param {string} formId - The ID of the upload form.
+ * @param {string} progressId - The ID of the (hidden) progress block.
+ */
+function initializeJobForm(formId, progressId) {
+    document.addEventListener('DOMContentLoaded', function () {
+        const form = document.getElementById(formId);
+        const progressBlock = document.getElementById(progressId);
+        if (!form || !progressBlock) return;
+
+        const progressBar = progressBlock.querySelector('.progress-bar');
+        const progressText = progressBlock.querySelector('.job-progress-text');
+        const cancelButton = progressBlock.querySelector('.job-cancel');
+
+        let jobId = null;
+
+        function showProgress(done, total) {
+            const percent = total ? Math.round(done / total * 100) : 0;
+            progressBar.style.width = percent + '%';
+            progressText.textContent = total ? `${done} / ${total} pages` : 'Waiting for a worker...';
+        }
+
+        async function poll() {
+            const response = await fetch(`/jobs/${jobId}`);
+            const data = await response.json();
+
+            if (!data.success) {
+                alert('Error: ' + (data.error || 'Unknown error'));
+                return;
+            }
+
+            showProgress(data.pages_done, data.pages_total);
+
+            if (data.status === 'done') {
+                window.location = `/jobs/${jobId}/result`;
+            } else if (data.status === 'failed') {
+                alert('Error processing file: ' + data.error);
+                window.location.reload();
+            } else if (data.status === 'cancelled') {
+                window.location.reload();
+            } else {
+                setTimeout(poll, 1000);
+            }
+        }
+
+        form.addEventListener('submit', async (e) => {
+            e.preventDefault();
+
+            form.querySelectorAll('button[type=submit]').forEach(btn => btn.disabled = true);
+            progressBlock.classList.remove('d-none');
+            showProgress(0, 0);
+
+            try {
+                // The file goes up in chunks first; the form then only names it
+                const formData = new FormData(form);
+                const fileInput = form.querySelector('input[type=file]');
+                let upload = null;
+                if (fileInput && fileInput.files.length) {
+                    upload = await uploadInChunks(fileInput.files[0], (done, total) => {
+                        progressBar.style.width = Math.round(done / total * 100) + '%';
+                        progressText.textContent = `Uploading: ${done} / ${total} chunks`;
+                    });
+                    formData.delete(fileInput.name);
+                    formData.set('upload_id', upload.uploadId);
+                    showProgress(0, 0);
+                }
+
+                const response = await fetch(form.getAttribute('action') || '/jobs', { method: 'POST', body: formData });
+                const data = await response.json();
+                if (upload) localStorage.removeItem(upload.resumeKey);
+
+                if (!data.success) {
+                    alert('Error: ' + (data.error || 'Unknown error'));
+                    window.location.reload();
+                    return;
+                }
+
+                jobId = data.job_id;
+                poll();
+            } catch (error) {
+                console.error('Error:', error);
+                alert('Failed to submit the file: ' + error.message);
+                window.location.reload();
+            }
+        });
+
+        if (cancelButton) {
+            cancelButton.addEventListener('click', async () => {
+                if (!jobId) return;
+                await fetch(`/jobs/${jobId}/cancel`, { method: 'POST' });
+            });
+        }
+    });
+}
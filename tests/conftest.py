@@ -0,0 +1,41 @@
+import os
+import shutil
+import sys
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'slow: takes a minute or writes large files; skip with -m "not slow"')
+
+
+@pytest.fixture(scope='session')
+def app_module(tmp_path_factory):
+    """The app, run from a temporary folder with a copy of the database"""
+    workdir = tmp_path_factory.mktemp('app')
+    shutil.copy(os.path.join(ROOT, 'pdfeditor.db'), workdir)
+    for name in ('templates', 'static'):
+        os.symlink(os.path.join(ROOT, name), workdir / name)
+    previous = os.getcwd()
+    os.chdir(workdir)
+    import app
+    # Files are sent relative to the root path, as the app expects it to be
+    # the working directory
+    app.app.root_path = str(workdir)
+    app.app.config['TESTING'] = True
+    yield app
+    os.chdir(previous)
+
+
+@pytest.fixture
+def client(app_module):
+    """A test client logged in as a new user"""
+    client = app_module.app.test_client()
+    client.post('/register', data={'username': f'test{time.time_ns()}', 'password': 'pw', 'confirmation': 'pw'})
+    with client.session_transaction() as session:
+        client.user_id = session['user_id']
+    return client
@@ -0,0 +1,31 @@
+import pytest
+
+from benchmarks.synthetic import make_page_scan_pdf, make_text_pages_pdf
+from slice_and_reorder.cleanup import find_cleanup_pages
+
+
+def test_blank_and_duplicate_pages(tmp_path):
+    path = str(tmp_path / 'scan.pdf')
+    # Indexes: blank pages 5 and 30; 12, 13 and 41 repeat the page before
+    make_page_scan_pdf(path, 60, blank={5, 30}, duplicates={12, 13, 41})
+
+    result = find_cleanup_pages(path)
+    assert result['blank'] == [6, 31]
+    assert result['duplicates'] == [{'page': 13, 'of': 12}, {'page': 14, 'of': 12}, {'page': 42, 'of': 41}]
+
+
+def test_duplicate_of_blank_page(tmp_path):
+    path = str(tmp_path / 'scan.pdf')
+    make_page_scan_pdf(path, 10, blank={4}, duplicates={5})
+
+    # A blank page fed twice is two blank pages, not a duplicate
+    assert find_cleanup_pages(path) == {'blank': [5, 6], 'duplicates': []}
+
+
+@pytest.mark.parametrize('scan', [False, True], ids=['vector', 'scanned'])
+def test_distinct_text_pages(tmp_path, scan):
+    path = str(tmp_path / 'text.pdf')
+    # Same margins, line spacing and page number position on every page
+    make_text_pages_pdf(path, 40, scan=scan, dpi=100)
+
+    assert find_cleanup_pages(path) == {'blank': [], 'duplicates': []}
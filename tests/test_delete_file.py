@@ -0,0 +1,23 @@
+import os
+
+import pytest
+
+from helpers import get_user_files_dir
+
+
+@pytest.mark.parametrize('filename', ['../temp/old/a.pdf', '../../1/saved/a.pdf', '/etc/hostname', '..'])
+def test_outside_saved_folder(client, filename):
+    # A file that must survive
+    folder = get_user_files_dir(client.user_id, 'old')
+    os.makedirs(folder, exist_ok=True)
+    with open(os.path.join(folder, 'a.pdf'), 'wb') as f:
+        f.write(b'%PDF-1.4\n')
+
+    response = client.post('/delete_file', json={'filename': filename})
+    assert response.status_code == 400
+    assert os.path.exists(os.path.join(folder, 'a.pdf'))
+
+
+def test_missing_file(client):
+    response = client.post('/delete_file', json={'filename': 'missing.pdf'})
+    assert response.status_code == 404
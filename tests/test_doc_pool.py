@@ -0,0 +1,44 @@
+import shutil
+
+import fitz
+
+from benchmarks.check_engines import make_labelled_pdf
+from doc_pool import DocPool
+from slice_and_reorder.utils import apply_page_edits
+
+
+def get_labels(path):
+    with fitz.open(path) as doc:
+        return [' '.join(page.get_text().split()) for page in doc]
+
+
+def test_edits_reuse_document(tmp_path):
+    path = str(tmp_path / 'a.pdf')
+    make_labelled_pdf(path, 6, (0,))
+    pool = DocPool(2**30)
+
+    for _ in range(3):
+        with pool.checkout(1, path, edit=True) as doc:
+            apply_page_edits(path, [{'op': 'delete', 'page': 1}], doc=doc)
+    with pool.checkout(1, path, edit=True) as doc:
+        apply_page_edits(path, [{'op': 'move', 'page': 1, 'to': 3}], doc=doc, compact=True)
+    with pool.checkout(1, path) as doc:
+        assert len(doc) == 3
+
+    assert pool.stats()['misses'] == 1
+    assert pool.stats()['hits'] == 4
+    assert get_labels(path) == [f'Spread {n} left Spread {n} right' for n in (5, 6, 4)]
+
+
+def test_file_replaced_by_others(tmp_path):
+    path = str(tmp_path / 'a.pdf')
+    make_labelled_pdf(path, 6, (0,))
+    pool = DocPool(2**30)
+    with pool.checkout(1, path) as doc:
+        assert len(doc) == 6
+
+    make_labelled_pdf(str(tmp_path / 'b.pdf'), 2, (0,))
+    shutil.move(str(tmp_path / 'b.pdf'), path)
+    with pool.checkout(1, path) as doc:
+        assert len(doc) == 2
+    assert pool.stats()['misses'] == 2
@@ -0,0 +1,66 @@
+import pytest
+
+from benchmarks.check_engines import get_expected_labels, make_labelled_pdf, read_pages
+from slice_and_reorder.engines import ENGINES, get_engine
+
+PAGES = 6
+
+# Uneven splits must keep the labels inside their halves
+SPLITS = {
+    'middle': None,
+    'uneven': [0.45 if i % 2 else 0.55 for i in range(PAGES)],
+}
+
+
+@pytest.fixture(scope='module', params=[0, 90, 180, 270])
+def labelled_path(request, tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('labelled') / f'rotated-{request.param}.pdf')
+    make_labelled_pdf(path, PAGES, (request.param,))
+    return path
+
+
+@pytest.mark.parametrize('cut', SPLITS)
+@pytest.mark.parametrize('mode', [1, 2, 3, 4])
+@pytest.mark.parametrize('engine', ENGINES)
+def test_slice_and_reorder_matches_pypdf(tmp_path, labelled_path, engine, mode, cut):
+    reference_path = str(tmp_path / 'pypdf.pdf')
+    output_path = str(tmp_path / f'{engine}.pdf')
+    get_engine('pypdf').slice_and_reorder(labelled_path, reference_path, mode, splits=SPLITS[cut])
+    get_engine(engine).slice_and_reorder(labelled_path, output_path, mode, splits=SPLITS[cut])
+
+    # (label, media box, crop box, rotation) of every page, in order
+    pages = read_pages(output_path)
+    assert [label for label, *_ in pages] == get_expected_labels(PAGES, mode)
+    assert pages == read_pages(reference_path)
+
+
+@pytest.mark.parametrize('mode', [1, 2, 3, 4])
+@pytest.mark.parametrize('engine', ENGINES)
+def test_reorder_matches_pypdf(tmp_path, labelled_path, engine, mode):
+    sliced_path = str(tmp_path / 'sliced.pdf')
+    reference_path = str(tmp_path / 'pypdf.pdf')
+    output_path = str(tmp_path / f'{engine}.pdf')
+    get_engine('pypdf').slice_and_reorder(labelled_path, sliced_path, 4)
+    get_engine('pypdf').reorder(sliced_path, reference_path, mode)
+    get_engine(engine).reorder(sliced_path, output_path, mode)
+
+    pages = read_pages(output_path)
+    assert [label for label, *_ in pages] == get_expected_labels(PAGES, mode)
+    assert pages == read_pages(reference_path)
+
+
+@pytest.mark.parametrize('mode', [1, 2, 3, 4])
+@pytest.mark.parametrize('engine', ENGINES)
+@pytest.mark.parametrize('rotations, inherited', [((0, 90, 180, 270), False), ((90,), True)],
+                         ids=['mixed', 'inherited'])
+def test_page_tree_attributes(tmp_path, engine, mode, rotations, inherited):
+    input_path = str(tmp_path / 'input.pdf')
+    reference_path = str(tmp_path / 'pypdf.pdf')
+    output_path = str(tmp_path / f'{engine}.pdf')
+    make_labelled_pdf(input_path, PAGES, rotations, inherited)
+    get_engine('pypdf').slice_and_reorder(input_path, reference_path, mode)
+    get_engine(engine).slice_and_reorder(input_path, output_path, mode)
+
+    pages = read_pages(output_path)
+    assert [label for label, *_ in pages] == get_expected_labels(PAGES, mode)
+    assert pages == read_pages(reference_path)
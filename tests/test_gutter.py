@@ -0,0 +1,86 @@
+import random
+
+import fitz
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import make_book_scan_pdf
+from slice_and_reorder.gutter import PROFILE_BINS, SEARCH_FRACTION, find_gutters, find_splits
+
+WIDTH = 842
+
+# Bins of the profile per point of an A4 spread
+BINS_PER_POINT = PROFILE_BINS / (2 * SEARCH_FRACTION * WIDTH)
+
+
+def make_profile(gaps=(), spines=()):
+    """A profile with text everywhere but in the gaps, plus spines, all (first, last) bins"""
+    profile = np.full(PROFILE_BINS, 0.2)
+    for first, last in gaps:
+        profile[first:last + 1] = 0
+    for first, last in spines:
+        profile[first:last + 1] = 0.9
+    return profile
+
+
+def to_split(first, last):
+    """The split at the centre of bins first to last"""
+    return 0.5 - SEARCH_FRACTION + ((first + last) / 2 + 0.5) / PROFILE_BINS * 2 * SEARCH_FRACTION
+
+
+def test_find_gutters():
+    profiles = np.stack([
+        # A gutter left of the middle
+        make_profile(gaps=[(80, 110)]),
+        # The widest of two gaps
+        make_profile(gaps=[(20, 30), (150, 190)]),
+        # Across a dark spine a few points wide
+        make_profile(gaps=[(100, 140)], spines=[(118, 121)]),
+        # No gap
+        make_profile(),
+        # Narrower than a gutter
+        make_profile(gaps=[(120, 122)]),
+        # Running off the band: a blank half
+        make_profile(gaps=[(130, PROFILE_BINS - 1)]),
+    ])
+    splits = find_gutters(profiles, np.full(len(profiles), WIDTH))
+
+    assert splits[0] == pytest.approx(to_split(80, 110), abs=1e-3)
+    assert splits[1] == pytest.approx(to_split(150, 190), abs=1e-3)
+    assert splits[2] == pytest.approx(to_split(100, 140), abs=1e-3)
+    assert splits[3:] == [0.5, 0.5, 0.5]
+
+
+def test_spine_width():
+    # A run of text wider than a spine splits the gap; the wider part wins
+    wide = int(30 * BINS_PER_POINT)
+    profiles = np.stack([make_profile(gaps=[(60, 160)], spines=[(80, 80 + wide)])])
+    assert find_gutters(profiles, np.array([WIDTH])) == [pytest.approx(to_split(81 + wide, 160), abs=1e-3)]
+
+
+@pytest.mark.parametrize('rotation', [0, 90, 180, 270])
+def test_find_splits(tmp_path, rotation):
+    random.seed(rotation)
+    offsets = [random.uniform(-40, 40) for _ in range(12)]
+    path = str(tmp_path / 'book.pdf')
+    make_book_scan_pdf(path, offsets, width=WIDTH, dpi=50, rotation=rotation)
+
+    splits = find_splits(path)
+    for split, offset in zip(splits, offsets):
+        assert split * WIDTH == pytest.approx(WIDTH / 2 + offset, abs=3)
+
+
+def test_find_splits_beyond_top_strip(tmp_path):
+    offsets = [-30, 25, 35]
+    path = str(tmp_path / 'book.pdf')
+    make_book_scan_pdf(path, offsets, width=WIDTH, dpi=50)
+    with fitz.open(path) as doc:
+        # A chapter opening: nothing in the top half of the first page
+        doc[0].draw_rect(fitz.Rect(0, 0, WIDTH, doc[0].rect.height / 2), color=None, fill=1)
+        # Halves are cut from the media box, whatever the crop box
+        doc[1].set_cropbox(fitz.Rect(100, 0, WIDTH, doc[1].rect.height))
+        doc.saveIncr()
+
+    splits = find_splits(path)
+    for split, offset in zip(splits, offsets):
+        assert split * WIDTH == pytest.approx(WIDTH / 2 + offset, abs=3)
@@ -0,0 +1,26 @@
+import pytest
+
+from benchmarks.check_engines import make_labelled_pdf
+from helpers import get_user_files_dir
+
+
+@pytest.fixture
+def filename(client):
+    folder = get_user_files_dir(client.user_id, 'processed')
+    make_labelled_pdf(f'{folder}/a.pdf', 3, (0,))
+    return 'a.pdf'
+
+
+@pytest.mark.parametrize('angle', [None, 'left', [90], 45])
+def test_invalid_angle(client, filename, angle):
+    response = client.post('/edit_pages', json={'filename': filename, 'folder_type': 'processed',
+                                                'ops': [{'op': 'rotate', 'page': 1, 'angle': angle}]})
+    assert response.status_code == 400
+    assert response.json['error'] == "Operation 1: angle must be a multiple of 90."
+
+
+def test_rotate(client, filename):
+    response = client.post('/edit_pages', json={'filename': filename, 'folder_type': 'processed',
+                                                'ops': [{'op': 'rotate', 'page': 2, 'angle': -90}]})
+    assert response.status_code == 200
+    assert response.json['page_count'] == 3
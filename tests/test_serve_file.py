@@ -0,0 +1,64 @@
+import os
+
+import pytest
+
+from helpers import get_user_files_dir
+
+CONTENT = b'%PDF-1.4\n' + bytes(range(256)) * 40 + b'\n%%EOF\n'
+
+
+@pytest.fixture
+def file_url(client):
+    folder = get_user_files_dir(client.user_id, 'saved')
+    os.makedirs(folder, exist_ok=True)
+    with open(os.path.join(folder, 'a.pdf'), 'wb') as f:
+        f.write(CONTENT)
+    return f'/edited_files/{client.user_id}/saved/a.pdf'
+
+
+def test_range_request(client, file_url):
+    response = client.get(file_url, headers={'Range': 'bytes=100-599'})
+    assert response.status_code == 206
+    assert len(response.data) == 500
+    assert response.data == CONTENT[100:600]
+    assert response.headers['Content-Range'] == f'bytes 100-599/{len(CONTENT)}'
+
+
+def test_if_none_match(client, file_url):
+    response = client.get(file_url)
+    assert response.status_code == 200
+    assert response.data == CONTENT
+    etag = response.headers['ETag']
+
+    response = client.get(file_url, headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+
+
+def test_range_past_end(client, file_url):
+    response = client.get(file_url, headers={'Range': f'bytes={len(CONTENT) + 10}-'})
+    assert response.status_code == 416
+    assert response.headers['Content-Range'] == f'bytes */{len(CONTENT)}'
+
+
+def test_other_users_file(client, file_url):
+    response = client.get(f'/edited_files/{client.user_id + 1}/saved/a.pdf')
+    assert response.status_code == 403
+    response = client.get(f'/edited_files/{client.user_id}/../{client.user_id + 1}/saved/a.pdf')
+    assert response.status_code == 403
+
+
+def test_saved_over(client, file_url):
+    response = client.get(file_url)
+    assert response.headers['Cache-Control'] == 'private, no-cache'
+    etag = response.headers['ETag']
+
+    # Saving over a file keeps its URL; the browser must get the new content
+    folder = get_user_files_dir(client.user_id, 'saved')
+    with open(os.path.join(folder, 'a.pdf.tmp'), 'wb') as f:
+        f.write(CONTENT + b'%more\n')
+    os.replace(os.path.join(folder, 'a.pdf.tmp'), os.path.join(folder, 'a.pdf'))
+
+    response = client.get(file_url, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.data == CONTENT + b'%more\n'
@@ -0,0 +1,36 @@
+import os
+
+import fitz
+import pytest
+
+from benchmarks.synthetic import make_scan_pdf
+from slice_and_reorder.engines import ENGINES
+from slice_and_reorder.pipeline import slice_and_reorder_pdf
+
+PAGES = 6
+
+
+def get_image_xrefs(path):
+    """The image xrefs used by each page of path"""
+    with fitz.open(path) as doc:
+        return [{image[0] for image in page.get_images()} for page in doc]
+
+
+@pytest.fixture(scope='module')
+def scan_path(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('scan') / 'scan.pdf')
+    make_scan_pdf(path, PAGES, dpi=30)
+    return path
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_halves_share_scans(tmp_path, scan_path, engine):
+    output_path = str(tmp_path / 'output.pdf')
+    slice_and_reorder_pdf(scan_path, output_path, 1, engine=engine)
+
+    # Both halves of a page draw the page's scan; copying it would double the file
+    assert os.path.getsize(output_path) < 1.1 * os.path.getsize(scan_path)
+    pages = get_image_xrefs(output_path)
+    assert len(pages) == 2 * PAGES
+    assert all(len(xrefs) == 1 for xrefs in pages)
+    assert len(set.union(*pages)) == PAGES
@@ -0,0 +1,43 @@
+import os
+
+import pytest
+
+from benchmarks.common import measure
+from benchmarks.synthetic import make_corpus_pdf
+from slice_and_reorder.stream import stream_slice_and_reorder_pdf
+
+# Low resolution keeps the 5,000 page scan around 200 MB
+SCAN_DPI = 20
+
+# Allowed growth of the peak RSS from the smaller to the larger scan, in MB
+RSS_TOLERANCE = 20
+
+
+def slice_scan(input_path, output_path):
+    stream_slice_and_reorder_pdf(input_path, output_path, 1)
+
+
+@pytest.mark.slow
+def test_peak_rss_does_not_grow_with_pages(tmp_path):
+    output_path = str(tmp_path / 'output.pdf')
+    peaks = []
+    for num_pages in (100, 5000):
+        input_path = str(tmp_path / f'scan-{num_pages}.pdf')
+        make_corpus_pdf(input_path, num_pages, kind='scan', dpi=SCAN_DPI)
+        # A fresh process each, so the peak is this run's own
+        seconds, peak_kb = measure(slice_scan, input_path, output_path)
+        peaks.append(peak_kb / 1024)
+        os.remove(input_path)
+
+    assert peaks[1] - peaks[0] < RSS_TOLERANCE
+
+
+def test_memory_ceiling(tmp_path):
+    input_path = str(tmp_path / 'input.pdf')
+    output_path = str(tmp_path / 'output.pdf')
+    make_corpus_pdf(input_path, 10)
+
+    # Every window ends above a ceiling of one byte: 4 pages, 2, then 1 fails
+    with pytest.raises(MemoryError):
+        stream_slice_and_reorder_pdf(input_path, output_path, 1, window=4, memory_limit=1)
+    assert os.listdir(tmp_path) == ['input.pdf']
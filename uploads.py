@@ -0,0 +1,268 @@
+import hashlib
+import os
+import re
+import threading
+import time
+import uuid
+
+from blob_store import store_hashed_file
+
+# Resumable chunked uploads. A client opens an upload with the file's name
+# and size, then PUTs its chunks in any order, retrying or resuming after a
+# dropped connection by asking which chunks arrived. Chunks are written in
+# place into a file of the final size, the SHA-256 is computed as the
+# received prefix grows, and the PDF header and trailer are checked as soon
+# as their chunks arrive, so a bad file is rejected before the rest is sent.
+UPLOADS_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS uploads (id TEXT PRIMARY KEY, user_id INTEGER NOT NULL, filename TEXT NOT NULL,
+        size INTEGER NOT NULL, chunk_size INTEGER NOT NULL, status TEXT NOT NULL, error TEXT, digest TEXT,
+        created_at REAL NOT NULL, updated_at REAL NOT NULL)""",
+    "CREATE INDEX IF NOT EXISTS uploads_updated ON uploads (updated_at)",
+    """CREATE TABLE IF NOT EXISTS upload_chunks (upload_id TEXT NOT NULL, chunk_index INTEGER NOT NULL,
+        PRIMARY KEY (upload_id, chunk_index))""",
+]
+
+UPLOAD_DIR = os.path.join('edited_files', 'uploads')
+
+# Upload states
+OPEN = 'open'
+FINISHING = 'finishing'
+DONE = 'done'
+FAILED = 'failed'
+
+# Chunks are at least this big, so the first one holds the whole header
+MIN_CHUNK_SIZE = 64 * 1024
+
+# Where the header and the trailer must be, in bytes from either end (as
+# readers look for them)
+HEADER_WINDOW = 1024
+TRAILER_WINDOW = 1024
+TRAILER = re.compile(rb'startxref\s+\d+\s+%%EOF')
+
+# Hash of the received prefix of every upload, in this process. A chunk
+# sent to another process is hashed there, from the file, when it finishes.
+_hashers = {}
+_hashers_lock = threading.Lock()
+
+
+class _Hasher:
+    def __init__(self):
+        self.hash = hashlib.sha256()
+        self.offset = 0
+        self.lock = threading.Lock()
+
+
+def init_uploads(db):
+    """Creates the uploads tables if needed."""
+    for statement in UPLOADS_SCHEMA:
+        db.execute(statement)
+
+
+def get_upload_path(upload_id):
+    """Path of the file an upload is assembled in."""
+    return os.path.join(UPLOAD_DIR, f"{upload_id}.part")
+
+
+def create_upload(db, user_id, filename, size, chunk_size, ttl=None):
+    """
+    Opens a chunked upload. Returns its id.
+
+    Args:
+        filename (str): Name of the uploaded file.
+        size (int): Size of the file in bytes.
+        chunk_size (int): Size of every chunk but the last.
+        ttl (float): Also remove uploads unused for this many seconds.
+    """
+    if not filename.endswith('.pdf'):
+        raise ValueError("Invalid file type")
+    if size <= 0:
+        raise ValueError("Empty file")
+    chunk_size = max(chunk_size, MIN_CHUNK_SIZE)
+
+    if ttl is not None:
+        expire_uploads(db, ttl)
+
+    upload_id = uuid.uuid4().hex
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    # Sparse until written; chunks land at their offset in any order
+    with open(get_upload_path(upload_id), 'wb') as f:
+        f.truncate(size)
+
+    now = time.time()
+    db.execute(
+        "INSERT INTO uploads (id, user_id, filename, size, chunk_size, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        upload_id, user_id, filename, size, chunk_size, OPEN, now, now
+    )
+    return upload_id
+
+
+def get_upload(db, upload_id, user_id):
+    """
+    Returns the upload as a dict, with the sorted indexes of the chunks
+    received so far as 'received', or None if it does not belong to user_id.
+    """
+    rows = db.execute("SELECT * FROM uploads WHERE id = ? AND user_id = ?", upload_id, user_id)
+    if len(rows) != 1:
+        return None
+    upload = rows[0]
+    upload["num_chunks"] = _count_chunks(upload)
+    upload["received"] = [row["chunk_index"] for row in db.execute(
+        "SELECT chunk_index FROM upload_chunks WHERE upload_id = ? ORDER BY chunk_index", upload_id)]
+    return upload
+
+
+def write_chunk(db, upload, index, data):
+    """
+    Writes chunk index of an upload (from get_upload). Chunks received
+    before are ignored, so a retried chunk does no harm.
+
+    Raises ValueError if the chunk doesn't fit or shows the file is not a
+    PDF; the upload is then failed and its file removed.
+
+    Returns:
+        int: Number of chunks received so far.
+    """
+    if upload["status"] != OPEN:
+        raise ValueError(upload["error"] or f"Upload is {upload['status']}")
+    if not 0 <= index < upload["num_chunks"]:
+        raise ValueError(f"Chunk {index} out of range")
+    offset = index * upload["chunk_size"]
+    expected = min(upload["chunk_size"], upload["size"] - offset)
+    if len(data) != expected:
+        raise ValueError(f"Chunk {index} has {len(data)} bytes, expected {expected}")
+
+    if index == 0 and b'%PDF-' not in data[:HEADER_WINDOW]:
+        _fail(db, upload["id"], "Not a PDF file (no %PDF- header)")
+    if offset + len(data) == upload["size"]:
+        tail = data[-TRAILER_WINDOW:]
+        # A short last chunk may hold only part of the trailer; it is checked
+        # again once the upload is complete
+        if not TRAILER.search(tail) and len(tail) >= min(TRAILER_WINDOW, upload["size"]):
+            _fail(db, upload["id"], "Not a complete PDF file (no trailer)")
+
+    if db.execute("SELECT 1 FROM upload_chunks WHERE upload_id = ? AND chunk_index = ?", upload["id"], index):
+        return len(upload["received"])
+
+    try:
+        fd = os.open(get_upload_path(upload["id"]), os.O_WRONLY)
+    except FileNotFoundError:
+        # Failed or expired since it was looked up
+        raise ValueError("Upload was removed") from None
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.pwrite(fd, view, offset + len(data) - len(view)):]
+    finally:
+        os.close(fd)
+
+    # Recorded only once written, so a recorded chunk is always on disk
+    db.execute("INSERT OR IGNORE INTO upload_chunks (upload_id, chunk_index) VALUES (?, ?)", upload["id"], index)
+    db.execute("UPDATE uploads SET updated_at = ? WHERE id = ?", time.time(), upload["id"])
+    _advance_hash(db, upload, written=(index, data))
+    return db.execute("SELECT COUNT(*) AS n FROM upload_chunks WHERE upload_id = ?", upload["id"])[0]["n"]
+
+
+def finish_upload(db, upload_id, user_id):
+    """
+    Moves a complete upload into the blob store. An upload can only be
+    finished once.
+
+    Raises ValueError if the upload is unknown, incomplete or not a PDF.
+
+    Returns:
+        tuple: (filename, digest, blob_path)
+    """
+    upload = get_upload(db, upload_id, user_id)
+    if upload is None:
+        raise ValueError("Upload not found")
+    if upload["status"] != OPEN:
+        raise ValueError(upload["error"] or f"Upload is {upload['status']}")
+    if len(upload["received"]) != upload["num_chunks"]:
+        raise ValueError(f"Upload incomplete: {len(upload['received'])} of {upload['num_chunks']} chunks received")
+    if db.execute("UPDATE uploads SET status = ?, updated_at = ? WHERE id = ? AND status = ?",
+                  FINISHING, time.time(), upload_id, OPEN) != 1:
+        raise ValueError(upload["error"] or f"Upload is {upload['status']}")
+
+    path = get_upload_path(upload_id)
+    try:
+        with open(path, 'rb') as f:
+            f.seek(max(0, upload["size"] - TRAILER_WINDOW))
+            if not TRAILER.search(f.read()):
+                raise ValueError("Not a complete PDF file (no trailer)")
+        digest = _advance_hash(db, upload, finish=True)
+        blob_path = store_hashed_file(path, digest)
+    except BaseException as e:
+        _fail(db, upload_id, str(e), raise_error=False)
+        raise
+
+    db.execute("UPDATE uploads SET status = ?, digest = ?, updated_at = ? WHERE id = ?",
+               DONE, digest, time.time(), upload_id)
+    db.execute("DELETE FROM upload_chunks WHERE upload_id = ?", upload_id)
+    return upload["filename"], digest, blob_path
+
+
+def expire_uploads(db, ttl, now=None):
+    """Removes uploads unused for ttl seconds, with their files. Returns how many."""
+    cutoff = (now or time.time()) - ttl
+    rows = db.execute("SELECT id FROM uploads WHERE updated_at < ?", cutoff)
+    for row in rows:
+        _discard(db, row["id"])
+        db.execute("DELETE FROM uploads WHERE id = ?", row["id"])
+    return len(rows)
+
+
+def _count_chunks(upload):
+    return -(-upload["size"] // upload["chunk_size"])
+
+
+def _advance_hash(db, upload, written=None, finish=False):
+    """
+    Hashes the chunks that continue the hashed prefix of an upload, reading
+    them back from its file unless written, the (index, data) just written,
+    is the next one. With finish, the whole file must be hashed; returns the
+    hex digest.
+    """
+    with _hashers_lock:
+        hasher = _hashers.setdefault(upload["id"], _Hasher())
+
+    chunk_size = upload["chunk_size"]
+    with hasher.lock:
+        next_index = hasher.offset // chunk_size
+        received = {row["chunk_index"] for row in db.execute(
+            "SELECT chunk_index FROM upload_chunks WHERE upload_id = ? AND chunk_index >= ?", upload["id"], next_index)}
+        with open(get_upload_path(upload["id"]), 'rb') as f:
+            while next_index in received:
+                if written is not None and written[0] == next_index:
+                    data = written[1]
+                else:
+                    f.seek(hasher.offset)
+                    data = f.read(min(chunk_size, upload["size"] - hasher.offset))
+                hasher.hash.update(data)
+                hasher.offset += len(data)
+                next_index += 1
+
+        if not finish:
+            return None
+        if hasher.offset != upload["size"]:
+            raise ValueError("Upload incomplete")
+        with _hashers_lock:
+            _hashers.pop(upload["id"], None)
+        return hasher.hash.hexdigest()
+
+
+def _fail(db, upload_id, error, raise_error=True):
+    """Fails an upload and removes its file; raises ValueError(error) unless told not to."""
+    db.execute("UPDATE uploads SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+               FAILED, error, time.time(), upload_id)
+    _discard(db, upload_id)
+    if raise_error:
+        raise ValueError(error)
+
+
+def _discard(db, upload_id):
+    with _hashers_lock:
+        _hashers.pop(upload_id, None)
+    db.execute("DELETE FROM upload_chunks WHERE upload_id = ?", upload_id)
+    path = get_upload_path(upload_id)
+    if os.path.exists(path):
+        os.remove(path)